@@ -0,0 +1,13 @@
+"""
+ASGI config of the API-only settings profile (`app.settings_api`).
+
+Serve it with e.g. `uvicorn app.asgi_api:application`.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings_api')
+
+application = get_asgi_application()
@@ -10,8 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import hashlib
+import os
+import tempfile
 from pathlib import Path
 
+from books_collection_api.database import database_from_env
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'books_collection_api.instrumentation.InstrumentationMiddleware',
+    'books_collection_api.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,17 +79,145 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# Threads running database work of async views in one ASGI process.
+# Few threads keep the event loop responsive, as they compete for the GIL.
+ASYNC_VIEW_THREADS = 4
+
 
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
+# Configured with DATABASE_URL and DATABASE_CONN_MAX_AGE environment variables,
+# SQLite file in the project directory by default.
 DATABASES = {
+    'default': database_from_env(os.environ, BASE_DIR / 'db.sqlite3'),
+}
+
+# Test databases of SQLite are files (like the server's, not in memory) named
+# after the checkout, so test runs of other checkouts on one host don't share them.
+TEST_DATABASE_PREFIX = Path(tempfile.gettempdir()) / (
+    'books_collection_api_test_' + hashlib.md5(str(BASE_DIR).encode()).hexdigest()[:12])
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['TEST'] = {'NAME': f'{TEST_DATABASE_PREFIX}.sqlite3'}
+
+# Read only API is served from replicas listed (comma separated) in
+# DATABASE_REPLICA_URLS, chosen in turns (round_robin) or by the lowest
+# latency of probe query (least_latency) in DATABASE_REPLICA_STRATEGY.
+REPLICA_URLS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]
+
+for number, url in enumerate(REPLICA_URLS, 1):
+    DATABASES[f'replica_{number}'] = database_from_env(
+        {**os.environ, 'DATABASE_URL': url}, BASE_DIR / f'replica_{number}.sqlite3')
+
+DATABASE_REPLICAS = [f'replica_{number}' for number in range(1, len(REPLICA_URLS) + 1)]
+
+DATABASE_ROUTERS = ['books_collection_api.routing.ReplicaRouter']
+
+# Adds a stand-in replica database to test databases.
+TEST_RUNNER = 'books_collection_api.tests.runner.TestRunner'
+
+REPLICA_STRATEGY = os.environ.get('DATABASE_REPLICA_STRATEGY', 'round_robin')
+
+# Seconds for which reads go to the primary database after this process
+# wrote to it, so changes are visible before replicas catch up. Changes made
+# by other processes (imports) may be missing on replicas for as long, so
+# responses and leaderboards read from a replica within that time after
+# data version changed are not cached.
+READ_YOUR_WRITES_SECONDS = 5
+
+# Seconds for which measured latency of a replica is trusted.
+REPLICA_PROBE_SECONDS = 10
+
+# Applied to every SQLite connection. WAL journal lets readers work while
+# the importer writes, NORMAL synchronization is safe in WAL mode, mmap and
+# a bigger page cache (negative size is in KiB) speed up reads.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 2 ** 20,
+    'cache_size': -64 * 2 ** 10,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Shared by all server processes and the import command,
+    # which invalidates cached API responses.
+    'api': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': Path(tempfile.gettempdir()) / 'books_collection_api_cache',
+    },
 }
 
+API_CACHE_ALIAS = 'api'
+
+API_CACHE_TIMEOUT = 60 * 60
+
+
+# Response compression
+# Responses smaller than API_COMPRESSION_MIN_SIZE bytes are sent as they are.
+# Brotli (if installed) is used with a quality fast enough for dynamic content.
+
+API_COMPRESSION_MIN_SIZE = 1024
+
+API_BROTLI_QUALITY = 5
+
+
+# Profiling
+# Fraction of requests run under cProfile; profiles of those slower than
+# API_PROFILE_SLOW_SECONDS are saved to API_PROFILE_DIR. Off by default.
+
+API_PROFILE_SAMPLE_RATE = 0
+
+API_PROFILE_SLOW_SECONDS = 1.0
+
+API_PROFILE_DIR = Path(tempfile.gettempdir()) / 'books_collection_api_profiles'
+
+
+# Authors are resolved (on import) and filtered by a normalized key of their
+# first and last name: case folded, with collapsed whitespace and, with
+# AUTHOR_KEY_STRIP_ACCENTS, without accents. Run `merge_authors` after
+# changing it to rebuild the keys.
+
+AUTHOR_KEY_STRIP_ACCENTS = True
+
+# Leaderboards
+# Books are ranked by Bayesian average: their average rate as if they had
+# LEADERBOARD_PRIOR_WEIGHT more opinions of LEADERBOARD_PRIOR_RATE (run
+# `rebuild_ratings` after changing them). Top LEADERBOARD_SIZE books of up to
+# LEADERBOARD_CACHE_SIZE categories (and minimum opinion counts) are kept
+# in memory of every server process until data changes.
+
+LEADERBOARD_PRIOR_RATE = 3.0
+
+LEADERBOARD_PRIOR_WEIGHT = 10
+
+LEADERBOARD_MIN_OPINIONS = 5
+
+LEADERBOARD_SIZE = 100
+
+LEADERBOARD_CACHE_SIZE = 1000
+
+# Import jobs
+# Files uploaded to the import endpoint are kept in IMPORT_UPLOAD_DIR until
+# `import_worker` processes them. Files already on the server can be
+# referenced by path only inside IMPORT_DIR (disabled when None).
+
+IMPORT_UPLOAD_DIR = Path(tempfile.gettempdir()) / 'books_collection_api_imports'
+
+IMPORT_DIR = None
+
+# Running job whose worker saved no progress (done after every chunk) for
+# IMPORT_JOB_STALE_SECONDS, e.g. because it was killed, is queued again.
+
+IMPORT_JOB_STALE_SECONDS = 15 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -123,7 +258,13 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'books_collection_api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'books_collection_api.pagination.PageNumberOrKeysetPagination',
+    'PAGE_SIZE': 50,
 }
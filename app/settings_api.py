@@ -0,0 +1,41 @@
+"""
+API-only settings profile, used by `app.wsgi_api` and `app.asgi_api`.
+
+Serves the books API (and metrics) with the same database, cache and API
+settings as `app.settings`, without admin, auth, sessions, messages,
+static files and templates, which anonymous reads of the API never use.
+Management commands (e.g. `migrate`, `import`) keep using full settings.
+"""
+
+from app.settings import *  # noqa: F401,F403
+from app.settings import REST_FRAMEWORK
+
+
+INSTALLED_APPS = [
+    'books_collection_api.apps.BooksCollectionApiConfig',
+    'rest_framework',
+    'django_filters',
+]
+
+MIDDLEWARE = [
+    'books_collection_api.instrumentation.InstrumentationMiddleware',
+    'books_collection_api.compression.CompressionMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+]
+
+# Without CommonMiddleware URLs missing trailing slash aren't redirected.
+APPEND_SLASH = False
+
+TEMPLATES = []
+
+USE_I18N = False
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': (
+        'books_collection_api.renderers.FastJSONRenderer',
+    ),
+    'DEFAULT_AUTHENTICATION_CLASSES': (),
+    'DEFAULT_PERMISSION_CLASSES': (),
+    'UNAUTHENTICATED_USER': None,
+}
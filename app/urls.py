@@ -13,10 +13,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 
+from books_collection_api.instrumentation import metrics_view
+
 urlpatterns = [
     path('api/', include('books_collection_api.urls')),
-    path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
 ]
+
+# Admin is imported only by settings profiles which install it.
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+    urlpatterns.append(path('admin/', admin.site.urls))
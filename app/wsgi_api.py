@@ -0,0 +1,13 @@
+"""
+WSGI config of the API-only settings profile (`app.settings_api`).
+
+Serve it with e.g. `gunicorn app.wsgi_api`.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings_api')
+
+application = get_wsgi_application()
@@ -0,0 +1,107 @@
+""" Load test of synchronous and asynchronous read endpoints served
+by the ASGI application in process, with many concurrent slow clients.
+
+Usage: python -m benchmarks.asgi_load [--concurrency 500] [--requests 5000]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.utils import setup_django, seed_books, percentile
+
+
+async def request(application, path: str, client_delay: float) -> float:
+    """ Function which sends one GET request to ASGI application, reading
+    the response like a slow client, and returns its latency. """
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'accept', b'application/json')],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    status = None
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif client_delay:
+            await asyncio.sleep(client_delay)
+
+    start = time.perf_counter()
+    await application(scope, receive, send)
+    assert status == 200, status
+    return time.perf_counter() - start
+
+
+async def run(application, path: str, concurrency: int, total: int, client_delay: float) -> dict:
+    """ Function which sends `total` requests keeping `concurrency`
+    of them in flight and returns throughput and latency percentiles. """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with semaphore:
+            return await request(application, path, client_delay)
+
+    start = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(limited() for _ in range(total))))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests_per_second': total / elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--client-delay', type=float, default=0.05,
+                        help='Seconds a client takes to read response body')
+    parser.add_argument('--query-latency', type=float, default=0.005,
+                        help='Seconds added to every query, as by a networked database')
+    parser.add_argument('--db', default='bench_asgi.sqlite3')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    seed_books(args.books, opinions_per_book=2)
+
+    from django.db.backends.signals import connection_created
+
+    def delayed(execute, sql, params, many, context):
+        time.sleep(args.query_latency)
+        return execute(sql, params, many, context)
+
+    def add_latency(sender, connection, **kwargs):
+        if delayed not in connection.execute_wrappers:
+            connection.execute_wrappers.append(delayed)
+
+    if args.query_latency:
+        connection_created.connect(add_latency, weak=False)
+
+    from django.core.asgi import get_asgi_application
+    application = get_asgi_application()
+    endpoints = {
+        'books_sync': '/api/books/?page_size=20',
+        'books_async': '/api/async/books/?page_size=20',
+        'opinion_detail_sync': '/api/opinions/1/',
+        'opinion_detail_async': '/api/async/opinions/1/',
+    }
+    results = {name: asyncio.run(run(application, path, args.concurrency,
+                                     args.requests, args.client_delay))
+               for name, path in endpoints.items()}
+    print(json.dumps({'concurrency': args.concurrency, 'requests': args.requests,
+                      'client_delay': args.client_delay, 'query_latency': args.query_latency,
+                      'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+""" Benchmark of top rated books per category: naive GROUP BY over
+opinions, leaderboard built from the ranking score index and leaderboard
+served from memory (directly and through the WSGI application).
+
+Usage: python -m benchmarks.leaderboard [--books 1000000] [--db bench.sqlite3]
+"""
+import argparse
+import json
+
+from benchmarks.utils import setup_django, seed_catalogue, measure
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=1000000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--min-opinions', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--db', default='bench_leaderboard.sqlite3')
+    args = parser.parse_args()
+
+    # Leaderboards live until data version, kept in the API cache, changes.
+    setup_django(args.db, cache=True)
+    seed_catalogue(args.books)
+
+    from wsgiref.util import setup_testing_defaults
+    from django.core.wsgi import get_wsgi_application
+    from django.db.models import Avg, Count
+    from books_collection_api import leaderboards
+    from books_collection_api.models import Book, Category, Opinion
+
+    category = Category.objects.order_by('-books_count').values_list('pk', flat=True)[0]
+    application = get_wsgi_application()
+
+    def naive() -> list:
+        return list(Opinion.objects.filter(book__category=category).values('book').annotate(
+            count=Count('pk'), average=Avg('rate')).filter(
+            count__gte=args.min_opinions).order_by('-average')[:args.limit])
+
+    def request() -> None:
+        environ = {'PATH_INFO': '/api/leaderboard/', 'HTTP_HOST': 'testserver',
+                   'QUERY_STRING': f'category={category}&limit={args.limit}'}
+        setup_testing_defaults(environ)
+        statuses = []
+        response = application(environ, lambda status, headers: statuses.append(status))
+        b''.join(response)
+        response.close()
+        assert statuses[0].startswith('200'), statuses
+
+    leaderboards.top(category, args.limit, args.min_opinions)
+    results = {
+        'naive_group_by': measure(naive, 5),
+        'build_category': measure(lambda: leaderboards.build(category, args.min_opinions), 20),
+        'build_all_books': measure(lambda: leaderboards.build(None, args.min_opinions), 20),
+        'memory_hit': measure(
+            lambda: leaderboards.top(category, args.limit, args.min_opinions), args.repeat),
+        'request_hit': measure(request, args.repeat),
+    }
+    print(json.dumps({'books': Book.objects.count(), 'category': category,
+                      'limit': args.limit, 'min_opinions': args.min_opinions,
+                      'latency_ms': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
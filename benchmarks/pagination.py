@@ -0,0 +1,56 @@
+""" Benchmark of page number and keyset pagination of books list.
+
+Usage: python -m benchmarks.pagination [--books 1000000] [--db bench.sqlite3]
+"""
+import argparse
+import json
+
+from benchmarks.utils import setup_django, seed_books, measure
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=1000000)
+    parser.add_argument('--page', type=int, default=10000)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db', default='bench_pagination.sqlite3')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    seed_books(args.books)
+
+    from django.urls import reverse
+    from rest_framework.pagination import Cursor
+    from rest_framework.test import APIClient
+    from books_collection_api.models import Book
+    from books_collection_api.pagination import KeysetPagination
+
+    client = APIClient()
+    url = reverse('book-list')
+    offset = (args.page - 1) * args.page_size
+    position = Book.objects.order_by('pk').values_list('pk', flat=True)[offset - 1]
+    paginator = KeysetPagination()
+    paginator.base_url = f'{url}?paginate=cursor&page_size={args.page_size}'
+    deep_cursor = paginator.encode_cursor(
+        Cursor(offset=0, reverse=False, position=str(position)))
+
+    def get(path):
+        response = client.get(path)
+        assert response.status_code == 200, response.status_code
+        return response
+
+    cases = {
+        'page_number_first': f'{url}?page=1&page_size={args.page_size}',
+        'page_number_deep': f'{url}?page={args.page}&page_size={args.page_size}',
+        'cursor_first': f'{url}?paginate=cursor&page_size={args.page_size}',
+        'cursor_deep': deep_cursor,
+    }
+    results = {name: measure(lambda path=path: get(path), args.repeat)
+               for name, path in cases.items()}
+    print(json.dumps({'books': args.books, 'page': args.page,
+                      'page_size': args.page_size, 'latency_ms': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
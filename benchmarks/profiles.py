@@ -0,0 +1,120 @@
+""" Comparison of full (`app.settings`) and API-only (`app.settings_api`)
+settings profiles: startup of their WSGI entry points until the first
+response (URLconf, views and middleware are loaded lazily), measured with
+`python -X importtime` in fresh interpreters, and latency of requests
+passed straight to the WSGI application.
+
+Usage: python -m benchmarks.profiles [--starts 10] [--repeat 2000]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict
+
+from benchmarks.utils import setup_django, seed_books, measure
+
+
+PROFILES = {
+    'full': ('app.settings', 'app.wsgi'),
+    'api': ('app.settings_api', 'app.wsgi_api'),
+}
+
+ENDPOINTS = {
+    'opinion_detail': '/api/opinions/1/',
+    'books_list': '/api/books/?page_size=20',
+}
+
+
+# Imports WSGI entry point and serves its first request, the API root.
+FIRST_RESPONSE = """
+from wsgiref.util import setup_testing_defaults
+from {entry_point} import application
+environ = {{'PATH_INFO': '/api/'}}
+setup_testing_defaults(environ)
+b''.join(application(environ, lambda status, headers: None))
+"""
+
+
+def startup(settings_module: str, entry_point: str, starts: int) -> Dict[str, float]:
+    """ Function which serves the first request of WSGI entry point in fresh
+    interpreters and returns median wall time, total import time and number
+    of imported modules. """
+    environ = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module}
+    code = FIRST_RESPONSE.format(entry_point=entry_point)
+    walls, imports, modules = [], [], []
+    for _ in range(starts):
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            env=environ, capture_output=True, text=True, check=True)
+        walls.append(time.perf_counter() - start)
+        lines = [line.split('|') for line in process.stderr.splitlines()
+                 if line.startswith('import time:') and 'self [us]' not in line]
+        imports.append(sum(int(line[0].rsplit(':', 1)[1]) for line in lines))
+        modules.append(len(lines))
+    return {
+        'wall_ms': statistics.median(walls) * 1000,
+        'import_ms': statistics.median(imports) / 1000,
+        'modules': statistics.median(modules),
+    }
+
+
+def request_latency(db: str, repeat: int) -> Dict[str, dict]:
+    """ Function which measures latency of endpoints called through
+    the WSGI application of current settings profile. """
+    from wsgiref.util import setup_testing_defaults
+
+    setup_django(db)
+    seed_books(1000, opinions_per_book=2)
+    from django.core.wsgi import get_wsgi_application
+    application = get_wsgi_application()
+
+    def get(path: str) -> None:
+        path, _, query = path.partition('?')
+        environ = {'PATH_INFO': path, 'QUERY_STRING': query,
+                   'HTTP_HOST': 'testserver', 'HTTP_ACCEPT': 'application/json'}
+        setup_testing_defaults(environ)
+        statuses = []
+        response = application(environ, lambda status, headers: statuses.append(status))
+        b''.join(response)
+        response.close()
+        assert statuses[0].startswith('200'), (path, statuses)
+
+    results = {}
+    for name, path in ENDPOINTS.items():
+        measure(lambda: get(path), 50)
+        results[name] = measure(lambda: get(path), repeat)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--starts', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--db', default='bench_profiles.sqlite3')
+    parser.add_argument('--requests-only', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.requests_only:
+        print(json.dumps(request_latency(args.db, args.repeat)))
+        return
+    results = {}
+    for name, (settings_module, entry_point) in PROFILES.items():
+        process = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.profiles', '--requests-only',
+             '--repeat', str(args.repeat), '--db', args.db],
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module},
+            capture_output=True, text=True, check=True)
+        results[name] = {
+            'startup': startup(settings_module, entry_point, args.starts),
+            'requests_ms': json.loads(process.stdout),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+""" Microbenchmark of default and fast serialization paths of books list.
+
+Usage: python -m benchmarks.serialization [--sizes 1000 10000 100000] [--db bench.sqlite3]
+"""
+import argparse
+import json
+
+from benchmarks.utils import setup_django, seed_books, measure
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--opinions-per-book', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--db', default='bench_serialization.sqlite3')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    seed_books(max(args.sizes), args.opinions_per_book)
+
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from books_collection_api.renderers import FastJSONRenderer
+    from books_collection_api.serializers import BookSerializer, BookRowSerializer
+    from books_collection_api.views import BookListView
+
+    request = Request(APIRequestFactory().get('/api/books/'))
+    context = {'request': request}
+    queryset = BookListView.queryset
+
+    def default_path(size):
+        data = BookSerializer(queryset[:size], many=True, context=context).data
+        return JSONRenderer().render(data)
+
+    def fast_path(size):
+        rows = BookRowSerializer.rows(queryset)[:size]
+        data = BookRowSerializer(rows, many=True, context=context).data
+        return FastJSONRenderer().render(data)
+
+    results = {}
+    for size in args.sizes:
+        assert default_path(size) == fast_path(size)
+        results[size] = {
+            'default_ms': measure(lambda: default_path(size), args.repeat),
+            'fast_ms': measure(lambda: fast_path(size), args.repeat),
+        }
+        results[size]['speedup'] = (results[size]['default_ms']['median']
+                                    / results[size]['fast_ms']['median'])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
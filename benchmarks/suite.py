@@ -0,0 +1,271 @@
+""" Benchmark suite of the books API and the import command, on a seeded
+synthetic catalogue. Records throughput, latency percentiles, query counts
+and peak memory of every case to JSON, and compares results with a stored
+baseline, exiting with status 1 on regressions.
+
+Usage:
+    python -m benchmarks.suite run [--size 10k|100k|1m] [--output results.json]
+                                   [--baseline baseline.json]
+    python -m benchmarks.suite compare baseline.json results.json
+"""
+import argparse
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from benchmarks.utils import (
+    setup_django, seed_catalogue, write_import_files, measure, count_queries, peak_memory)
+
+
+SIZES = {'10k': 10000, '100k': 100000, '1m': 1000000}
+
+# Value passed to every BookFilter filter in its books list case.
+BOOK_FILTER_VALUES = {
+    'isbn': '9780000000042',
+    'isbn__in': '9780000000001,9780000000500,9789999999999',
+    'title__iexact': 'dom las 7',
+    'title__contains': 'Morze',
+    'search': 'cichy dom',
+    'author': '1',
+    'author_name': 'author7 seed',
+    'author_name__startswith': 'author1',
+    'category': '1',
+    'opinions_count__gte': '10',
+    'opinions_count__lte': '1',
+    'rating_average__gte': '4.5',
+    'rating_average__lte': '2',
+    'ordering': '-rating_average',
+}
+
+# Metrics compared with baseline and whether their higher value is better.
+METRICS = {
+    'requests_per_second': True,
+    'rows_per_second': True,
+    'latency_ms.p50': False,
+    'latency_ms.p95': False,
+    'latency_ms.p99': False,
+    'queries': False,
+    'peak_memory_kb': False,
+    'response_bytes': False,
+}
+
+# Request headers of cases, by case name.
+CASE_HEADERS = {
+    'books_list_gzip': {'HTTP_ACCEPT_ENCODING': 'gzip'},
+    'books_list_fields_title_gzip': {'HTTP_ACCEPT_ENCODING': 'gzip'},
+}
+
+
+def api_case(client, path: str, repeat: int, headers: Dict[str, str] = None) -> dict:
+    """ Function which measures GET requests of passed path. """
+
+    def get():
+        response = client.get(path, **(headers or {}))
+        assert response.status_code == 200, (path, response.status_code)
+        # Streamed responses (exports) are produced while being read.
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    queries = count_queries(get)
+    memory = peak_memory(get)
+    start = time.perf_counter()
+    latency = measure(get, repeat)
+    elapsed = time.perf_counter() - start
+    return {
+        'requests_per_second': repeat / elapsed,
+        'latency_ms': {'p50': latency['median'], 'p95': latency['p95'],
+                       'p99': latency['p99']},
+        'queries': queries,
+        'peak_memory_kb': memory,
+        'response_bytes': len(get()),
+    }
+
+
+def import_cases(directory: Path, total: int, first_isbn: int,
+                 modes: List[str], workers: int) -> Dict[str, dict]:
+    """ Function which measures import of generated books and opinions
+    files in each mode. Imports are rolled back, so every mode starts
+    from the seeded catalogue. """
+    from django.core.management import call_command
+    from django.db import transaction
+
+    paths = write_import_files(directory, total, first_isbn)
+    rows = [sum(1 for _ in open(path)) - 1 for path in paths]
+    results = {}
+    for mode in modes:
+        def run(measured: List[Tuple[float, int]]) -> None:
+            with transaction.atomic():
+                for path in paths:
+                    start = time.perf_counter()
+                    queries = count_queries(lambda: call_command(
+                        'import', path=str(path), mode=mode, workers=workers,
+                        stdout=io.StringIO()))
+                    measured.append((time.perf_counter() - start, queries))
+                transaction.set_rollback(True)
+
+        measured: List[Tuple[float, int]] = []
+        run(measured)
+        memory = peak_memory(lambda: run([]))
+        for kind, count, (seconds, queries) in zip(('books', 'opinions'), rows, measured):
+            results[f'import_{kind}_{mode}'] = {
+                'rows_per_second': count / seconds,
+                'seconds': seconds,
+                'queries': queries,
+                'peak_memory_kb': memory,
+            }
+    return results
+
+
+def run_suite(args) -> dict:
+    """ Function which seeds catalogue of chosen size and runs all cases. """
+    total = SIZES[args.size]
+    setup_django(args.db or f'bench_suite_{args.size}.sqlite3')
+    seed_catalogue(total)
+
+    import django
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+    from books_collection_api.filters import BookFilter
+    from books_collection_api.models import Book, Opinion
+
+    missing = set(BookFilter.base_filters) - set(BOOK_FILTER_VALUES)
+    if missing:
+        raise SystemExit(f'No benchmark values of filters: {", ".join(sorted(missing))}')
+
+    client = APIClient()
+    books_url = reverse('book-list')
+    opinion = Opinion.objects.order_by('pk').values_list('pk', flat=True)[
+        Opinion.objects.count() // 2]
+    paths: Dict[str, str] = {'books_list': books_url}
+    paths.update((f'books_list_{name}', f'{books_url}?{name}={value}')
+                 for name, value in BOOK_FILTER_VALUES.items())
+    # Word of most titles, matching thousands of books.
+    paths['books_list_search_common'] = f'{books_url}?search=dom'
+    paths['books_export_search_common'] = f"{reverse('book-export')}?search=dom"
+    paths['books_list_expanded'] = f'{books_url}?expand=opinions'
+    paths['books_list_fields_title'] = f'{books_url}?fields=title'
+    paths['books_list_gzip'] = books_url
+    paths['books_list_fields_title_gzip'] = f'{books_url}?fields=title'
+    isbn = Book.objects.order_by('-opinions_count').values_list('isbn', flat=True)[0]
+    paths['book_detail'] = reverse('book-detail', args=[isbn])
+    paths['book_opinions'] = reverse('book-opinion-list', args=[isbn])
+    paths['categories_list'] = f"{reverse('category-list')}?ordering=-books_count"
+    paths['authors_list'] = f"{reverse('author-list')}?ordering=-books_count"
+    paths['leaderboard'] = reverse('leaderboard')
+    paths['leaderboard_category'] = f"{reverse('leaderboard')}?category=1"
+    paths['books_lookup_1000'] = '{}?isbns={}'.format(reverse('book-lookup'), ','.join(
+        str(9780000000000 + number * 7) for number in range(1000)))
+    paths['opinions_list'] = reverse('opinion-list')
+    paths['opinion_detail'] = reverse('opinion-detail', args=[opinion])
+
+    cases: Dict[str, dict] = {}
+    for name, path in paths.items():
+        cases[name] = api_case(client, path, args.repeat, CASE_HEADERS.get(name))
+        print(f'{name}: {cases[name]["latency_ms"]["p50"]:.1f} ms', file=sys.stderr)
+    with tempfile.TemporaryDirectory() as directory:
+        cases.update(import_cases(Path(directory), args.import_books, 9790000000000,
+                                  args.import_modes, args.workers))
+    return {
+        'meta': {
+            'size': args.size,
+            'books': Book.objects.count(),
+            'opinions': Opinion.objects.count(),
+            'repeat': args.repeat,
+            'import_books': args.import_books,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        },
+        'cases': cases,
+    }
+
+
+def flatten(metrics: dict, prefix: str = '') -> Dict[str, float]:
+    """ Function which flattens nested metrics into dotted names. """
+    flat = {}
+    for name, value in metrics.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{prefix}{name}.'))
+        else:
+            flat[f'{prefix}{name}'] = value
+    return flat
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> List[str]:
+    """ Function which returns regressions of current results against
+    baseline: query count growing at all, other metrics getting worse
+    by more than `tolerance` (relative). """
+    regressions = []
+    if baseline['meta'].get('size') != current['meta'].get('size'):
+        regressions.append(f'catalogue size differs: {baseline["meta"].get("size")} '
+                           f'-> {current["meta"].get("size")}')
+    for case, old_metrics in baseline['cases'].items():
+        if case not in current['cases']:
+            regressions.append(f'{case}: missing')
+            continue
+        old, new = flatten(old_metrics), flatten(current['cases'][case])
+        for metric, higher_is_better in METRICS.items():
+            if metric not in old or metric not in new:
+                continue
+            change = (new[metric] - old[metric]) / old[metric] if old[metric] else 0
+            if higher_is_better:
+                change = -change
+            if change > (0 if metric == 'queries' else tolerance):
+                regressions.append(f'{case} {metric}: {old[metric]:.1f} -> '
+                                   f'{new[metric]:.1f} ({change:+.0%} worse)')
+    return regressions
+
+
+def report(baseline: dict, current: dict, tolerance: float) -> int:
+    """ Function which prints regressions and returns exit status. """
+    regressions = compare(baseline, current, tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    if not regressions:
+        print(f'No regressions in {len(current["cases"])} cases '
+              f'(tolerance {tolerance:.0%}).')
+    return 1 if regressions else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='Run benchmarks')
+    run.add_argument('--size', choices=SIZES, default='10k')
+    run.add_argument('--repeat', type=int, default=20)
+    run.add_argument('--import-books', type=int, default=10000,
+                     help='Number of books in generated import files')
+    run.add_argument('--import-modes', nargs='+', choices=['row', 'batch', 'pipeline'],
+                     default=['batch', 'pipeline'])
+    run.add_argument('--workers', type=int, default=4)
+    run.add_argument('--db', help='Database path, by default one per catalogue size')
+    run.add_argument('--output', type=Path, help='Write results to this file')
+    run.add_argument('--baseline', type=Path, help='Compare results with this file')
+    run.add_argument('--tolerance', type=float, default=0.25)
+    compare_parser = commands.add_parser('compare', help='Compare two results files')
+    compare_parser.add_argument('baseline', type=Path)
+    compare_parser.add_argument('current', type=Path)
+    compare_parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        sys.exit(report(json.loads(args.baseline.read_text()),
+                        json.loads(args.current.read_text()), args.tolerance))
+    results = run_suite(args)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(text + '\n')
+    else:
+        print(text)
+    if args.baseline:
+        sys.exit(report(json.loads(args.baseline.read_text()), results, args.tolerance))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import csv
+import itertools
+import math
+import os
+import random
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import django
+
+
+def setup_django(db_path: str, cache: bool = False) -> None:
+    """ Function which configures Django to use separate benchmark
+    SQLite database and creates its tables. Unless `cache` is set,
+    API responses aren't cached, so views are measured. """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = db_path
+    if not cache:
+        settings.CACHES['benchmark'] = {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        settings.API_CACHE_ALIAS = 'benchmark'
+    django.setup()
+    from django.core.management import call_command
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    call_command('migrate', run_syncdb=True, verbosity=0)
+
+
+def seed_books(total: int, opinions_per_book: int = 0, batch_size: int = 10000) -> None:
+    """ Function which fills empty database with synthetic books
+    (and opinions) using the application models. """
+    from books_collection_api.models import Author, Category, Book, Opinion
+    if Book.objects.count() >= total:
+        return
+    Category.objects.bulk_create(
+        [Category(name=f'Category {number}') for number in range(50)])
+    categories = list(Category.objects.all())
+    Author.objects.bulk_create(
+        [Author(first_name=f'Author{number}', last_name='Seed') for number in range(5000)])
+    authors = list(Author.objects.all())
+    for start in range(0, total, batch_size):
+        Book.objects.bulk_create([
+            Book(title=f'Book {number}',
+                 isbn=9780000000000 + number,
+                 category=categories[number % len(categories)],
+                 author=authors[number % len(authors)])
+            for number in range(start, min(start + batch_size, total))])
+    if opinions_per_book:
+        book_ids = Book.objects.values_list('pk', flat=True).iterator()
+        opinions = []
+        for book_id in book_ids:
+            for number in range(opinions_per_book):
+                opinions.append(Opinion(
+                    book_id=book_id, rate=number % 5 + 1, description=f'Opinion {number}'))
+            if len(opinions) >= batch_size:
+                Opinion.objects.bulk_create(opinions)
+                opinions = []
+        Opinion.objects.bulk_create(opinions)
+
+
+TITLE_WORDS = ('Dom', 'Las', 'Noc', 'Miasto', 'Morze', 'Cień', 'Ogień', 'Sekret',
+               'Ostatni', 'Zimowy', 'Czarny', 'Cichy', 'Stary', 'Zagubiony', 'Krwawy')
+RATE_WEIGHTS = (5, 7, 15, 33, 40)
+
+
+def synthetic_names(total: int) -> Tuple[List[str], List[str]]:
+    """ Function which returns author and category names
+    of a synthetic catalogue with passed number of books. """
+    authors = [f'Author{number} Seed' for number in range(max(total // 20, 100))]
+    categories = [f'Category {number}' for number in range(50)]
+    return authors, categories
+
+
+def synthetic_books(total: int, first_isbn: int, seed: int = 0
+                    ) -> Iterator[Tuple[int, str, str, str, List[int]]]:
+    """ Function which yields ISBN, title, author, category and opinion rates
+    of synthetic books. Authors and categories are Zipf distributed, number
+    of opinions follows Pareto distribution (most books have none or one,
+    few have hundreds) and rates lean towards 4 and 5. """
+    rng = random.Random(seed)
+    authors, categories = synthetic_names(total)
+    author_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(authors) + 1)))
+    category_weights = list(itertools.accumulate(
+        1 / rank for rank in range(1, len(categories) + 1)))
+    for number in range(total):
+        title = ' '.join(rng.sample(TITLE_WORDS, 2)) + f' {number}'
+        opinions = min(int(rng.paretovariate(1.2)) - 1, 500)
+        yield (first_isbn + number, title,
+               rng.choices(authors, cum_weights=author_weights)[0],
+               rng.choices(categories, cum_weights=category_weights)[0],
+               rng.choices(range(1, 6), RATE_WEIGHTS, k=opinions))
+
+
+def seed_catalogue(total: int, seed: int = 0, batch_size: int = 10000) -> None:
+    """ Function which fills empty database with synthetic books and their
+    opinions using the application models, then computes books ratings,
+    book counts of authors and categories and search index (bulk inserts
+    don't send signals). """
+    from books_collection_api import search
+    from books_collection_api.models import Author, Category, Book, Opinion, split_author_name
+    from books_collection_api.utils import chunked
+    if Book.objects.count() >= total:
+        return
+    author_names, category_names = synthetic_names(total)
+    Category.objects.bulk_create([Category(name=name) for name in category_names])
+    categories = dict(Category.objects.values_list('name', 'pk'))
+    Author.objects.bulk_create([
+        Author(first_name=first_name, second_name=second_name, last_name=last_name)
+        for first_name, second_name, last_name in map(split_author_name, author_names)],
+        batch_size=batch_size)
+    authors = {f'{first_name} {last_name}': pk for pk, first_name, last_name in
+               Author.objects.values_list('pk', 'first_name', 'last_name')}
+    for batch in chunked(synthetic_books(total, 9780000000000, seed), batch_size):
+        Book.objects.bulk_create([
+            Book(isbn=isbn, title=title, author_id=authors[author],
+                 category_id=categories[category])
+            for isbn, title, author, category, rates in batch])
+        ids = dict(Book.objects.filter(
+            isbn__range=(batch[0][0], batch[-1][0])).values_list('isbn', 'pk'))
+        Opinion.objects.bulk_create([
+            Opinion(book_id=ids[isbn], rate=rate, description=f'Opinion {number}')
+            for isbn, title, author, category, rates in batch
+            for number, rate in enumerate(rates)], batch_size=batch_size)
+    Book.objects.refresh_ratings()
+    for model in (Author, Category):
+        model.objects.all().refresh_facets()
+    search.rebuild_index()
+
+
+def write_import_files(directory: Path, total: int, first_isbn: int,
+                       seed: int = 1) -> Tuple[Path, Path]:
+    """ Function which writes synthetic books and opinions in format
+    of import command files and returns their paths. """
+    books_path = directory / 'ksiazki.csv'
+    opinions_path = directory / 'opinie.csv'
+    with open(books_path, 'w', newline='') as books_file, \
+            open(opinions_path, 'w', newline='') as opinions_file:
+        books_writer = csv.writer(books_file, delimiter=';')
+        opinions_writer = csv.writer(opinions_file, delimiter=';')
+        books_writer.writerow(['ISBN', 'Tytuł', 'Autor', 'Gatunek', ''])
+        opinions_writer.writerow(['ISNB', 'Ocena', 'Opis', ''])
+        for isbn, title, author, category, rates in synthetic_books(total, first_isbn, seed):
+            books_writer.writerow([isbn, title, author, category, ''])
+            for number, rate in enumerate(rates):
+                opinions_writer.writerow([isbn, rate, f'Opinion {number}', ''])
+    return books_path, opinions_path
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """ Function which returns percentile of sorted values. """
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def measure(function: Callable[[], object], repeat: int = 20) -> Dict[str, float]:
+    """ Function which calls passed function several times
+    and returns latency statistics in milliseconds. """
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'min': timings[0],
+        'median': statistics.median(timings),
+        'p95': percentile(timings, 0.95),
+        'p99': percentile(timings, 0.99),
+        'max': timings[-1],
+    }
+
+
+def count_queries(function: Callable[[], object]) -> int:
+    """ Function which calls passed function and returns
+    the number of database queries it ran. """
+    from django.db import connection
+    count = 0
+
+    def counter(execute, sql, params, many, context):
+        nonlocal count
+        count += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(counter):
+        function()
+    return count
+
+
+def peak_memory(function: Callable[[], object]) -> int:
+    """ Function which calls passed function and returns peak size
+    of Python memory it allocated, in kilobytes. """
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class BooksCollectionApiConfig(AppConfig):
     name = 'books_collection_api'
+
+    def ready(self):
+        from books_collection_api import database, instrumentation, signals
+        post_migrate.connect(signals.create_search_index, sender=self)
+        connection_created.connect(instrumentation.install_query_recorder)
+        connection_created.connect(database.apply_sqlite_pragmas)
@@ -0,0 +1,120 @@
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from books_collection_api import routing
+
+
+VERSION_KEY = 'books_collection_api:version'
+
+_deferred = threading.local()
+
+
+def get_cache():
+    """ Function which returns cache used for API responses. """
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def get_version() -> Tuple[int, float]:
+    """ Function which returns current data version
+    and the time it was set. """
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = (time.time_ns(), time.time())
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY) or version
+    return version
+
+
+def invalidate() -> None:
+    """ Function which invalidates all cached responses by setting new
+    data version, unless invalidation is deferred. """
+    if getattr(_deferred, 'depth', 0):
+        return
+    get_cache().set(VERSION_KEY, (time.time_ns(), time.time()), None)
+
+
+@contextmanager
+def deferred_invalidation() -> Iterator[None]:
+    """ Context manager which collapses all invalidations inside it into
+    one at its exit, so bulk writes bump the version once. """
+    _deferred.depth = getattr(_deferred, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _deferred.depth -= 1
+        if not _deferred.depth:
+            invalidate()
+
+
+def response_key(request, version: int) -> str:
+    """ Function which returns cache key of response for passed
+    request scheme, host, path, query string and negotiated format.
+    Responses contain absolute URLs, so they are cached per host. """
+    query = sorted(request.query_params.lists())
+    url = request.build_absolute_uri(request.path)
+    fingerprint = f'{request.accepted_renderer.format}:{url}?{query}'
+    digest = hashlib.md5(fingerprint.encode()).hexdigest()
+    return f'books_collection_api:response:{version}:{digest}'
+
+
+class CachedResponseMixin:
+    """ View mixin which caches rendered JSON of list and detail responses
+    until data version changes (except ones read from a replica shortly
+    after it changed) and answers conditional requests
+    with 304 Not Modified. """
+    cache_timeout = None
+    cached_formats = ('json',)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        """ Method which returns cached response or calls passed handler,
+        whose response is cached once rendered. """
+        version, modified = get_version()
+        key = response_key(request, version)
+        etag = quote_etag(key.split(':', 2)[-1])
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=int(modified))
+        if not_modified is not None:
+            return not_modified
+        # Response read from a replica lagging behind the new version would
+        # be cached (and validated by clients) under it, so it is only served.
+        lagging = routing.may_lag(modified)
+        cached = None
+        if request.accepted_renderer.format in self.cached_formats:
+            cached = get_cache().get(key)
+            self.response_cache_key = None if lagging else key
+        if cached is None:
+            response = handler(request, *args, **kwargs)
+        else:
+            response = HttpResponse(cached[0], content_type=cached[1])
+            patch_vary_headers(response, ('Accept',))
+            self.response_cache_key = None
+        if not lagging:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(modified)
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, 'response_cache_key', None)
+        if key and isinstance(response, Response) and response.status_code == 200:
+            response.render()
+            timeout = self.cache_timeout or settings.API_CACHE_TIMEOUT
+            get_cache().set(key, (response.content, response['Content-Type']), timeout)
+        return response
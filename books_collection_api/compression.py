@@ -0,0 +1,93 @@
+from typing import Iterable, Iterator, Set
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+from books_collection_api.instrumentation import timed
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+def accepted_encodings(header: str) -> Set[str]:
+    """ Function which returns content codings accepted by client
+    in `Accept-Encoding` header, skipping those with `q=0`. """
+    encodings = set()
+    for item in header.split(','):
+        name, *params = item.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+def brotli_string(content: bytes) -> bytes:
+    """ Function which compresses bytes with brotli. """
+    return brotli.compress(content, quality=settings.API_BROTLI_QUALITY)
+
+
+def brotli_sequence(sequence: Iterable[bytes]) -> Iterator[bytes]:
+    """ Function which compresses streamed chunks with brotli,
+    flushing every chunk so the stream isn't held back. """
+    compressor = brotli.Compressor(quality=settings.API_BROTLI_QUALITY)
+    for item in sequence:
+        data = compressor.process(item) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """ Middleware which compresses responses of at least
+    `API_COMPRESSION_MIN_SIZE` bytes (and all streamed ones) with brotli,
+    if it is installed and accepted by client, or with gzip. """
+    compressors = {
+        'br': (brotli_string, brotli_sequence),
+        'gzip': (compress_string, compress_sequence),
+    }
+
+    def encoding_of(self, request) -> str:
+        """ Method which returns preferred coding accepted by client. """
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        return 'gzip' if 'gzip' in accepted else ''
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < settings.API_COMPRESSION_MIN_SIZE:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.encoding_of(request)
+        if not encoding:
+            return response
+        compress_bytes, compress_stream = self.compressors[encoding]
+        if response.streaming:
+            response.streaming_content = compress_stream(response.streaming_content)
+            del response['Content-Length']
+        else:
+            with timed('compress'):
+                content = compress_bytes(response.content)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+        # Compressed representation isn't byte for byte equal,
+        # so strong ETag is made weak.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
@@ -1,13 +1,90 @@
 from django_filters import rest_framework as filters
 
-from books_collection_api.models import Book
+from books_collection_api.models import Author, Category, Book, Opinion, author_key_from_str, normalize_name
+from books_collection_api.search import search_books
+
+
+class StableOrderingFilter(filters.OrderingFilter):
+    """ Ordering filter which breaks ties by primary key,
+    so pages of ordered lists don't overlap. """
+
+    def filter(self, qs, value):
+        qs = super().filter(qs, value)
+        if value:
+            qs = qs.order_by(*qs.query.order_by, 'pk')
+        return qs
 
 
 class BookFilter(filters.FilterSet):
     """ Book object filter class. """
+    search = filters.CharFilter(method='filter_search')
+    # Filtered by id only, without looking up author or category.
+    author = filters.NumberFilter(field_name='author')
+    category = filters.NumberFilter(field_name='category')
+    author_name = filters.CharFilter(method='filter_author_name')
+    author_name__startswith = filters.CharFilter(method='filter_author_name_prefix')
+    ordering = StableOrderingFilter(
+        fields=('title', 'opinions_count', 'rating_average'))
 
     class Meta:
         model = Book
         fields = {
+            'isbn': ['exact', 'in'],
             'title': ['iexact', 'contains'],
+            'opinions_count': ['gte', 'lte'],
+            'rating_average': ['gte', 'lte'],
+        }
+
+    def filter_search(self, queryset, name, value):
+        """ Method which filters books by full text search, best matches first. """
+        return search_books(queryset, value)
+
+    def filter_author_name(self, queryset, name, value):
+        """ Method which filters books by author name, compared by normalized
+        key of first and last name, read from the author name key index. """
+        authors = Author.objects.filter(name_key=author_key_from_str(value))
+        return queryset.filter(author__in=authors.values('pk'))
+
+    def filter_author_name_prefix(self, queryset, name, value):
+        """ Method which filters books of authors whose normalized first
+        and last name starts with passed value. Prefix is looked up as
+        range of the author name key index. """
+        prefix = normalize_name(value)
+        authors = Author.objects.filter(name_key__gte=prefix, name_key__lt=prefix + '\U0010ffff')
+        return queryset.filter(author__in=authors.values('pk'))
+
+
+class OpinionFilter(filters.FilterSet):
+    """ Opinion object filter class. """
+    ordering = StableOrderingFilter(fields=('rate',))
+
+    class Meta:
+        model = Opinion
+        fields = {
+            'rate': ['exact', 'gte', 'lte'],
+        }
+
+
+class AuthorFilter(filters.FilterSet):
+    """ Author object filter class. """
+    ordering = StableOrderingFilter(
+        fields=('last_name', 'books_count', 'rating_average'))
+
+    class Meta:
+        model = Author
+        fields = {
+            'last_name': ['iexact'],
+            'books_count': ['gte'],
+        }
+
+
+class CategoryFilter(filters.FilterSet):
+    """ Category object filter class. """
+    ordering = StableOrderingFilter(
+        fields=('name', 'books_count', 'rating_average'))
+
+    class Meta:
+        model = Category
+        fields = {
+            'books_count': ['gte'],
         }
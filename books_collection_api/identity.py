@@ -0,0 +1,145 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from django.db import models, transaction
+
+
+class LRUCache:
+    """ Thread safe, bounded cache which evicts least recently used
+    entries and counts hits and misses. """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_many(self, keys: Iterable[Hashable]) -> Tuple[Dict[Hashable, Any], List[Hashable]]:
+        """ Method which returns found values keyed by key
+        and the list of missing keys. """
+        found, missing = {}, []
+        with self._lock:
+            for key in keys:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    found[key] = self._data[key]
+                else:
+                    missing.append(key)
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def set_many(self, values: Dict[Hashable, Any]) -> None:
+        """ Method which stores values, evicting the oldest ones
+        beyond maximum size. """
+        with self._lock:
+            for key, value in values.items():
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard_pk(self, pk: Any) -> None:
+        """ Method which removes object with passed primary key. """
+        with self._lock:
+            for key in [key for key, obj in self._data.items() if obj.pk == pk]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        """ Method which removes all entries and resets counters. """
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """ Method which returns counters and hit rate. """
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data),
+                'hit_rate': self.hits / lookups if lookups else 0.0}
+
+
+CACHES: Dict[str, LRUCache] = {}
+
+
+def clear_caches() -> None:
+    """ Function which empties natural key caches of all models. Caches
+    are invalidated by signals of this process only, so long running
+    processes clear them before work which must see changes made
+    by other processes. """
+    for cache in CACHES.values():
+        cache.clear()
+
+
+class NaturalKeyManager(models.Manager):
+    """ Manager which resolves objects by their natural key (values of
+    `key_fields`, single value if there is one field) through an LRU
+    cache shared by the whole process. Misses are fetched in one `IN`
+    query and the missing objects created in one bulk insert. Objects
+    are cached once the transaction which read or created them commits,
+    so rolled back rows are never served. """
+    key_fields: Tuple[str, ...] = ()
+    cache_size = 1000
+
+    @property
+    def cache(self) -> LRUCache:
+        """ Cache of the manager's model. """
+        label = self.model._meta.label
+        if label not in CACHES:
+            CACHES[label] = LRUCache(self.cache_size)
+        return CACHES[label]
+
+    def key_of(self, obj: models.Model) -> Hashable:
+        """ Method which returns natural key of passed object. """
+        values = tuple(getattr(obj, field) for field in self.key_fields)
+        return values if len(values) > 1 else values[0]
+
+    def key_values(self, key: Hashable) -> Tuple:
+        """ Method which returns field values of passed natural key. """
+        return key if len(self.key_fields) > 1 else (key,)
+
+    def fetch_many(self, keys: List[Hashable]) -> Dict[Hashable, models.Model]:
+        """ Method which fetches objects of passed keys in one query. """
+        lookups = {f'{field}__in': {self.key_values(key)[index] for key in keys}
+                   for index, field in enumerate(self.key_fields)}
+        wanted = set(keys)
+        objects = {}
+        # The oldest object wins if several share a key.
+        for obj in self.filter(**lookups).order_by('pk'):
+            key = self.key_of(obj)
+            if key in wanted:
+                objects.setdefault(key, obj)
+        return objects
+
+    def fetch_fallback(self, keys: List[Hashable],
+                       defaults: Dict[Hashable, dict]) -> Dict[Hashable, models.Model]:
+        """ Method which fetches objects of passed keys, missed by their
+        natural key, in another way. None are found by default. """
+        return {}
+
+    def resolve_many(self, keys: Iterable[Hashable],
+                     defaults: Optional[Dict[Hashable, dict]] = None
+                     ) -> Dict[Hashable, models.Model]:
+        """ Method which returns objects keyed by natural key, creating
+        the missing ones with optional extra field values in `defaults`. """
+        found, missing = self.cache.get_many(set(keys))
+        if not missing:
+            return found
+        fetched = self.fetch_many(missing)
+        unresolved = [key for key in missing if key not in fetched]
+        if unresolved and defaults:
+            fetched.update(self.fetch_fallback(unresolved, defaults))
+        new = [self.model(**dict(zip(self.key_fields, self.key_values(key))),
+                          **(defaults or {}).get(key, {}))
+               for key in missing if key not in fetched]
+        if new:
+            self.bulk_create(new, ignore_conflicts=True)
+            fetched = self.fetch_many(missing)
+        cache = self.cache
+        transaction.on_commit(lambda: cache.set_many(fetched), using=self.db)
+        found.update(fetched)
+        return found
@@ -0,0 +1,305 @@
+import csv
+import os
+import sys
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, TextIO
+
+import django
+from django.db import transaction
+
+from books_collection_api import search
+from books_collection_api.utils import chunked
+from books_collection_api.models import (
+    Author,
+    Category,
+    Book,
+    Opinion,
+    author_key,
+    split_author_name
+)
+
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Names of files recognized as books and opinions csv files.
+FILE_KINDS = {
+    'ksiazki.csv': 'books',
+    'opinie.csv': 'opinions',
+}
+
+# Function called with the number of rows processed so far
+# after every imported chunk.
+Progress = Optional[Callable[[int], None]]
+
+
+class ImportRowError(Exception):
+    """ Raised when a csv row can't be imported. """
+
+
+class BookRow(NamedTuple):
+    """ Parsed row of books csv file. """
+    isbn: int
+    title: str
+    author: Tuple[str, str, str]
+    category: str
+
+
+class OpinionRow(NamedTuple):
+    """ Parsed row of opinions csv file. """
+    isbn: int
+    rate: int
+    description: str
+
+
+class PipelineResult(NamedTuple):
+    """ Summary of pipeline import run. """
+    rows: int
+    created: int
+    seconds: float
+
+
+def kind_of(path: str) -> Optional[str]:
+    """ Function which returns kind of data (books or opinions)
+    of csv file, recognized by its name. """
+    return FILE_KINDS.get(os.path.basename(path))
+
+
+def parse_isbn(value: str) -> int:
+    """ Function which validates and converts ISBN. """
+    value = value.strip()
+    if len(value) != 13 or not value.isdigit():
+        raise ImportRowError(f'Invalid ISBN={value}')
+    return int(value)
+
+
+def parse_book_row(row: List[str]) -> BookRow:
+    """ Function which converts raw csv row into BookRow. """
+    if len(row) < 4 or not row[1] or not row[2].split() or not row[3]:
+        raise ImportRowError(f'Invalid book row: {";".join(row)}')
+    return BookRow(
+        isbn=parse_isbn(row[0]),
+        title=row[1],
+        author=split_author_name(row[2]),
+        category=row[3])
+
+
+def parse_opinion_row(row: List[str]) -> OpinionRow:
+    """ Function which converts raw csv row into OpinionRow. """
+    if len(row) < 3 or row[1] not in ('1', '2', '3', '4', '5'):
+        raise ImportRowError(f'Invalid opinion row: {";".join(row)}')
+    return OpinionRow(
+        isbn=parse_isbn(row[0]),
+        rate=int(row[1]),
+        description=row[2])
+
+
+def read_rows(file: TextIO) -> Iterator[List[str]]:
+    """ Function which yields csv rows of passed file
+    skipping the header. """
+    reader = csv.reader(file, delimiter=';')
+    next(reader, None)
+    yield from reader
+
+
+class FacetDeltas:
+    """ Changes of numbers of books, opinions and sums of rates of authors
+    and categories, collected from imported rows. They are applied as
+    relative updates, so imports don't recalculate aggregates of authors
+    and categories from all their books after every chunk. """
+
+    def __init__(self):
+        self.changes: Dict[Tuple[type, int], List[int]] = defaultdict(lambda: [0, 0, 0])
+
+    def add(self, author_id: int, category_id: int,
+            books: int = 0, opinions: int = 0, rating: int = 0) -> None:
+        """ Method which adds (or removes, with negative values) books,
+        opinions and their rates to author and category. """
+        for key in ((Author, author_id), (Category, category_id)):
+            change = self.changes[key]
+            change[0] += books
+            change[1] += opinions
+            change[2] += rating
+
+    def apply(self) -> None:
+        """ Method which updates aggregates, with one query for all
+        authors (or categories) changed by the same values. """
+        grouped = defaultdict(list)
+        for (model, pk), change in self.changes.items():
+            if any(change):
+                grouped[model, tuple(change)].append(pk)
+        for (model, change), pks in grouped.items():
+            for batch in chunked(pks, 500):
+                model.objects.filter(pk__in=batch).change_facets(*change)
+        self.changes.clear()
+
+
+def resolve_authors(names: Iterable[Tuple[str, str, str]]) -> Dict[str, Author]:
+    """ Function which returns authors keyed by normalized key of their
+    name, creating the missing ones with one bulk insert. """
+    defaults = {}
+    for first_name, second_name, last_name in names:
+        defaults.setdefault(author_key(first_name, last_name), {
+            'first_name': first_name, 'second_name': second_name, 'last_name': last_name})
+    return Author.objects.resolve_many(defaults, defaults)
+
+
+def resolve_categories(names: Iterable[str]) -> Dict[str, Category]:
+    """ Function which returns categories keyed by name,
+    creating the missing ones with one bulk insert. """
+    return Category.objects.resolve_many(names)
+
+
+def import_books_chunk(rows: List[BookRow]) -> int:
+    """ Function which inserts a chunk of parsed books in one transaction
+    and returns the number of created books. """
+    with transaction.atomic():
+        existing = set(Book.objects.filter(
+            isbn__in={row.isbn for row in rows}).values_list('isbn', flat=True))
+        new_rows = {}
+        for row in rows:
+            if row.isbn not in existing:
+                new_rows.setdefault(row.isbn, row)
+        if not new_rows:
+            return 0
+        authors = resolve_authors(row.author for row in new_rows.values())
+        categories = resolve_categories(row.category for row in new_rows.values())
+        books = [Book(
+            title=row.title,
+            isbn=row.isbn,
+            author=authors[author_key(row.author[0], row.author[2])],
+            category=categories[row.category]) for row in new_rows.values()]
+        Book.objects.bulk_create(books)
+        search.index_books(Book.objects.filter(isbn__in=new_rows.keys()))
+        deltas = FacetDeltas()
+        for book in books:
+            deltas.add(book.author_id, book.category_id, books=1)
+        deltas.apply()
+        return len(books)
+
+
+def import_opinions_chunk(rows: List[OpinionRow]) -> int:
+    """ Function which inserts a chunk of parsed opinions in one transaction
+    and returns the number of created opinions. """
+    with transaction.atomic():
+        books = {isbn: (pk, author_id, category_id) for isbn, pk, author_id, category_id in
+                 Book.objects.filter(isbn__in={row.isbn for row in rows}).values_list(
+                     'isbn', 'pk', 'author_id', 'category_id')}
+        for row in rows:
+            if row.isbn not in books:
+                raise ImportRowError(
+                    f'Book with ISBN={row.isbn} does not exist')
+        existing = set(Opinion.objects.filter(
+            book__in=[book[0] for book in books.values()]).values_list(
+                'book_id', 'rate', 'description'))
+        opinions = []
+        deltas = FacetDeltas()
+        for row in rows:
+            book_id, author_id, category_id = books[row.isbn]
+            key = (book_id, row.rate, row.description)
+            if key in existing:
+                continue
+            existing.add(key)
+            opinions.append(Opinion(
+                book_id=book_id, rate=row.rate, description=row.description))
+            deltas.add(author_id, category_id, opinions=1, rating=row.rate)
+        Opinion.objects.bulk_create(opinions)
+        Book.objects.filter(pk__in={opinion.book_id for opinion in opinions}).refresh_ratings()
+        deltas.apply()
+        return len(opinions)
+
+
+def import_books(file: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 progress: Progress = None) -> int:
+    """ Function which imports books csv file chunk by chunk
+    and returns the number of created books. """
+    total = rows = 0
+    for chunk in chunked(read_rows(file), chunk_size):
+        total += import_books_chunk([parse_book_row(row) for row in chunk])
+        rows += len(chunk)
+        if progress:
+            progress(rows)
+    return total
+
+
+def import_opinions(file: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    progress: Progress = None) -> int:
+    """ Function which imports opinions csv file chunk by chunk
+    and returns the number of created opinions. """
+    total = rows = 0
+    for chunk in chunked(read_rows(file), chunk_size):
+        total += import_opinions_chunk([parse_opinion_row(row) for row in chunk])
+        rows += len(chunk)
+        if progress:
+            progress(rows)
+    return total
+
+
+IMPORTERS = {
+    'books': import_books,
+    'opinions': import_opinions,
+}
+
+ROW_PARSERS = {
+    'books': parse_book_row,
+    'opinions': parse_opinion_row,
+}
+
+CHUNK_WRITERS = {
+    'books': import_books_chunk,
+    'opinions': import_opinions_chunk,
+}
+
+
+def parse_chunk(kind: str, rows: List[List[str]]) -> list:
+    """ Function which parses a chunk of raw csv rows. Runs in
+    the pipeline worker processes. """
+    parser = ROW_PARSERS[kind]
+    return [parser(row) for row in rows]
+
+
+def import_pipeline(file: TextIO, kind: str,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    workers: int = 2, progress: Progress = None) -> PipelineResult:
+    """ Function which parses csv file in a pool of worker processes
+    while the calling process is the single writer of parsed chunks.
+
+    At most two chunks per worker are in flight at any time, so memory
+    usage doesn't depend on the file size. Chunks are written in
+    the order they appear in the file. """
+    start = time.perf_counter()
+    rows = created = written = 0
+
+    def write(future) -> None:
+        nonlocal created, written
+        parsed = future.result()
+        created += CHUNK_WRITERS[kind](parsed)
+        written += len(parsed)
+        if progress:
+            progress(written)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+        pending = deque()
+        for chunk in chunked(read_rows(file), chunk_size):
+            rows += len(chunk)
+            pending.append(executor.submit(parse_chunk, kind, chunk))
+            if len(pending) >= workers * 2:
+                write(pending.popleft())
+        while pending:
+            write(pending.popleft())
+    return PipelineResult(
+        rows=rows, created=created, seconds=time.perf_counter() - start)
+
+
+def peak_rss() -> Optional[Tuple[int, int]]:
+    """ Function which returns peak resident set size in bytes of
+    the current (writer) process and of the largest of its finished
+    child (worker) processes, if platform reports them. """
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale)
@@ -0,0 +1,221 @@
+import hashlib
+import os
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from django.db import transaction
+
+from books_collection_api import search
+from books_collection_api.importers import (
+    DEFAULT_CHUNK_SIZE,
+    ROW_PARSERS,
+    BookRow,
+    FacetDeltas,
+    ImportRowError,
+    OpinionRow,
+    Progress,
+    read_rows,
+    resolve_authors,
+    resolve_categories
+)
+from books_collection_api.models import Book, Opinion, ImportSource, ImportedRow, author_key
+from books_collection_api.utils import chunked
+
+
+class DeltaResult(NamedTuple):
+    """ Numbers of rows inserted, updated, deleted and left unchanged
+    by incremental import. """
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    file_unchanged: bool = False
+
+
+# Parsed row with its key and content digest.
+Change = Tuple[str, str, tuple]
+# Function which applies changed rows and returns numbers of inserted
+# and updated objects, and object ids keyed by row key.
+Applier = Callable[[List[Change]], Tuple[int, int, Dict[str, int]]]
+
+
+def file_digest(path: str) -> str:
+    """ Function which returns SHA-256 of file content. """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(2 ** 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def row_digest(*values) -> str:
+    """ Function which returns short hash of row values. """
+    content = '\x1f'.join(str(value) for value in values)
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+def book_key(row: BookRow) -> Tuple[str, str]:
+    """ Function which returns key (ISBN) and content digest of book row. """
+    return str(row.isbn), row_digest(row.title, *row.author, row.category)
+
+
+def opinion_key(row: OpinionRow) -> Tuple[str, str]:
+    """ Function which returns key (ISBN and content hash)
+    and content digest of opinion row. """
+    digest = row_digest(row.rate, row.description)
+    return f'{row.isbn}:{digest}', digest
+
+
+def apply_books(changes: List[Change]) -> Tuple[int, int, Dict[str, int]]:
+    """ Function which inserts new books and updates title, author
+    and category of changed ones. """
+    rows = {row.isbn: row for key, digest, row in changes}
+    books = {book.isbn: book for book in Book.objects.filter(isbn__in=rows)}
+    authors = resolve_authors(row.author for row in rows.values())
+    categories = resolve_categories(row.category for row in rows.values())
+    new, updated = [], []
+    deltas = FacetDeltas()
+    for isbn, row in rows.items():
+        author = authors[author_key(row.author[0], row.author[2])]
+        category = categories[row.category]
+        book = books.get(isbn)
+        if book is None:
+            new.append(Book(title=row.title, isbn=isbn, author=author, category=category))
+            deltas.add(author.pk, category.pk, books=1)
+        elif (book.title, book.author_id, book.category_id) != (row.title, author.pk, category.pk):
+            # Book moves with its opinions to its new author and category.
+            deltas.add(book.author_id, book.category_id, -1, -book.opinions_count, -book.rating_sum)
+            deltas.add(author.pk, category.pk, 1, book.opinions_count, book.rating_sum)
+            book.title, book.author, book.category = row.title, author, category
+            updated.append(book)
+    Book.objects.bulk_create(new)
+    Book.objects.bulk_update(updated, ['title', 'author', 'category'])
+    ids = dict(Book.objects.filter(isbn__in=rows).values_list('isbn', 'pk'))
+    changed = [book.isbn for book in new] + [book.isbn for book in updated]
+    search.index_books(Book.objects.filter(isbn__in=changed))
+    deltas.apply()
+    return len(new), len(updated), {str(isbn): pk for isbn, pk in ids.items()}
+
+
+def apply_opinions(changes: List[Change]) -> Tuple[int, int, Dict[str, int]]:
+    """ Function which inserts new opinions. Opinions are keyed by their
+    content, so a changed opinion is a new one and the old one vanishes. """
+    facets = {isbn: (pk, author_id, category_id) for isbn, pk, author_id, category_id in
+              Book.objects.filter(isbn__in={row.isbn for key, digest, row in changes}).values_list(
+                  'isbn', 'pk', 'author_id', 'category_id')}
+    books = {isbn: facet[0] for isbn, facet in facets.items()}
+    for key, digest, row in changes:
+        if row.isbn not in books:
+            raise ImportRowError(f'Book with ISBN={row.isbn} does not exist')
+
+    def existing() -> Dict[tuple, int]:
+        return {(book_id, rate, description): pk for book_id, rate, description, pk in
+                Opinion.objects.filter(book__in=books.values()).values_list(
+                    'book_id', 'rate', 'description', 'pk')}
+
+    opinions = existing()
+    new = {}
+    deltas = FacetDeltas()
+    for key, digest, row in changes:
+        book_id, author_id, category_id = facets[row.isbn]
+        content = (book_id, row.rate, row.description)
+        if content not in opinions and content not in new:
+            new[content] = Opinion(book_id=book_id, rate=row.rate, description=row.description)
+            deltas.add(author_id, category_id, opinions=1, rating=row.rate)
+    if new:
+        Opinion.objects.bulk_create(list(new.values()))
+        Book.objects.filter(pk__in={content[0] for content in new}).refresh_ratings()
+        deltas.apply()
+        opinions = existing()
+    return len(new), 0, {key: opinions[(books[row.isbn], row.rate, row.description)]
+                         for key, digest, row in changes}
+
+
+ROW_KEYS = {
+    'books': book_key,
+    'opinions': opinion_key,
+}
+
+APPLIERS: Dict[str, Applier] = {
+    'books': apply_books,
+    'opinions': apply_opinions,
+}
+
+MODELS = {
+    'books': Book,
+    'opinions': Opinion,
+}
+
+
+def save_fingerprints(source: ImportSource, changes: List[Change],
+                      ids: Dict[str, int], stored: Dict[str, Tuple[str, Optional[int]]]) -> None:
+    """ Function which stores digests and object ids of applied rows. """
+    new = [ImportedRow(source=source, key=key, digest=digest, object_id=ids[key])
+           for key, digest, row in changes if key not in stored]
+    ImportedRow.objects.bulk_create(new)
+    changed = {key: (digest, ids[key]) for key, digest, row in changes if key in stored}
+    for fingerprint in ImportedRow.objects.filter(source=source, key__in=changed):
+        fingerprint.digest, fingerprint.object_id = changed[fingerprint.key]
+        fingerprint.save(update_fields=['digest', 'object_id'])
+
+
+def delete_vanished(source: ImportSource, kind: str, keys: List[str],
+                    stored: Dict[str, Tuple[str, Optional[int]]],
+                    chunk_size: int) -> int:
+    """ Function which deletes objects (and fingerprints) of rows
+    missing in the source file and returns their number. """
+    deleted = 0
+    for chunk in chunked(keys, chunk_size):
+        with transaction.atomic():
+            ids = [stored[key][1] for key in chunk if stored[key][1] is not None]
+            deleted += MODELS[kind].objects.filter(pk__in=ids).delete()[1].get(
+                MODELS[kind]._meta.label, 0)
+            ImportedRow.objects.filter(source=source, key__in=chunk).delete()
+    return deleted
+
+
+def import_incremental(path: str, kind: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                       delete_missing: bool = False, progress: Progress = None,
+                       source_name: Optional[str] = None) -> DeltaResult:
+    """ Function which imports only rows of csv file changed since its last
+    incremental import, compared by per row fingerprints. A file whose
+    content didn't change at all is skipped without reading it. With
+    `delete_missing`, objects of rows which disappeared from the file
+    are deleted. Fingerprints are kept per source, the absolute path
+    of the file unless `source_name` is passed. """
+    digest = file_digest(path)
+    source = ImportSource.objects.get_or_create(path=source_name or os.path.abspath(path))[0]
+    if source.digest == digest and not (
+            delete_missing and source.imported_rows.count() > source.keys):
+        return DeltaResult(unchanged=source.keys, file_unchanged=True)
+    stored = {key: (content, object_id) for key, content, object_id in
+              source.imported_rows.values_list('key', 'digest', 'object_id')}
+    parse, key_of, apply = ROW_PARSERS[kind], ROW_KEYS[kind], APPLIERS[kind]
+    seen = set()
+    inserted = updated = unchanged = 0
+    with open(path, 'r') as file:
+        for chunk in chunked(read_rows(file), chunk_size):
+            changes = []
+            for row in map(parse, chunk):
+                key, content = key_of(row)
+                if key in seen or stored.get(key, (None,))[0] == content:
+                    unchanged += 1
+                else:
+                    changes.append((key, content, row))
+                seen.add(key)
+            if changes:
+                with transaction.atomic():
+                    created, changed, ids = apply(changes)
+                    save_fingerprints(source, changes, ids, stored)
+                inserted += created
+                updated += changed
+                unchanged += len(changes) - created - changed
+            if progress:
+                progress(inserted + updated + unchanged)
+    deleted = 0
+    if delete_missing:
+        deleted = delete_vanished(
+            source, kind, [key for key in stored if key not in seen], stored, chunk_size)
+    source.digest = digest
+    source.keys = len(seen)
+    source.save()
+    return DeltaResult(inserted, updated, deleted, unchanged)
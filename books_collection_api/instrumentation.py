@@ -0,0 +1,235 @@
+import asyncio
+import bisect
+import contextvars
+import cProfile
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from books_collection_api.identity import CACHES
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 500)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """ Measurements of one request. Database and serialization time are
+    recorded by any thread the request's context was copied to. """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.timings = defaultdict(float)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """ Context manager which adds its duration to passed phase
+    of current request. """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[phase] += time.perf_counter() - start
+
+
+def record_query(execute, sql, params, many, context):
+    """ Database execute wrapper which counts and times queries
+    of current request. """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.timings['db'] += time.perf_counter() - start
+
+
+def install_query_recorder(sender, connection, **kwargs) -> None:
+    """ Function which adds query recorder to every new database connection,
+    as queries of a request may run in other thread than the middleware. """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    """ Cumulative histogram of observed values, per label set. """
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels: Tuple[Tuple[str, str], ...], value: float) -> None:
+        """ Method which records value under passed labels. """
+        with self.lock:
+            counts, total = self.series.get(labels, ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.series[labels] = (counts, total + value)
+
+    def expose(self) -> List[str]:
+        """ Method which returns histogram lines in Prometheus text format. """
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = sorted((labels, list(counts), total)
+                            for labels, (counts, total) in self.series.items())
+        for labels, counts, total in series:
+            label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                le = f'{bound:g}' if bound != float('inf') else '+Inf'
+                lines.append(f'{self.name}_bucket{{{label_text},le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total:g}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return lines
+
+
+HISTOGRAMS: Dict[str, Histogram] = {
+    'duration': Histogram('api_request_duration_seconds',
+                          'Wall time of requests.', DURATION_BUCKETS),
+    'queries': Histogram('api_request_db_queries',
+                         'Database queries run by requests.', QUERIES_BUCKETS),
+    'db': Histogram('api_request_db_duration_seconds',
+                    'Time requests spent in database queries.', DURATION_BUCKETS),
+    'serialize': Histogram('api_request_serialize_duration_seconds',
+                           'Time requests spent serializing data.', DURATION_BUCKETS),
+    'render': Histogram('api_request_render_duration_seconds',
+                        'Time requests spent rendering JSON.', DURATION_BUCKETS),
+    'size': Histogram('api_response_size_bytes',
+                      'Size of response bodies, except streamed ones.', SIZE_BUCKETS),
+}
+
+
+def endpoint_of(request) -> str:
+    """ Function which returns name of URL pattern matched by request,
+    so metrics labels don't grow with ids in the path. """
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name or match.route) if match else 'unmatched'
+
+
+def observe(request, response, metrics: RequestMetrics) -> None:
+    """ Function which adds request measurements to endpoint histograms. """
+    labels = (('endpoint', endpoint_of(request)), ('method', request.method),
+              ('status', str(response.status_code)))
+    HISTOGRAMS['duration'].observe(labels, metrics.elapsed)
+    HISTOGRAMS['queries'].observe(labels, metrics.queries)
+    for phase in ('db', 'serialize', 'render'):
+        HISTOGRAMS[phase].observe(labels, metrics.timings[phase])
+    if not response.streaming:
+        HISTOGRAMS['size'].observe(labels, len(response.content))
+
+
+def server_timing(metrics: RequestMetrics) -> str:
+    """ Function which returns `Server-Timing` header value of request. """
+    entries = [f'db;dur={metrics.timings["db"] * 1000:.2f};desc="{metrics.queries} queries"']
+    entries.extend(f'{phase};dur={metrics.timings[phase] * 1000:.2f}'
+                   for phase in ('serialize', 'render', 'compress') if phase in metrics.timings)
+    entries.append(f'total;dur={metrics.elapsed * 1000:.2f}')
+    return ', '.join(entries)
+
+
+def dump_profile(profiler: cProfile.Profile, request, elapsed: float) -> Path:
+    """ Function which saves profile of slow request for `pstats`/snakeviz. """
+    directory = Path(settings.API_PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = '-'.join((time.strftime('%Y%m%d-%H%M%S'), request.method,
+                     endpoint_of(request).replace('/', '_'), f'{elapsed * 1000:.0f}ms'))
+    path = directory / f'{name}.prof'
+    profiler.dump_stats(path)
+    return path
+
+
+class InstrumentationMiddleware:
+    """ Middleware which measures wall time, database queries and time,
+    serialization time and response size of every request, reports them
+    in `Server-Timing` header and aggregates them per endpoint.
+
+    Requests sampled with `API_PROFILE_SAMPLE_RATE` run under cProfile,
+    whose stats are dumped to `API_PROFILE_DIR` when the request takes
+    longer than `API_PROFILE_SLOW_SECONDS`. Profiling covers only the
+    thread calling the view, so it's done for synchronous requests. """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            if random.random() < settings.API_PROFILE_SAMPLE_RATE:
+                response = self.profile(request, metrics)
+            else:
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def profile(self, request, metrics: RequestMetrics):
+        """ Method which gets response under profiler and dumps its
+        stats if the request was slow. """
+        profiler = cProfile.Profile()
+        response = profiler.runcall(self.get_response, request)
+        if metrics.elapsed >= settings.API_PROFILE_SLOW_SECONDS:
+            dump_profile(profiler, request, metrics.elapsed)
+        return response
+
+    def finish(self, request, response, metrics: RequestMetrics):
+        """ Method which reports and records request measurements. """
+        response['Server-Timing'] = server_timing(metrics)
+        observe(request, response, metrics)
+        return response
+
+
+def metrics_view(request):
+    """ View which serves endpoint histograms and natural key cache
+    counters of this process in Prometheus text format. """
+    lines = []
+    for histogram in HISTOGRAMS.values():
+        lines.extend(histogram.expose())
+    for metric, name, kind in (('hits', 'api_identity_cache_hits_total', 'counter'),
+                               ('misses', 'api_identity_cache_misses_total', 'counter'),
+                               ('size', 'api_identity_cache_size', 'gauge')):
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(f'{name}{{model="{label}"}} {cache.stats()[metric]}'
+                     for label, cache in sorted(CACHES.items()))
+    return HttpResponse('\n'.join(lines) + '\n',
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,143 @@
+import os
+import socket
+import uuid
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.utils import timezone
+
+from books_collection_api import caching, identity, importers, incremental
+from books_collection_api.models import ImportJob
+
+
+def worker_name() -> str:
+    """ Function which returns name identifying worker process. """
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def save_upload(file: UploadedFile) -> str:
+    """ Function which saves uploaded file into `IMPORT_UPLOAD_DIR`
+    under unique name and returns its path. """
+    directory = settings.IMPORT_UPLOAD_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{uuid.uuid4().hex}.csv')
+    with open(path, 'wb') as destination:
+        for chunk in file.chunks():
+            destination.write(chunk)
+    return path
+
+
+def path_allowed(path: str) -> bool:
+    """ Function which checks whether file of passed path
+    lies inside `IMPORT_DIR` and may be imported. """
+    if not settings.IMPORT_DIR:
+        return False
+    root = os.path.realpath(settings.IMPORT_DIR)
+    return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+
+def enqueue(kind: str, path: str, uploaded: bool = False,
+            source_name: Optional[str] = None, **options) -> ImportJob:
+    """ Function which queues import of csv file. Fingerprints of
+    incremental imports of uploads are kept per name of uploaded file. """
+    if source_name is None:
+        source_name = os.path.abspath(path)
+    elif uploaded:
+        source_name = f'upload:{source_name}'
+    return ImportJob.objects.create(
+        kind=kind, path=path, uploaded=uploaded, source_name=source_name, **options)
+
+
+class JobLost(Exception):
+    """ Exception raised when running job was queued again,
+    as its worker was considered dead. """
+
+
+def requeue_stale() -> int:
+    """ Function which queues again running jobs whose worker hasn't saved
+    progress for `IMPORT_JOB_STALE_SECONDS`, most likely because it was
+    killed. Imports skip rows imported before, so jobs are run again
+    from the start. Returns the number of requeued jobs. """
+    stale = timezone.now() - timedelta(seconds=settings.IMPORT_JOB_STALE_SECONDS)
+    return ImportJob.objects.filter(status=ImportJob.RUNNING, updated_at__lt=stale).update(
+        status=ImportJob.QUEUED, worker='', started_at=None, rows_processed=0,
+        updated_at=timezone.now())
+
+
+def claim_next(worker: str) -> Optional[ImportJob]:
+    """ Function which marks the oldest queued job (after requeueing
+    stale ones) as running by passed worker and returns it. The status is
+    changed by conditional update, so each job is claimed by exactly one
+    of concurrent workers. """
+    requeue_stale()
+    while True:
+        pk = ImportJob.objects.filter(
+            status=ImportJob.QUEUED).order_by('pk').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        claimed = ImportJob.objects.filter(pk=pk, status=ImportJob.QUEUED).update(
+            status=ImportJob.RUNNING, worker=worker,
+            started_at=timezone.now(), updated_at=timezone.now())
+        if claimed:
+            return ImportJob.objects.get(pk=pk)
+
+
+def count_rows(path: str) -> int:
+    """ Function which returns number of data rows in csv file. """
+    with open(path, 'r') as file:
+        return sum(1 for _ in importers.read_rows(file))
+
+
+def run_job(job: ImportJob, workers: int = 2) -> ImportJob:
+    """ Function which imports file of claimed job, saving its progress
+    after every chunk, and marks it as succeeded or failed. Saved progress
+    is the worker's heartbeat: if the job was queued again meanwhile,
+    import stops and the job is left to the worker which claimed it. """
+    jobs = ImportJob.objects.filter(pk=job.pk, status=ImportJob.RUNNING, worker=job.worker)
+
+    def progress(rows: int) -> None:
+        if not jobs.update(rows_processed=rows, updated_at=timezone.now()):
+            raise JobLost(f'Job {job.pk} was queued again')
+
+    # Authors and categories may have been renamed, merged or deleted
+    # by other processes since the previous job.
+    identity.clear_caches()
+    try:
+        job.rows_total = count_rows(job.path)
+        if not jobs.update(rows_total=job.rows_total, updated_at=timezone.now()):
+            raise JobLost(f'Job {job.pk} was queued again')
+        with caching.deferred_invalidation():
+            if job.mode == 'incremental':
+                result = incremental.import_incremental(
+                    job.path, job.kind, job.chunk_size, job.delete_missing,
+                    progress=progress, source_name=job.source_name)
+                job.created, job.updated, job.deleted = (
+                    result.inserted, result.updated, result.deleted)
+            else:
+                with open(job.path, 'r') as file:
+                    if job.mode == 'pipeline':
+                        job.created = importers.import_pipeline(
+                            file, job.kind, job.chunk_size, workers, progress).created
+                    else:
+                        job.created = importers.IMPORTERS[job.kind](
+                            file, job.chunk_size, progress)
+        job.rows_processed = job.rows_total
+        job.status = ImportJob.SUCCEEDED
+    except JobLost:
+        job.refresh_from_db()
+        return job
+    except Exception as error:
+        job.refresh_from_db(fields=['rows_processed'])
+        job.error = str(error) or error.__class__.__name__
+        job.status = ImportJob.FAILED
+    job.finished_at = timezone.now()
+    fields = ('status', 'rows_total', 'rows_processed', 'created', 'updated', 'deleted',
+              'error', 'finished_at')
+    if not jobs.update(updated_at=timezone.now(), **{field: getattr(job, field) for field in fields}):
+        job.refresh_from_db()
+        return job
+    if job.uploaded and os.path.exists(job.path):
+        os.remove(job.path)
+    return job
@@ -0,0 +1,58 @@
+from typing import List, Optional
+
+from django.conf import settings
+
+from books_collection_api import caching, routing
+from books_collection_api.identity import LRUCache
+from books_collection_api.models import Book, join_author_name
+
+
+BOARD_COLUMNS = (
+    'isbn', 'title', 'author__first_name', 'author__second_name', 'author__last_name',
+    'category__name', 'opinions_count', 'rating_average', 'rating_score')
+
+_boards: Optional[LRUCache] = None
+
+
+def boards() -> LRUCache:
+    """ Function which returns in-process cache of built leaderboards. """
+    global _boards
+    if _boards is None:
+        _boards = LRUCache(settings.LEADERBOARD_CACHE_SIZE)
+    return _boards
+
+
+def build(category_id: Optional[int], min_opinions: int) -> List[dict]:
+    """ Function which reads top `LEADERBOARD_SIZE` books (of category,
+    if passed) with at least `min_opinions` opinions by their ranking
+    score, walking the score index without reading opinions. """
+    books = Book.objects.filter(opinions_count__gte=min_opinions)
+    if category_id is not None:
+        books = books.filter(category_id=category_id)
+    rows = books.order_by('-rating_score', 'pk').values_list(
+        *BOARD_COLUMNS)[:settings.LEADERBOARD_SIZE]
+    return [{
+        'isbn': isbn,
+        'title': title,
+        'author': join_author_name(first_name, second_name, last_name),
+        'category': category,
+        'opinions_count': opinions_count,
+        'rating_average': rating_average,
+        'rating_score': round(rating_score, 4),
+    } for (isbn, title, first_name, second_name, last_name,
+           category, opinions_count, rating_average, rating_score) in rows]
+
+
+def top(category_id: Optional[int], limit: int, min_opinions: int) -> List[dict]:
+    """ Function which returns `limit` best ranked books, from leaderboard
+    kept in memory until data version changes, so any write (or import)
+    in any process makes every process rebuild boards it serves. Boards
+    read from a replica which may lag behind that change aren't kept. """
+    version, modified = caching.get_version()
+    key = (version, category_id, min_opinions)
+    found, missing = boards().get_many([key])
+    if missing:
+        found[key] = build(category_id, min_opinions)
+        if not routing.may_lag(modified):
+            boards().set_many(found)
+    return found[key][:limit]
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from books_collection_api.query_plans import hot_queries, full_scans
+
+
+class Command(BaseCommand):
+    help = 'Check that hot lookups of the application use indexes'
+
+    def handle(self, *args, **options) -> None:
+        """ Handling command method. """
+        if connection.vendor != 'sqlite':
+            raise CommandError('Query plans are checked only on SQLite')
+        failed = []
+        for name, query in hot_queries().items():
+            tables = full_scans(query())
+            if tables:
+                failed.append(f'{name}: full scan of {", ".join(tables)}')
+            else:
+                self.stdout.write(f'{name}: OK')
+        if failed:
+            raise CommandError('\n'.join(failed))
+        self.stdout.write(self.style.SUCCESS('All hot queries use indexes!'))
@@ -3,10 +3,7 @@ import csv
 
 from django.core.management.base import BaseCommand, CommandError
 from books_collection_api.models import Author, Category, Book, Opinion
-
-
-BOOKS_FILE = 'ksiazki.csv'
-OPINIONS_FILE = 'opinie.csv'
+from books_collection_api import caching, importers, incremental
 
 
 class Command(BaseCommand):
@@ -15,16 +12,108 @@ class Command(BaseCommand):
     def add_arguments(self, parser) -> None:
         """ Defining available arguments. """
         parser.add_argument('--path', type=str)
+        parser.add_argument(
+            '--kind', choices=['books', 'opinions'],
+            help='Kind of data in the file, recognized by its name '
+                 f'({", ".join(importers.FILE_KINDS)}) by default')
+        parser.add_argument(
+            '--mode', choices=['row', 'batch', 'pipeline', 'incremental'], default='row',
+            help='Import row by row, in chunks inserted with bulk_create, '
+                 'in chunks parsed by a pool of worker processes '
+                 'or only rows changed since last incremental import')
+        parser.add_argument(
+            '--chunk-size', type=int, default=importers.DEFAULT_CHUNK_SIZE,
+            help='Number of csv rows per chunk in batch and pipeline modes')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Number of parsing processes in pipeline mode')
+        parser.add_argument(
+            '--delete-missing', action='store_true',
+            help='Delete objects of rows which disappeared from the file '
+                 'since last import, in incremental mode')
 
     def handle(self, *args, **options) -> None:
         """ Handling command method. """
+        with caching.deferred_invalidation():
+            self._handle(options)
+
+    def _handle(self, options: dict) -> None:
+        """ Function which imports file passed in options. """
         path = options['path']
         if path:
-            filename = os.path.split(path)[-1]
-            if filename == BOOKS_FILE:
-                self._import_books(filename)
-            elif filename == OPINIONS_FILE:
-                self._import_opinions(filename)
+            kind = options['kind'] or importers.kind_of(path)
+            if kind is None:
+                raise CommandError(
+                    f'Unknown kind of data in {path}, pass --kind books or --kind opinions')
+            if options['mode'] == 'row':
+                if kind == 'books':
+                    self._import_books(path)
+                else:
+                    self._import_opinions(path)
+                return
+            if options['chunk_size'] < 1:
+                raise CommandError('Chunk size must be a positive number')
+            if options['workers'] < 1:
+                raise CommandError('Number of workers must be a positive number')
+            if options['mode'] == 'incremental':
+                try:
+                    result = incremental.import_incremental(
+                        path, kind, options['chunk_size'], options['delete_missing'])
+                except importers.ImportRowError as error:
+                    raise CommandError(str(error))
+                self._report_delta(kind, result)
+                return
+            try:
+                with open(path, 'r') as file:
+                    if options['mode'] == 'batch':
+                        total = importers.IMPORTERS[kind](
+                            file, options['chunk_size'])
+                    else:
+                        result = importers.import_pipeline(
+                            file, kind, options['chunk_size'], options['workers'])
+                        total = result.created
+            except importers.ImportRowError as error:
+                raise CommandError(str(error))
+            self._report(kind, total)
+            if options['mode'] == 'pipeline':
+                self._report_throughput(result)
+
+    def _report(self, kind: str, total: int) -> None:
+        """ Function which prints number of imported objects. """
+        if total:
+            self.stdout.write(self.style.SUCCESS(
+                f'Successfully imported {total} {kind}!'))
+        else:
+            self.stdout.write(self.style.NOTICE(f'No new {kind} to import.'))
+        if kind == 'books':
+            self._report_identity_caches()
+
+    def _report_identity_caches(self) -> None:
+        """ Function which prints hit rates of author and category caches. """
+        for model in (Author, Category):
+            stats = model.objects.cache.stats()
+            self.stdout.write(
+                f'{model.__name__} cache: {stats["hits"]} hits, {stats["misses"]} misses '
+                f'({stats["hit_rate"]:.0%} hit rate)')
+
+    def _report_delta(self, kind: str, result: incremental.DeltaResult) -> None:
+        """ Function which prints summary of incremental import. """
+        if result.file_unchanged:
+            self.stdout.write(self.style.NOTICE('File unchanged since last import.'))
+        self.stdout.write(self.style.SUCCESS(
+            f'{kind.capitalize()}: {result.inserted} inserted, {result.updated} updated, '
+            f'{result.deleted} deleted, {result.unchanged} unchanged.'))
+
+    def _report_throughput(self, result: importers.PipelineResult) -> None:
+        """ Function which prints pipeline speed and memory usage. """
+        rate = result.rows / result.seconds if result.seconds else 0
+        message = (f'Processed {result.rows} rows in {result.seconds:.2f}s '
+                   f'({rate:.0f} rows/sec)')
+        rss = importers.peak_rss()
+        if rss is not None:
+            message += (f', peak RSS {rss[0] / 2 ** 20:.1f} MiB of writer, '
+                        f'{rss[1] / 2 ** 20:.1f} MiB of largest worker')
+        self.stdout.write(message)
 
     def _import_books(self, filename: str) -> None:
         """ Function which parses csv file with books
@@ -40,17 +129,12 @@ class Command(BaseCommand):
                 category = row[3]
                 author_obj = Author.objects.get_or_create_from_str(
                     author)
-                category_obj, created = Category.objects.get_or_create(
-                    name=category)
+                category_obj = Category.objects.get_or_create_from_name(category)
                 book_obj, created = Book.objects.get_or_create(
                     title=title, isbn=isbn, author=author_obj, category=category_obj)
                 if created:
                     total += 1
-            if total:
-                self.stdout.write(self.style.SUCCESS(
-                    f'Successfully imported {total} books!'))
-            else:
-                self.stdout.write(self.style.NOTICE('No new books to import.'))
+            self._report('books', total)
 
     def _import_opinions(self, filename: str) -> None:
         """ Function which parses csv file with opinions
@@ -71,9 +155,4 @@ class Command(BaseCommand):
                     rate=rate, description=description, book=book_obj)
                 if created:
                     total += 1
-            if total:
-                self.stdout.write(self.style.SUCCESS(
-                    f'Successfully imported {total} opinions!'))
-            else:
-                self.stdout.write(self.style.NOTICE(
-                    'No new opinions to import.'))
+            self._report('opinions', total)
@@ -0,0 +1,75 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from books_collection_api import jobs
+from books_collection_api.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = 'Process queued import jobs; run several to import files in parallel'
+
+    def add_arguments(self, parser) -> None:
+        """ Defining available arguments. """
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Process queued jobs and exit instead of waiting for new ones')
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help='Seconds to wait before checking for new jobs when queue is empty')
+        parser.add_argument(
+            '--pipeline-workers', type=int, default=2,
+            help='Number of parsing processes of jobs in pipeline mode')
+
+    def handle(self, *args, **options) -> None:
+        """ Handling command method. """
+        if options['poll_interval'] <= 0:
+            raise CommandError('Poll interval must be a positive number')
+        if options['pipeline_workers'] < 1:
+            raise CommandError('Number of workers must be a positive number')
+        self.stopping = False
+        previous = signal.signal(signal.SIGTERM, self._stop)
+        try:
+            self._work(jobs.worker_name(), options)
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+
+    def _work(self, worker: str, options: dict) -> None:
+        """ Function which processes jobs until stopped,
+        or until queue is empty with `--once`. """
+        self.stdout.write(f'Worker {worker} waiting for import jobs.')
+        while not self.stopping:
+            if not options['once']:
+                # Long running worker drops connections broken
+                # or older than CONN_MAX_AGE between jobs.
+                close_old_connections()
+            job = jobs.claim_next(worker)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            self._report(jobs.run_job(job, options['pipeline_workers']))
+
+    def _stop(self, signum, frame) -> None:
+        """ Function which lets worker finish its current job and exit. """
+        self.stopping = True
+
+    def _report(self, job: ImportJob) -> None:
+        """ Function which prints result of processed job. """
+        if job.status not in (ImportJob.SUCCEEDED, ImportJob.FAILED):
+            self.stdout.write(self.style.WARNING(
+                f'Job {job.pk} ({job.kind} from {job.source_name}) was queued again '
+                f'after saving no progress for too long, left to other worker.'))
+            return
+        if job.status == ImportJob.FAILED:
+            self.stdout.write(self.style.ERROR(
+                f'Job {job.pk} ({job.kind} from {job.source_name}) failed: {job.error}'))
+            return
+        rate = job.rows_per_second or 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Job {job.pk} ({job.kind} from {job.source_name}): {job.created} created, '
+            f'{job.updated} updated, {job.deleted} deleted of {job.rows_processed} rows '
+            f'({rate:.0f} rows/sec).'))
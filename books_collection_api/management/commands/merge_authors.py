@@ -0,0 +1,92 @@
+from collections import defaultdict
+from typing import Dict, List
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+
+from books_collection_api import caching, search
+from books_collection_api.models import Author, Book, author_key
+from books_collection_api.utils import chunked
+
+
+def rebuild_keys(batch_size: int, dry_run: bool = False) -> Dict[int, str]:
+    """ Function which recomputes normalized name keys of all authors,
+    saving the changed ones unless `dry_run`, and returns them keyed by id. """
+    keys, changed = {}, []
+    for pk, first_name, last_name, name_key in Author.objects.order_by('pk').values_list(
+            'pk', 'first_name', 'last_name', 'name_key').iterator():
+        keys[pk] = author_key(first_name, last_name)
+        if keys[pk] != name_key:
+            changed.append(Author(pk=pk, name_key=keys[pk]))
+    if not dry_run:
+        Author.objects.bulk_update(changed, ['name_key'], batch_size=batch_size)
+    return keys
+
+
+def duplicate_groups(keys: Dict[int, str]) -> List[List[int]]:
+    """ Function which returns ids of authors sharing a key,
+    the oldest author (kept by merge) first. """
+    groups = defaultdict(list)
+    for pk, key in keys.items():
+        groups[key].append(pk)
+    return [sorted(pks) for pks in groups.values() if len(pks) > 1]
+
+
+def merge_groups(groups: List[List[int]]) -> None:
+    """ Function which moves books of duplicate authors to the first
+    author of their group and deletes the duplicates, in one transaction. """
+    keepers = {duplicate: pks[0] for pks in groups for duplicate in pks[1:]}
+    duplicates = list(keepers)
+    with transaction.atomic():
+        moved = list(Book.objects.filter(author__in=duplicates).values_list('pk', flat=True))
+        Book.objects.filter(author__in=duplicates).update(author=Case(
+            *[When(author=duplicate, then=Value(keeper)) for duplicate, keeper in keepers.items()],
+            output_field=IntegerField()))
+        Author.objects.filter(pk__in=duplicates).delete()
+        Author.objects.filter(pk__in=set(keepers.values())).refresh_facets()
+        search.index_books(Book.objects.filter(pk__in=moved))
+
+
+class Command(BaseCommand):
+    help = ('Rebuild normalized name keys of authors and merge authors sharing a key '
+            '(differing only in case, whitespace or accents of their names)')
+
+    def add_arguments(self, parser) -> None:
+        """ Defining available arguments. """
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only print authors which would be merged')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of duplicate groups merged in one transaction')
+
+    def handle(self, *args, **options) -> None:
+        """ Handling command method. """
+        if options['batch_size'] < 1:
+            raise CommandError('Batch size must be a positive number')
+        with caching.deferred_invalidation():
+            keys = rebuild_keys(options['batch_size'], options['dry_run'])
+            groups = duplicate_groups(keys)
+            if options['dry_run']:
+                self._report_groups(groups)
+                return
+            for batch in chunked(groups, options['batch_size']):
+                merge_groups(batch)
+        Author.objects.cache.clear()
+        duplicates = sum(len(pks) - 1 for pks in groups)
+        if duplicates:
+            self.stdout.write(self.style.SUCCESS(
+                f'Successfully merged {duplicates} duplicate authors into {len(groups)} authors!'))
+        else:
+            self.stdout.write(self.style.NOTICE('No duplicate authors to merge.'))
+
+    def _report_groups(self, groups: List[List[int]]) -> None:
+        """ Function which prints authors which would be merged. """
+        authors = Author.objects.in_bulk([pk for pks in groups for pk in pks])
+        for pks in groups:
+            duplicates = ', '.join(f'{authors[pk]} ({pk})' for pk in pks[1:])
+            self.stdout.write(f'{authors[pks[0]]} ({pks[0]}) <- {duplicates}')
+        self.stdout.write(
+            f'Would merge {sum(len(pks) - 1 for pks in groups)} duplicate authors '
+            f'into {len(groups)} authors.')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from books_collection_api.models import Author, Category, Book
+
+
+class Command(BaseCommand):
+    help = ('Recalculate rating aggregates of all books from their opinions, '
+            'then book counts and ratings of authors and categories')
+
+    def handle(self, *args, **options) -> None:
+        """ Handling command method. """
+        total = Book.objects.all().refresh_ratings()
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully rebuilt ratings of {total} books!'))
+        for model in (Author, Category):
+            total = model.objects.all().refresh_facets()
+            self.stdout.write(self.style.SUCCESS(
+                f'Successfully rebuilt facets of {total} {model._meta.verbose_name_plural}!'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from books_collection_api import search
+
+
+class Command(BaseCommand):
+    help = 'Recreate full text search index of all books'
+
+    def handle(self, *args, **options) -> None:
+        """ Handling command method. """
+        search.create_index()
+        if not search.is_available():
+            raise CommandError('Full text search requires SQLite with FTS5')
+        total = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully indexed {total} books!'))
@@ -1,38 +1,187 @@
-from typing import Any
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+from django.db.models import (
+    Avg, Case, Count, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Sum, Value, When)
+from django.db.models.functions import Cast, Coalesce, NullIf
 from django.db.models.constraints import UniqueConstraint
 from django.core.validators import (
     MinValueValidator,
-    MaxValueValidator,
-    MinLengthValidator,
-    MaxLengthValidator
+    MaxValueValidator
 )
 
+from books_collection_api.identity import NaturalKeyManager
 
-class AuthorManager(models.Manager):
-    """ Author custom manager class. """
+
+def split_author_name(author: str) -> Tuple[str, str, str]:
+    """ Function which splits author in string format into
+    first name, second name and last name. """
+    author = author.split()
+    first_name = author[0]
+    second_name = ' '.join(author[1:-1])
+    last_name = author[-1]
+    return first_name, second_name, last_name
+
+
+def join_author_name(first_name: str, second_name: str, last_name: str) -> str:
+    """ Function which joins parts of author name into string format. """
+    return f"{first_name} {second_name} {last_name}" if second_name else f"{first_name} {last_name}"
+
+
+# Letters without decomposition into base letter and accent.
+UNACCENTED = str.maketrans({'ł': 'l', 'ø': 'o', 'đ': 'd', 'ð': 'd', 'þ': 'th', 'æ': 'ae', 'œ': 'oe'})
+
+
+def normalize_name(name: str) -> str:
+    """ Function which case folds name and collapses its whitespace,
+    stripping accents too with `AUTHOR_KEY_STRIP_ACCENTS` setting. """
+    name = ' '.join(name.casefold().split())
+    if settings.AUTHOR_KEY_STRIP_ACCENTS:
+        name = ''.join(char for char in unicodedata.normalize('NFKD', name)
+                       if not unicodedata.combining(char)).translate(UNACCENTED)
+    return name
+
+
+def author_key(first_name: str, last_name: str) -> str:
+    """ Function which returns normalized key of author, made of
+    first and last name like uniqueness of authors. """
+    return normalize_name(f"{first_name} {last_name}")
+
+
+def author_key_from_str(author: str) -> str:
+    """ Function which returns normalized key of author in string
+    format, ignoring second names. A single word is both first and last
+    name, as when author is saved. """
+    first_name, second_name, last_name = split_author_name(author)
+    return author_key(first_name, last_name)
+
+
+class FacetQuerySet(models.QuerySet):
+    """ Queryset of authors or categories, which keep number of their
+    books and rating aggregates of their opinions. """
+
+    def change_facets(self, books: int, opinions: int, rating: int) -> int:
+        """ Method which adds (or removes, with negative deltas) books,
+        opinions and sum of their rates to aggregates of selected objects. """
+        count = F('opinions_count') + opinions
+        total = F('rating_sum') + rating
+        return self.update(
+            books_count=F('books_count') + books,
+            opinions_count=count,
+            rating_sum=total,
+            rating_average=Case(
+                When(opinions_count=-opinions, then=Value(None)),
+                default=Cast(total, FloatField()) / Cast(count, FloatField()),
+                output_field=FloatField()))
+
+    def refresh_facets(self) -> int:
+        """ Method which recalculates aggregates of selected objects
+        from rating aggregates of their books in one query. """
+        books = Book.objects.filter(**{
+            self.model.books.field.name: OuterRef('pk')}).order_by().values(
+            self.model.books.field.name)
+
+        def aggregate(expression, default=0):
+            subquery = Subquery(books.annotate(value=expression).values('value'))
+            return subquery if default is None else Coalesce(subquery, default)
+
+        return self.update(
+            books_count=aggregate(Count('pk')),
+            opinions_count=aggregate(Sum('opinions_count')),
+            rating_sum=aggregate(Sum('rating_sum')),
+            rating_average=aggregate(
+                Cast(Sum('rating_sum'), FloatField())
+                / NullIf(Cast(Sum('opinions_count'), FloatField()), 0.0), None))
+
+
+class AuthorManager(NaturalKeyManager.from_queryset(FacetQuerySet)):
+    """ Author custom manager class, resolving authors by normalized
+    key of their first and last name, so names differing only in case,
+    whitespace or accents resolve to the same author. """
+    key_fields = ('name_key',)
+    cache_size = 10000
 
     def get_or_create_from_str(self, author: str) -> Any:
         """ Method which gets or creates (if doesn't exists) author object
         from passed author in string format. """
-        author = author.split()
-        first_name = author[0]
-        second_name = ' '.join(author[1:-1])
-        last_name = author[-1]
-        obj, created = self.get_or_create(
-            first_name=first_name, last_name=last_name)
-        if second_name and created:
-            obj.second_name = second_name
-            obj.save()
-        return obj
-
-
-class Author(models.Model):
+        first_name, second_name, last_name = split_author_name(author)
+        key = author_key(first_name, last_name)
+        return self.resolve_many([key], {key: {
+            'first_name': first_name, 'second_name': second_name, 'last_name': last_name}})[key]
+
+    def fetch_fallback(self, keys: List[str], defaults: Dict[str, dict]) -> Dict[str, Any]:
+        """ Method which fetches authors of passed keys by their exact first
+        and last name, finding those whose key is missing or outdated (saved
+        before keys were added or with other `AUTHOR_KEY_STRIP_ACCENTS`),
+        and saves their keys. """
+        names = {(defaults[key]['first_name'], defaults[key]['last_name']): key
+                 for key in keys if key in defaults}
+        if not names:
+            return {}
+        authors = {}
+        for author in self.filter(
+                first_name__in={first_name for first_name, last_name in names},
+                last_name__in={last_name for first_name, last_name in names}).order_by('pk'):
+            key = names.get((author.first_name, author.last_name))
+            if key is not None:
+                author.name_key = key
+                authors[key] = author
+        self.bulk_update(authors.values(), ['name_key'])
+        return authors
+
+    def bulk_create(self, objs: Iterable[Any], *args, **kwargs) -> List[Any]:
+        """ Method which inserts authors, filling their normalized keys. """
+        objs = list(objs)
+        for obj in objs:
+            obj.name_key = author_key(obj.first_name, obj.last_name)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class CategoryManager(NaturalKeyManager.from_queryset(FacetQuerySet)):
+    """ Category custom manager class, resolving categories by name. """
+    key_fields = ('name',)
+    cache_size = 1000
+
+    def get_or_create_from_name(self, name: str) -> Any:
+        """ Method which gets or creates (if doesn't exists)
+        category object of passed name. """
+        return self.resolve_many([name])[name]
+
+
+class AggregatesModel(models.Model):
+    """ Abstract model whose `aggregate_fields` are changed only by
+    queryset updates, so saving an instance never overwrites them
+    with values it loaded before they changed. """
+    aggregate_fields: Tuple[str, ...] = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, force_insert: bool = False, force_update: bool = False,
+             using: Optional[str] = None, update_fields: Optional[Iterable[str]] = None) -> None:
+        if not self._state.adding and not force_insert:
+            if update_fields is None:
+                update_fields = [field.name for field in self._meta.concrete_fields
+                                 if not field.primary_key]
+            update_fields = [name for name in update_fields if name not in self.aggregate_fields]
+        super().save(force_insert, force_update, using, update_fields)
+
+
+class Author(AggregatesModel):
     """ Author model class. """
     objects = AuthorManager()
+    aggregate_fields = ('books_count', 'opinions_count', 'rating_sum', 'rating_average')
     first_name = models.CharField(max_length=50)
     second_name = models.CharField(max_length=100, default='')
     last_name = models.CharField(max_length=50)
+    name_key = models.CharField(max_length=101, default='')
+
+    books_count = models.PositiveIntegerField(default=0)
+    opinions_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_average = models.FloatField(null=True, blank=True)
 
     class Meta:
         constraints = [
@@ -41,18 +190,36 @@ class Author(models.Model):
                     'first_name',
                     'last_name'],
                 name='unique_author')]
+        indexes = [
+            models.Index(fields=['name_key'], name='author_name_key_idx'),
+            models.Index(fields=['books_count', 'id'], name='author_books_count_idx'),
+        ]
+
+    def save(self, *args, **kwargs) -> None:
+        self.name_key = author_key(self.first_name, self.last_name)
+        super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.first_name} {self.second_name} {self.last_name}" if self.second_name else f"{self.first_name} {self.last_name}"
+        return join_author_name(self.first_name, self.second_name, self.last_name)
 
     def __repr__(self):
         return f"<Author(first_name='{self.first_name}', second_name='{self.second_name}', last_name='{self.last_name}')>"
 
 
-class Category(models.Model):
+class Category(AggregatesModel):
     """ Category model class. """
+    objects = CategoryManager()
+    aggregate_fields = ('books_count', 'opinions_count', 'rating_sum', 'rating_average')
     name = models.CharField(max_length=100, unique=True)
 
+    books_count = models.PositiveIntegerField(default=0)
+    opinions_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_average = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'categories'
+
     def __str__(self):
         return f"{self.name}"
 
@@ -60,17 +227,109 @@ class Category(models.Model):
         return f"<Category(name='{self.name}')>"
 
 
-class Book(models.Model):
+RATES = range(1, 6)
+
+
+def prior_score() -> float:
+    """ Function which returns ranking score of book without opinions. """
+    return settings.LEADERBOARD_PRIOR_RATE
+
+
+def bayesian_score(total: Any, count: Any) -> Any:
+    """ Function which returns expression of ranking score: average rate
+    pulled towards `LEADERBOARD_PRIOR_RATE` as if every book had
+    `LEADERBOARD_PRIOR_WEIGHT` more opinions of that rate, so books
+    with few opinions don't outrank well known ones. """
+    weight = settings.LEADERBOARD_PRIOR_WEIGHT
+    return ExpressionWrapper(
+        (Cast(total, FloatField()) + weight * settings.LEADERBOARD_PRIOR_RATE)
+        / (Cast(count, FloatField()) + weight),
+        output_field=FloatField())
+
+
+class BookQuerySet(models.QuerySet):
+    """ Book custom queryset class. """
+
+    def change_rating(self, rate: int, delta: int) -> int:
+        """ Method which adds (or removes, with negative delta) opinions
+        with passed rate to rating aggregates of selected books. """
+        rate = int(rate)
+        count = F('opinions_count') + delta
+        total = F('rating_sum') + rate * delta
+        return self.update(**{
+            'opinions_count': count,
+            'rating_sum': total,
+            f'rate_{rate}_count': F(f'rate_{rate}_count') + delta,
+            'rating_average': Case(
+                When(opinions_count=-delta, then=Value(None)),
+                default=Cast(total, FloatField()) / Cast(count, FloatField()),
+                output_field=FloatField()),
+            'rating_score': bayesian_score(total, count),
+        })
+
+    def refresh_ratings(self) -> int:
+        """ Method which recalculates rating aggregates of selected
+        books from their opinions in one query. """
+        opinions = Opinion.objects.filter(
+            book=OuterRef('pk')).order_by().values('book')
+
+        def aggregate(queryset, expression, default=0):
+            subquery = Subquery(queryset.annotate(
+                value=expression).values('value'))
+            return subquery if default is None else Coalesce(subquery, default)
+
+        fields = {
+            'opinions_count': aggregate(opinions, Count('pk')),
+            'rating_sum': aggregate(opinions, Sum('rate')),
+            'rating_average': aggregate(
+                opinions, Avg('rate', output_field=FloatField()), None),
+        }
+        for rate in RATES:
+            fields[f'rate_{rate}_count'] = aggregate(
+                opinions.filter(rate=rate), Count('pk'))
+        fields['rating_score'] = bayesian_score(fields['rating_sum'], fields['opinions_count'])
+        return self.update(**fields)
+
+
+class Book(AggregatesModel):
     """ Books model class. """
+    objects = BookQuerySet.as_manager()
+    aggregate_fields = (
+        'opinions_count', 'rating_sum', 'rating_average', 'rate_1_count', 'rate_2_count',
+        'rate_3_count', 'rate_4_count', 'rate_5_count', 'rating_score')
     title = models.CharField(max_length=150)
-    isbn = models.PositiveIntegerField(
-        unique=True, validators=[MinLengthValidator(13), MaxLengthValidator(13)])
+    isbn = models.PositiveBigIntegerField(
+        unique=True, validators=[MinValueValidator(10 ** 12), MaxValueValidator(10 ** 13 - 1)])
 
     category = models.ForeignKey(
         Category, related_name='books', on_delete=models.PROTECT)
     author = models.ForeignKey(
         Author, related_name='books', on_delete=models.PROTECT)
 
+    opinions_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_average = models.FloatField(null=True, blank=True)
+    rate_1_count = models.PositiveIntegerField(default=0)
+    rate_2_count = models.PositiveIntegerField(default=0)
+    rate_3_count = models.PositiveIntegerField(default=0)
+    rate_4_count = models.PositiveIntegerField(default=0)
+    rate_5_count = models.PositiveIntegerField(default=0)
+    rating_score = models.FloatField(default=prior_score)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['title', 'id'], name='book_title_idx'),
+            models.Index(fields=['rating_average', 'id'], name='book_rating_average_idx'),
+            models.Index(fields=['opinions_count', 'id'], name='book_opinions_count_idx'),
+            models.Index(fields=['-rating_score', 'id'], name='book_rating_score_idx'),
+            models.Index(fields=['category', '-rating_score', 'id'], name='book_category_score_idx'),
+        ]
+
+    @property
+    def rating_histogram(self) -> dict:
+        """ Number of opinions keyed by rate. """
+        return {rate: getattr(self, f'rate_{rate}_count') for rate in RATES}
+
     def __str__(self):
         return f"{self.title}, ISBN: {self.isbn}"
 
@@ -85,10 +344,98 @@ class Opinion(models.Model):
     description = models.CharField(max_length=500)
 
     book = models.ForeignKey(
-        Book, related_name='opinions', on_delete=models.CASCADE)
+        Book, related_name='opinions', on_delete=models.CASCADE, db_index=False)
+
+    class Meta:
+        # Replaces the foreign key index: serves lookups by book
+        # as well as their ordering by id.
+        indexes = [
+            models.Index(fields=['book', 'id'], name='opinion_book_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.rate}, '{self.description}'"
 
     def __repr__(self):
         return f"<Opinion(rate='{self.rate}', description={self.description}')>"
+
+
+class ImportSource(models.Model):
+    """ Source file of incremental imports, with fingerprint
+    of its content imported last time. """
+    path = models.CharField(max_length=500, unique=True)
+    digest = models.CharField(max_length=64, default='')
+    keys = models.PositiveIntegerField(default=0)
+    imported_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.path}"
+
+
+class ImportedRow(models.Model):
+    """ Fingerprint of a row of incremental import source, keyed by ISBN
+    (books) or ISBN and content hash (opinions), with id of the object
+    it was imported into. """
+    source = models.ForeignKey(
+        ImportSource, related_name='imported_rows', on_delete=models.CASCADE)
+    key = models.CharField(max_length=64)
+    digest = models.CharField(max_length=32)
+    object_id = models.PositiveIntegerField(null=True)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['source', 'key'], name='unique_imported_row')]
+
+    def __str__(self):
+        return f"{self.source}: {self.key}"
+
+
+class ImportJob(models.Model):
+    """ Import of csv file queued to be processed
+    by `import_worker` command, with its progress. """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUSES = [(status, status) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)]
+    KINDS = [('books', 'books'), ('opinions', 'opinions')]
+    MODES = [('batch', 'batch'), ('pipeline', 'pipeline'), ('incremental', 'incremental')]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    mode = models.CharField(max_length=11, choices=MODES, default='batch')
+    path = models.CharField(max_length=500)
+    source_name = models.CharField(max_length=500)
+    uploaded = models.BooleanField(default=False)
+    chunk_size = models.PositiveIntegerField(default=1000)
+    delete_missing = models.BooleanField(default=False)
+
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    worker = models.CharField(max_length=100, default='')
+    rows_total = models.PositiveIntegerField(null=True)
+    rows_processed = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='import_job_status_idx'),
+        ]
+
+    @property
+    def rows_per_second(self) -> Optional[float]:
+        """ Number of rows processed per second since job started. """
+        if self.started_at is None:
+            return None
+        end = self.finished_at or timezone.now()
+        seconds = (end - self.started_at).total_seconds()
+        return self.rows_processed / seconds if seconds > 0 else None
+
+    def __str__(self):
+        return f"{self.kind} import of {self.source_name}: {self.status}"
@@ -0,0 +1,70 @@
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework import pagination
+from rest_framework.exceptions import ValidationError
+
+
+class RowsPaginator(Paginator):
+    """ Paginator which counts `.values()` rows on the queryset
+    they were made from, if it is known. """
+
+    @cached_property
+    def count(self):
+        return getattr(self.object_list, 'count_queryset', self.object_list).count()
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    """ Page number pagination with client controlled, bounded page size. """
+    django_paginator_class = RowsPaginator
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class KeysetPagination(pagination.CursorPagination):
+    """ Cursor pagination which seeks by an unique, indexed column, so deep
+    pages cost the same as the first one. Views may allow other columns
+    than primary key with `cursor_ordering_fields` attribute. """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = 'pk'
+    ordering_param = 'cursor_ordering'
+
+    def get_ordering(self, request, queryset, view):
+        """ Method which returns ordering passed in query string. """
+        ordering = request.query_params.get(self.ordering_param, self.ordering)
+        allowed = getattr(view, 'cursor_ordering_fields', (self.ordering,))
+        if ordering.lstrip('-') not in allowed:
+            raise ValidationError(
+                {self.ordering_param: f'Allowed values: {", ".join(allowed)}'})
+        return (ordering,)
+
+
+class PageNumberOrKeysetPagination(pagination.BasePagination):
+    """ Pagination which uses page numbers by default and switches to keyset
+    pagination when `?paginate=cursor` or `?cursor=` is passed. """
+    mode_query_param = 'paginate'
+    page_number_class = PageNumberPagination
+    keyset_class = KeysetPagination
+
+    def get_paginator(self, request):
+        """ Method which returns paginator matching the request. """
+        keyset = self.keyset_class
+        if (request.query_params.get(self.mode_query_param) == 'cursor'
+                or keyset.cursor_query_param in request.query_params):
+            return keyset()
+        return self.page_number_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_schema_fields(self, view):
+        return self.page_number_class().get_schema_fields(view)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number_class().get_schema_operation_parameters(view)
@@ -0,0 +1,60 @@
+import re
+from typing import Callable, Dict, List
+
+from django.db.models import QuerySet
+
+from books_collection_api.models import Author, Category, Book, Opinion
+
+
+SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)(.*)')
+
+ISBNS = [9788366436572, 9788381257978]
+
+
+def hot_queries() -> Dict[str, Callable[[], QuerySet]]:
+    """ Function which returns querysets of lookups the application
+    runs most often, keyed by their description. """
+    return {
+        'books by ISBN': lambda: Book.objects.filter(isbn__in=ISBNS),
+        'books page after cursor': lambda: Book.objects.filter(pk__gt=100).order_by('pk')[:50],
+        'books page after ISBN cursor': lambda: Book.objects.filter(
+            isbn__gt=ISBNS[0]).order_by('isbn')[:50],
+        # Title index serves ordering only: title filters are case insensitive
+        # or substring LIKE scans, and words of titles are searched in FTS index.
+        'books ordered by title': lambda: Book.objects.order_by('title', 'pk')[:50],
+        'books filtered by rating': lambda: Book.objects.filter(
+            rating_average__gte=4).order_by('-rating_average', 'pk')[:50],
+        'books filtered by opinions count': lambda: Book.objects.filter(
+            opinions_count__gte=10).order_by('opinions_count', 'pk')[:50],
+        'opinion ids of books': lambda: Opinion.objects.filter(
+            book__in=[1, 2, 3]).order_by('pk').values_list('book_id', 'pk'),
+        'opinions of book': lambda: Opinion.objects.filter(book=1).order_by('pk')[:50],
+        'authors by name key': lambda: Author.objects.filter(
+            name_key__in=['harlan coben']).order_by('pk'),
+        'authors without name key by name': lambda: Author.objects.filter(
+            first_name__in=['Harlan'], last_name__in=['Coben']).order_by('pk'),
+        'categories by name': lambda: Category.objects.filter(name__in=['Kryminał']),
+        'books of category': lambda: Book.objects.filter(category=1).order_by('pk')[:50],
+        'books of author': lambda: Book.objects.filter(author=1).order_by('pk')[:50],
+        'books of author name': lambda: Book.objects.filter(author__in=Author.objects.filter(
+            name_key='harlan coben').values('pk')).order_by('pk')[:50],
+        'books of author name prefix': lambda: Book.objects.filter(author__in=Author.objects.filter(
+            name_key__gte='harl', name_key__lt='harl\U0010ffff').values('pk')).order_by('pk')[:50],
+        'authors ordered by books count': lambda: Author.objects.order_by(
+            '-books_count', 'pk')[:50],
+        'top books of category': lambda: Book.objects.filter(
+            category=1, opinions_count__gte=5).order_by('-rating_score', 'pk')[:100],
+        'top books': lambda: Book.objects.filter(
+            opinions_count__gte=5).order_by('-rating_score', 'pk')[:100],
+    }
+
+
+def full_scans(queryset: QuerySet) -> List[str]:
+    """ Function which returns tables read with full scan in
+    SQLite query plan of passed queryset. """
+    tables = []
+    for line in queryset.explain().splitlines():
+        match = SCAN.search(line)
+        if match and 'USING' not in match.group(2):
+            tables.append(match.group(1))
+    return tables
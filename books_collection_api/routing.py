@@ -0,0 +1,114 @@
+import contextvars
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+_last_write = 0.0
+_lock = threading.Lock()
+_cycle = None
+_latencies: Dict[str, tuple] = {}
+
+
+def replicas() -> List[str]:
+    """ Function which returns aliases of replica databases. """
+    return settings.DATABASE_REPLICAS
+
+
+def recently_written() -> bool:
+    """ Function which checks whether this process wrote to the primary
+    database within read-your-writes window. """
+    return time.monotonic() - _last_write < settings.READ_YOUR_WRITES_SECONDS
+
+
+def may_lag(since: float) -> bool:
+    """ Function which checks whether reads of current request go to
+    a replica, which may not have caught up yet with changes made
+    (by any process) at `since`, a timestamp. """
+    alias = _read_alias.get()
+    return (alias is not None and alias != 'default' and not recently_written()
+            and time.time() - since < settings.READ_YOUR_WRITES_SECONDS)
+
+
+def probe(alias: str) -> float:
+    """ Function which returns round trip time of trivial query to passed
+    database, measured at most every `REPLICA_PROBE_SECONDS`. Databases
+    which fail to answer are ranked last. """
+    latency, measured_at = _latencies.get(alias, (0.0, None))
+    now = time.monotonic()
+    if measured_at is not None and now - measured_at < settings.REPLICA_PROBE_SECONDS:
+        return latency
+    start = time.perf_counter()
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+        latency = time.perf_counter() - start
+    except DatabaseError:
+        latency = float('inf')
+    _latencies[alias] = (latency, now)
+    return latency
+
+
+def choose_replica() -> Optional[str]:
+    """ Function which picks replica by `REPLICA_STRATEGY`: in turns
+    (`round_robin`) or the one answering fastest (`least_latency`). """
+    global _cycle
+    aliases = replicas()
+    if not aliases:
+        return None
+    if settings.REPLICA_STRATEGY == 'least_latency':
+        return min(aliases, key=probe)
+    with _lock:
+        if _cycle is None or _cycle[0] != aliases:
+            _cycle = (list(aliases), itertools.cycle(aliases))
+        return next(_cycle[1])
+
+
+@contextmanager
+def replica_reads() -> Iterator[Optional[str]]:
+    """ Context manager which sends reads inside it to one replica,
+    chosen on entry, so all queries of a request see the same data. """
+    alias = choose_replica()
+    token = _read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """ Database router which sends reads made inside `replica_reads()`
+    to a replica, unless this process wrote to the primary database within
+    `READ_YOUR_WRITES_SECONDS`. Writes and all other reads (admin, management
+    commands) use the primary database. """
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        alias = _read_alias.get()
+        if alias is None or recently_written():
+            return 'default'
+        return alias
+
+    def db_for_write(self, model, **hints) -> str:
+        global _last_write
+        _last_write = time.monotonic()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        return True
+
+
+class ReplicaReadsMixin:
+    """ View mixin which serves read only requests from a replica. """
+    read_only_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in self.read_only_methods:
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads():
+            return super().dispatch(request, *args, **kwargs)
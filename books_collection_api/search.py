@@ -0,0 +1,112 @@
+from typing import Iterable
+
+from django.db import connections, OperationalError
+from django.db.models import Q, QuerySet
+
+from books_collection_api.models import Book
+
+
+FTS_TABLE = 'books_collection_api_book_fts'
+INDEX_CHUNK_SIZE = 1000
+
+_available = {}
+
+
+def is_available(using: str = 'default') -> bool:
+    """ Function which checks (once per database) whether
+    the full text search table exists. """
+    if using not in _available:
+        connection = connections[using]
+        _available[using] = (connection.vendor == 'sqlite'
+                             and FTS_TABLE in connection.introspection.table_names())
+    return _available[using]
+
+
+def create_index(using: str = 'default') -> None:
+    """ Function which creates SQLite FTS5 table of books
+    and fills it, if it doesn't exist yet. """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    if FTS_TABLE in connection.introspection.table_names():
+        _available[using] = True
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"title, author, category, tokenize='unicode61 remove_diacritics 2')")
+    except OperationalError:
+        _available[using] = False
+        return
+    _available[using] = True
+    rebuild_index(using)
+
+
+def rebuild_index(using: str = 'default') -> int:
+    """ Function which indexes all books again and returns their number. """
+    if not is_available(using):
+        return 0
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    ids = list(Book.objects.using(using).values_list('pk', flat=True))
+    for start in range(0, len(ids), INDEX_CHUNK_SIZE):
+        index_books(Book.objects.using(using).filter(
+            pk__in=ids[start:start + INDEX_CHUNK_SIZE]))
+    return len(ids)
+
+
+def index_books(queryset: QuerySet) -> None:
+    """ Function which (re)indexes title, author and category of books. """
+    if not is_available(queryset.db):
+        return
+    rows = [(book.pk, book.title, str(book.author), book.category.name)
+            for book in queryset.select_related('author', 'category')]
+    with connections[queryset.db].cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [row[:1] for row in rows])
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE}(rowid, title, author, category) '
+            f'VALUES (%s, %s, %s, %s)', rows)
+
+
+def unindex_books(ids: Iterable[int], using: str = 'default') -> None:
+    """ Function which removes books from the index. """
+    if not is_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in ids])
+
+
+def match_expression(text: str) -> str:
+    """ Function which turns user input into FTS5 query matching
+    all passed words as prefixes. """
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in text.split())
+
+
+def search_books(queryset: QuerySet, text: str) -> QuerySet:
+    """ Function which filters books matching passed text in title, author
+    or category, ordered by relevance. Without FTS5 falls back to
+    case insensitive substring search. """
+    expression = match_expression(text)
+    if not expression:
+        return queryset
+    if not is_available(queryset.db):
+        condition = Q()
+        for word in text.split():
+            condition &= (Q(title__icontains=word)
+                          | Q(author__first_name__icontains=word)
+                          | Q(author__second_name__icontains=word)
+                          | Q(author__last_name__icontains=word)
+                          | Q(category__name__icontains=word))
+        return queryset.filter(condition)
+    # FTS table is joined, so it is matched once and its rank of every
+    # book is read in the same pass, not looked up again per book.
+    table = Book._meta.db_table
+    return queryset.extra(
+        select={'search_rank': f'{FTS_TABLE}.rank'},
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+        params=[expression],
+    ).order_by('search_rank', 'pk')
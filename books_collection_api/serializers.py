@@ -1,9 +1,57 @@
+import os
+from collections import defaultdict
+from operator import itemgetter
+from typing import Callable, Dict, Tuple
+
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import serializers
 
-from books_collection_api.models import Book, Opinion
+from books_collection_api import importers, jobs
+from books_collection_api.instrumentation import timed
+from books_collection_api.models import RATES, Author, Category, Book, ImportJob, Opinion, join_author_name
+
+
+class InstrumentedListSerializer(serializers.ListSerializer):
+    """ List serializer which reports time spent serializing the list
+    to instrumentation of current request. """
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
+# Database columns (lookups) read by each serialized field.
+BOOK_FIELD_COLUMNS = {
+    'title': ('title',),
+    'author': ('author__first_name', 'author__second_name', 'author__last_name'),
+    'isbn': ('isbn',),
+    'category': ('category__name',),
+    'opinions': (),
+    'opinions_count': ('opinions_count',),
+    'rating_average': ('rating_average',),
+    'rating_histogram': tuple(f'rate_{rate}_count' for rate in RATES),
+}
+
+OPINION_FIELD_COLUMNS = {
+    'book': ('book__title', 'book__isbn'),
+    'rate': ('rate',),
+    'description': ('description',),
+}
+
 
+class SparseFieldsMixin:
+    """ Serializer mixin which keeps only fields listed in `fields`
+    context entry, if there is one. """
 
-class BookSerializer(serializers.ModelSerializer):
+    def get_field_names(self, declared_fields, info):
+        names = super().get_field_names(declared_fields, info)
+        selected = self.context.get('fields')
+        return names if selected is None else [name for name in names if name in selected]
+
+
+class BookSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Serializer for Book objects. """
     author = serializers.StringRelatedField(read_only=True)
     category = serializers.StringRelatedField(read_only=True)
@@ -12,16 +60,236 @@ class BookSerializer(serializers.ModelSerializer):
         read_only=True,
         view_name='opinion-detail'
     )
+    rating_histogram = serializers.ReadOnlyField()
 
     class Meta:
         model = Book
-        fields = ['title', 'author', 'isbn', 'category', 'opinions']
+        fields = ['title', 'author', 'isbn', 'category', 'opinions',
+                  'opinions_count', 'rating_average', 'rating_histogram']
+        field_columns = BOOK_FIELD_COLUMNS
+        list_serializer_class = InstrumentedListSerializer
+
+
+class EmbeddedOpinionSerializer(serializers.ModelSerializer):
+    """ Serializer for opinions embedded in their book. """
+
+    class Meta:
+        model = Opinion
+        fields = ['rate', 'description']
 
 
-class OpinionSerializer(serializers.ModelSerializer):
+class BookExpandedSerializer(BookSerializer):
+    """ Serializer for Book objects with embedded opinions. """
+    opinions = EmbeddedOpinionSerializer(many=True, read_only=True)
+
+
+class OpinionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Serializer for Opinion objects. """
     book = serializers.StringRelatedField(read_only=True)
 
     class Meta:
         model = Opinion
         fields = ['book', 'rate', 'description']
+        field_columns = OPINION_FIELD_COLUMNS
+        list_serializer_class = InstrumentedListSerializer
+
+
+class RowListSerializer(InstrumentedListSerializer):
+    """ List serializer which represents a whole page of rows at once. """
+
+    def to_representation(self, data):
+        return self.child.to_representation_many(list(data))
+
+
+class RowSerializer(serializers.BaseSerializer):
+    """ Base of read only serializers which represent `.values()` rows
+    instead of model instances, skipping per field serialization.
+    Only fields listed in `fields` context entry (all by default)
+    are represented, and only their columns are read. """
+    field_columns: Dict[str, Tuple[str, ...]] = {}
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        kwargs['child'] = cls(context=kwargs.get('context', {}))
+        return RowListSerializer(*args, **kwargs)
+
+    @classmethod
+    def rows(cls, queryset, fields=None, extra=()):
+        """ Method which turns queryset into rows needed by the serializer
+        (for passed fields only), with `extra` columns. Rows remember the
+        queryset, which paginators count without joins the selected
+        related columns need. """
+        columns = [column for field in fields or cls.field_columns
+                   for column in cls.field_columns[field]]
+        rows = queryset.prefetch_related(None).values('pk', *dict.fromkeys((*columns, *extra)))
+        rows.count_queryset = queryset
+        return rows
+
+    def to_representation(self, instance):
+        return self.to_representation_many([instance])[0]
+
+    def to_representation_many(self, rows):
+        fields = self.context.get('fields') or tuple(self.field_columns)
+        getters = self.getters(rows, fields)
+        getters = [(field, getters[field]) for field in fields]
+        return [{field: get(row) for field, get in getters} for row in rows]
+
+    def getters(self, rows, fields) -> Dict[str, Callable[[dict], object]]:
+        """ Method which returns functions representing each field of a row.
+        Data shared by all rows is read only for passed fields. """
+        raise NotImplementedError
+
+
+class BookRowSerializer(RowSerializer):
+    """ Fast serializer for books list, equal in output to BookSerializer. """
+    field_columns = BOOK_FIELD_COLUMNS
+
+    def opinion_url(self) -> Tuple[str, str]:
+        """ Method which returns opinion URL parts around its id. """
+        url = reverse('opinion-detail', kwargs={'pk': 0})
+        request = self.context.get('request')
+        if request:
+            url = request.build_absolute_uri(url)
+        prefix, suffix = url.rsplit('/0/', 1)
+        return f'{prefix}/', f'/{suffix}'
+
+    def opinions_of(self, rows) -> dict:
+        """ Method which returns opinions representation keyed by book id. """
+        opinions = defaultdict(list)
+        if rows:
+            prefix, suffix = self.opinion_url()
+            queryset = Opinion.objects.filter(
+                book__in=[row['pk'] for row in rows]).order_by('pk').values_list('book_id', 'pk')
+            for book_id, pk in queryset:
+                opinions[book_id].append(f'{prefix}{pk}{suffix}')
+        return opinions
+
+    def getters(self, rows, fields):
+        opinions = self.opinions_of(rows) if 'opinions' in fields else {}
+        return {
+            'title': itemgetter('title'),
+            'author': lambda row: join_author_name(
+                row['author__first_name'], row['author__second_name'], row['author__last_name']),
+            'isbn': itemgetter('isbn'),
+            'category': itemgetter('category__name'),
+            'opinions': lambda row: opinions[row['pk']],
+            'opinions_count': itemgetter('opinions_count'),
+            'rating_average': itemgetter('rating_average'),
+            'rating_histogram': lambda row: {rate: row[f'rate_{rate}_count'] for rate in RATES},
+        }
+
+
+class BookExpandedRowSerializer(BookRowSerializer):
+    """ Fast serializer for books list with embedded opinions,
+    equal in output to BookExpandedSerializer. """
+
+    def opinions_of(self, rows) -> dict:
+        opinions = defaultdict(list)
+        if rows:
+            queryset = Opinion.objects.using(self.context.get('using')).filter(
+                book__in=[row['pk'] for row in rows]).order_by('pk').values_list(
+                    'book_id', 'rate', 'description')
+            for book_id, rate, description in queryset:
+                opinions[book_id].append({'rate': rate, 'description': description})
+        return opinions
+
+
+class BookExportSerializer(BookExpandedRowSerializer):
+    """ Fast serializer for catalogue export, which embeds opinions
+    instead of linking them. """
+
+
+class BookLookupSerializer(serializers.Serializer):
+    """ Serializer validating ISBNs of books looked up at once. """
+    isbns = serializers.ListField(
+        child=serializers.IntegerField(min_value=10 ** 12, max_value=10 ** 13 - 1),
+        allow_empty=False, max_length=5000)
+
+
+class OpinionRowSerializer(RowSerializer):
+    """ Fast serializer for opinions list, equal in output to OpinionSerializer. """
+    field_columns = OPINION_FIELD_COLUMNS
+
+    def getters(self, rows, fields):
+        return {
+            'book': lambda row: f"{row['book__title']}, ISBN: {row['book__isbn']}",
+            'rate': itemgetter('rate'),
+            'description': itemgetter('description'),
+        }
+
+
+class AuthorSerializer(serializers.ModelSerializer):
+    """ Author serializer class, with number of books
+    and average rate of their opinions. """
+    name = serializers.CharField(source='__str__', read_only=True)
+
+    class Meta:
+        model = Author
+        fields = ('id', 'name', 'books_count', 'opinions_count', 'rating_average')
+        list_serializer_class = InstrumentedListSerializer
+
+
+class CategorySerializer(serializers.ModelSerializer):
+    """ Category serializer class, with number of books
+    and average rate of their opinions. """
+
+    class Meta:
+        model = Category
+        fields = ('id', 'name', 'books_count', 'opinions_count', 'rating_average')
+        list_serializer_class = InstrumentedListSerializer
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    """ Import job serializer class. Jobs are created from uploaded `file`
+    or `path` of file on the server, inside `IMPORT_DIR`. Kind of data is
+    recognized by name of the file unless passed. """
+    file = serializers.FileField(write_only=True, required=False)
+    path = serializers.CharField(write_only=True, required=False)
+    kind = serializers.ChoiceField(choices=ImportJob.KINDS, required=False)
+    rows_per_second = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = ('id', 'kind', 'mode', 'source_name', 'chunk_size', 'delete_missing',
+                  'status', 'worker', 'rows_total', 'rows_processed', 'rows_per_second',
+                  'created', 'updated', 'deleted', 'error',
+                  'created_at', 'started_at', 'finished_at', 'file', 'path')
+        read_only_fields = ('source_name', 'status', 'worker', 'rows_total', 'rows_processed',
+                            'created', 'updated', 'deleted', 'error',
+                            'created_at', 'started_at', 'finished_at')
+        extra_kwargs = {'chunk_size': {'min_value': 1}}
+
+    def validate_path(self, value: str) -> str:
+        """ Method which checks whether file of passed path may be imported. """
+        if not jobs.path_allowed(value):
+            raise serializers.ValidationError('Path is outside of import directory.')
+        if not os.path.isfile(value):
+            raise serializers.ValidationError('File does not exist.')
+        return value
+
+    def validate(self, attrs: dict) -> dict:
+        if ('file' in attrs) == ('path' in attrs):
+            raise serializers.ValidationError('Pass either file or path.')
+        name = attrs['file'].name if 'file' in attrs else attrs['path']
+        attrs.setdefault('kind', importers.kind_of(name))
+        if attrs['kind'] is None:
+            raise serializers.ValidationError(
+                {'kind': f'Unknown kind of data in {os.path.basename(name)}.'})
+        return attrs
+
+    def create(self, validated_data: dict) -> ImportJob:
+        file = validated_data.pop('file', None)
+        if file is None:
+            return jobs.enqueue(**validated_data)
+        return jobs.enqueue(path=jobs.save_upload(file), uploaded=True,
+                            source_name=file.name, **validated_data)
+
+
+class LeaderboardQuerySerializer(serializers.Serializer):
+    """ Serializer validating query of leaderboard: category (all books
+    if not passed), number of books and minimum number of their opinions. """
+    category = serializers.IntegerField(min_value=1, required=False)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=settings.LEADERBOARD_SIZE, default=10)
+    min_opinions = serializers.IntegerField(
+        min_value=0, default=lambda: settings.LEADERBOARD_MIN_OPINIONS)
@@ -0,0 +1,145 @@
+from typing import Optional, Tuple
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from books_collection_api import caching, search
+from books_collection_api.models import Author, Category, Book, Opinion
+
+
+@receiver(pre_save, sender=Opinion)
+def remember_opinion_rating(sender, instance, **kwargs) -> None:
+    """ Stores book and rate of opinion being updated,
+    so its previous rating can be removed from the book. """
+    if not instance._state.adding:
+        instance._previous_rating = Opinion.objects.filter(
+            pk=instance.pk).values_list('book_id', 'rate').first()
+
+
+@receiver(post_save, sender=Opinion)
+def add_opinion_rating(sender, instance, created, raw=False, **kwargs) -> None:
+    """ Updates rating aggregates of opinion's book. """
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rating', None)
+    instance._previous_rating = None
+    if previous == (instance.book_id, int(instance.rate)):
+        return
+    if previous:
+        Book.objects.filter(pk=previous[0]).change_rating(previous[1], -1)
+        change_book_facets(previous[0], 0, -1, -int(previous[1]))
+    Book.objects.filter(pk=instance.book_id).change_rating(instance.rate, 1)
+    change_book_facets(instance.book_id, 0, 1, int(instance.rate))
+
+
+@receiver(post_delete, sender=Opinion)
+def remove_opinion_rating(sender, instance, **kwargs) -> None:
+    """ Removes deleted opinion from rating aggregates of its book. """
+    Book.objects.filter(pk=instance.book_id).change_rating(instance.rate, -1)
+    change_book_facets(instance.book_id, 0, -1, -int(instance.rate))
+
+
+def change_book_facets(book_id: int, books: int, opinions: int, rating: int) -> None:
+    """ Changes aggregates of author and category of book. """
+    for model in (Author, Category):
+        model.objects.filter(books=book_id).change_facets(books, opinions, rating)
+
+
+def book_facets(book: Book) -> Tuple[int, int, int, int]:
+    """ Returns author, category and rating aggregates
+    which book adds to aggregates of its author and category. """
+    return book.author_id, book.category_id, book.opinions_count, book.rating_sum
+
+
+def change_facets(facets: Optional[Tuple[int, int, int, int]], sign: int) -> None:
+    """ Adds (or removes, with negative sign) book with
+    passed aggregates to its author and category. """
+    if facets is None:
+        return
+    author_id, category_id, opinions, rating = facets
+    Author.objects.filter(pk=author_id).change_facets(sign, sign * opinions, sign * rating)
+    Category.objects.filter(pk=category_id).change_facets(sign, sign * opinions, sign * rating)
+
+
+@receiver(pre_save, sender=Book)
+def remember_book_facets(sender, instance, **kwargs) -> None:
+    """ Stores author, category and rating aggregates of book being updated,
+    so they can be moved to its new author and category. """
+    if not instance._state.adding:
+        instance._previous_facets = Book.objects.filter(pk=instance.pk).values_list(
+            'author_id', 'category_id', 'opinions_count', 'rating_sum').first()
+
+
+@receiver(post_save, sender=Book)
+def add_book_facets(sender, instance, created, raw=False, **kwargs) -> None:
+    """ Updates aggregates of author and category of saved book. """
+    if raw:
+        return
+    previous = getattr(instance, '_previous_facets', None)
+    instance._previous_facets = None
+    current = book_facets(instance)
+    if previous:
+        # Rating aggregates aren't saved with the book,
+        # the ones in the database move with it.
+        current = current[:2] + previous[2:]
+    if previous == current:
+        return
+    change_facets(previous, -1)
+    change_facets(current, 1)
+
+
+@receiver(post_delete, sender=Book)
+def remove_book_facets(sender, instance, **kwargs) -> None:
+    """ Removes deleted book from aggregates of its author and category.
+    Its opinions were removed from them by their own deletion. """
+    change_facets((instance.author_id, instance.category_id, 0, 0), -1)
+
+
+def create_search_index(sender, using='default', **kwargs) -> None:
+    """ Creates full text search table after migrations. """
+    search.create_index(using)
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, raw=False, using='default', **kwargs) -> None:
+    """ Updates saved book in full text search index. """
+    if not raw:
+        search.index_books(Book.objects.using(using).filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, using='default', **kwargs) -> None:
+    """ Removes deleted book from full text search index. """
+    search.unindex_books([instance.pk], using)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Category)
+def index_related_books(sender, instance, created, raw=False, using='default', **kwargs) -> None:
+    """ Updates books of renamed author or category in full text search index. """
+    if not created and not raw:
+        search.index_books(instance.books.using(using).all())
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Opinion)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Opinion)
+def invalidate_responses(sender, **kwargs) -> None:
+    """ Invalidates cached API responses after any data change. """
+    caching.invalidate()
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Category)
+def forget_identity(sender, instance, created=False, **kwargs) -> None:
+    """ Removes updated or deleted author or category from
+    the natural key cache, as its key may have changed. """
+    if not created:
+        sender.objects.cache.discard_pk(instance.pk)
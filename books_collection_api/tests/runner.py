@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """ Test runner which adds `test_replica` database, a stand-in
+    of a replica for tests of replica routing, with its own test
+    database. It is never routed to outside of these tests, as it
+    isn't listed in DATABASE_REPLICAS. """
+
+    def setup_databases(self, **kwargs):
+        """ Method which defines `test_replica` database as a copy
+        of the default one before test databases are created. """
+        default = settings.DATABASES['default']
+        if default['ENGINE'] == 'django.db.backends.sqlite3':
+            name = f'{settings.TEST_DATABASE_PREFIX}_replica.sqlite3'
+        else:
+            name = f"test_{default['NAME']}_replica"
+        settings.DATABASES.setdefault('test_replica', {
+            **default,
+            'OPTIONS': dict(default['OPTIONS']),
+            'TEST': {'NAME': name},
+        })
+        return super().setup_databases(**kwargs)
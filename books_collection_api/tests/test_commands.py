@@ -0,0 +1,552 @@
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
+from datetime import timedelta
+from typing import List
+from unittest import mock
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from books_collection_api import importers, jobs
+from books_collection_api.models import Author, Category, Book, ImportJob, ImportSource, Opinion
+from books_collection_api.search import search_books
+
+
+BOOKS_CSV = [
+    'ISBN;Tytuł;Autor;Gatunek;',
+    '9788366436572;Stażystka;Alicja Sinicka;Kryminał;',
+    '9788381257978;W głębi lasu;Harlan Coben;Kryminał;',
+    '9788381257979;Nie mów nikomu;Harlan Coben;Kryminał;',
+    '9788372783301;Brzydkie kaczątko;Hans Christian Andersen;Bajka;',
+]
+
+OPINIONS_CSV = [
+    'ISNB;Ocena;Opis;',
+    '9788366436572;4;test1;',
+    '9788366436572;3;test2;',
+    '9788381257978;5;test3;',
+    '9788381257978;5;test3;',
+]
+
+
+def write_csv(directory: str, filename: str, lines: List[str]) -> str:
+    """ Function which writes csv lines into file and returns its path. """
+    path = os.path.join(directory, filename)
+    with open(path, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+    return path
+
+
+def run_import(path: str, **options) -> str:
+    """ Function which runs import command and returns its output. """
+    out = StringIO()
+    call_command('import', path=path, stdout=out, **options)
+    return out.getvalue()
+
+
+class ImportCommandTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.books_path = write_csv(
+            self.directory.name, 'ksiazki.csv', BOOKS_CSV)
+        self.opinions_path = write_csv(
+            self.directory.name, 'opinie.csv', OPINIONS_CSV)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_import_books_row_mode(self):
+        """ Test importing books row by row. """
+        output = run_import(self.books_path)
+        self.assertIn('Successfully imported 4 books!', output)
+        self.assertEqual(Author.objects.count(), 3)
+        self.assertEqual(Category.objects.count(), 2)
+
+    def test_import_books_batch_mode(self):
+        """ Test importing books in chunks. """
+        output = run_import(self.books_path, mode='batch', chunk_size=2)
+        self.assertIn('Successfully imported 4 books!', output)
+        self.assertEqual(Book.objects.count(), 4)
+        self.assertEqual(Author.objects.count(), 3)
+        self.assertEqual(Category.objects.count(), 2)
+        author = Author.objects.get(last_name='Andersen')
+        self.assertEqual(author.second_name, 'Christian')
+        self.assertEqual(
+            list(search_books(Book.objects.all(), 'coben').values_list('isbn', flat=True)),
+            [9788381257978, 9788381257979])
+        book = Book.objects.get(isbn=9788381257979)
+        self.assertEqual(str(book.author), 'Harlan Coben')
+        self.assertEqual(str(book.category), 'Kryminał')
+
+    def test_import_books_batch_mode_skips_existing(self):
+        """ Test importing the same books twice in chunks. """
+        run_import(self.books_path)
+        output = run_import(self.books_path, mode='batch')
+        self.assertIn('No new books to import.', output)
+        self.assertEqual(Book.objects.count(), 4)
+
+    def test_import_books_batch_mode_authors_without_key(self):
+        """ Test importing books of authors saved without normalized key. """
+        author = Author.objects.create(first_name='Harlan', last_name='Coben')
+        Author.objects.update(name_key='')
+        Author.objects.cache.clear()
+        output = run_import(self.books_path, mode='batch')
+        self.assertIn('Successfully imported 4 books!', output)
+        self.assertEqual(Author.objects.count(), 3)
+        self.assertEqual(Book.objects.filter(author=author).count(), 2)
+        self.assertEqual(Author.objects.get(pk=author.pk).name_key, 'harlan coben')
+
+    def test_import_opinions_batch_mode(self):
+        """ Test importing opinions in chunks. """
+        run_import(self.books_path, mode='batch')
+        output = run_import(self.opinions_path, mode='batch', chunk_size=3)
+        self.assertIn('Successfully imported 3 opinions!', output)
+        self.assertEqual(Opinion.objects.count(), 3)
+        output = run_import(self.opinions_path, mode='batch')
+        self.assertIn('No new opinions to import.', output)
+        book = Book.objects.get(isbn=9788366436572)
+        self.assertEqual(book.opinions_count, 2)
+        self.assertEqual(book.rating_average, 3.5)
+        self.assertEqual(book.rating_histogram, {1: 0, 2: 0, 3: 1, 4: 1, 5: 0})
+
+    def test_import_opinions_batch_mode_missing_book(self):
+        """ Test importing opinions of not existing book in chunks. """
+        with self.assertRaises(CommandError) as cm:
+            run_import(self.opinions_path, mode='batch')
+        self.assertEqual(str(cm.exception),
+                         'Book with ISBN=9788366436572 does not exist')
+
+    def test_import_books_pipeline_mode(self):
+        """ Test importing books parsed by worker processes. """
+        output = run_import(
+            self.books_path, mode='pipeline', chunk_size=1, workers=2)
+        self.assertIn('Successfully imported 4 books!', output)
+        self.assertIn('Processed 4 rows', output)
+        self.assertIn('rows/sec', output)
+        self.assertRegex(output, r'peak RSS [\d.]+ MiB of writer, [\d.]+ MiB of largest worker')
+        self.assertIn('Author cache: ', output)
+        self.assertIn('Category cache: ', output)
+        self.assertEqual(Book.objects.count(), 4)
+        self.assertEqual(Author.objects.count(), 3)
+
+    def test_import_opinions_pipeline_mode(self):
+        """ Test importing opinions parsed by worker processes. """
+        run_import(self.books_path, mode='batch')
+        output = run_import(
+            self.opinions_path, mode='pipeline', chunk_size=2, workers=2)
+        self.assertIn('Successfully imported 3 opinions!', output)
+        self.assertEqual(Opinion.objects.count(), 3)
+
+    def test_import_pipeline_mode_invalid_row(self):
+        """ Test importing file with invalid row through pipeline. """
+        path = write_csv(self.directory.name, 'opinie.csv',
+                         OPINIONS_CSV[:1] + ['9788366436572;7;test;'])
+        with self.assertRaises(CommandError) as cm:
+            run_import(path, mode='pipeline', workers=1)
+        self.assertEqual(str(cm.exception),
+                         'Invalid opinion row: 9788366436572;7;test;')
+
+    def test_import_batch_mode_facets(self):
+        """ Test book counts and ratings of authors and categories
+        after importing books and opinions in chunks. """
+        run_import(self.books_path, mode='batch', chunk_size=2)
+        run_import(self.opinions_path, mode='batch', chunk_size=2)
+        category = Category.objects.get(name='Kryminał')
+        self.assertEqual((category.books_count, category.opinions_count, category.rating_average),
+                         (3, 3, 4.0))
+        author = Author.objects.get(last_name='Coben')
+        self.assertEqual((author.books_count, author.opinions_count, author.rating_average),
+                         (2, 1, 5.0))
+
+    def test_import_unknown_file(self):
+        """ Test importing file whose kind can't be recognized by its name. """
+        path = write_csv(self.directory.name, 'books.csv', BOOKS_CSV)
+        with self.assertRaises(CommandError) as cm:
+            run_import(path, mode='batch')
+        self.assertIn('Unknown kind of data', str(cm.exception))
+
+    def test_import_kind_option(self):
+        """ Test importing file of any name with kind passed. """
+        path = write_csv(self.directory.name, 'books.csv', BOOKS_CSV)
+        output = run_import(path, mode='batch', kind='books')
+        self.assertIn('Successfully imported 4 books!', output)
+        self.assertEqual(Book.objects.count(), 4)
+
+
+class IncrementalImportCommandTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def run_incremental(self, filename: str, lines: List[str], **options) -> str:
+        """ Writes csv file and imports it in incremental mode. """
+        path = write_csv(self.directory.name, filename, lines)
+        return run_import(path, mode='incremental', **options)
+
+    def test_first_import(self):
+        """ Test all rows of first imported file are inserted. """
+        output = self.run_incremental('ksiazki.csv', BOOKS_CSV)
+        self.assertIn('Books: 4 inserted, 0 updated, 0 deleted, 0 unchanged.', output)
+        self.assertEqual(Book.objects.count(), 4)
+
+    def test_unchanged_file_skipped(self):
+        """ Test file which didn't change is skipped without queries per row. """
+        self.run_incremental('ksiazki.csv', BOOKS_CSV)
+        with self.assertNumQueries(1):
+            output = self.run_incremental('ksiazki.csv', BOOKS_CSV)
+        self.assertIn('File unchanged since last import.', output)
+        self.assertIn('Books: 0 inserted, 0 updated, 0 deleted, 4 unchanged.', output)
+
+    def test_changed_books(self):
+        """ Test only changed rows are applied and vanished books are kept. """
+        self.run_incremental('ksiazki.csv', BOOKS_CSV)
+        lines = BOOKS_CSV[:2] + [
+            '9788381257978;W głębi lasu;Harlan Coben;Thriller;',
+            '9788381257979;Nie mów nikomu;Harlan Coben;Kryminał;',
+            '9788324631766;Pan Tadeusz;Adam Mickiewicz;Epopeja;',
+        ]
+        output = self.run_incremental('ksiazki.csv', lines)
+        self.assertIn('Books: 1 inserted, 1 updated, 0 deleted, 2 unchanged.', output)
+        self.assertEqual(Book.objects.get(isbn=9788381257978).category.name, 'Thriller')
+        self.assertEqual(search_books(Book.objects.all(), 'thriller').get().isbn,
+                         9788381257978)
+        self.assertEqual(Book.objects.count(), 5)
+        self.assertEqual(
+            dict(Category.objects.values_list('name', 'books_count')),
+            {'Kryminał': 2, 'Bajka': 1, 'Thriller': 1, 'Epopeja': 1})
+
+    def test_delete_missing_books(self):
+        """ Test books which vanished from the file are deleted. """
+        self.run_incremental('ksiazki.csv', BOOKS_CSV)
+        self.run_incremental('ksiazki.csv', BOOKS_CSV[:-1])
+        output = self.run_incremental('ksiazki.csv', BOOKS_CSV[:-1], delete_missing=True)
+        self.assertIn('Books: 0 inserted, 0 updated, 1 deleted, 3 unchanged.', output)
+        self.assertFalse(Book.objects.filter(isbn=9788372783301).exists())
+
+    def test_changed_opinions(self):
+        """ Test new opinions are inserted and vanished ones deleted. """
+        self.run_incremental('ksiazki.csv', BOOKS_CSV)
+        output = self.run_incremental('opinie.csv', OPINIONS_CSV)
+        self.assertIn('Opinions: 3 inserted, 0 updated, 0 deleted, 1 unchanged.', output)
+        lines = OPINIONS_CSV[:2] + ['9788366436572;5;test2;', '9788381257978;5;test3;']
+        output = self.run_incremental('opinie.csv', lines, delete_missing=True)
+        self.assertIn('Opinions: 1 inserted, 0 updated, 1 deleted, 2 unchanged.', output)
+        book = Book.objects.get(isbn=9788366436572)
+        self.assertEqual(book.opinions_count, 2)
+        self.assertEqual(book.rating_histogram, {1: 0, 2: 0, 3: 0, 4: 1, 5: 1})
+
+    def test_facets_of_moved_rated_book(self):
+        """ Test book moved with its opinions to another author and category
+        changes their aggregates as recalculating them from books does. """
+        self.run_incremental('ksiazki.csv', BOOKS_CSV)
+        self.run_incremental('opinie.csv', OPINIONS_CSV)
+        lines = BOOKS_CSV[:2] + ['9788381257978;W głębi lasu;Alicja Sinicka;Thriller;'] + BOOKS_CSV[3:]
+        self.run_incremental('ksiazki.csv', lines)
+        facets = {model: list(model.objects.order_by('pk').values_list(
+            'books_count', 'opinions_count', 'rating_sum', 'rating_average'))
+            for model in (Author, Category)}
+        for model in (Author, Category):
+            model.objects.all().refresh_facets()
+            self.assertEqual(list(model.objects.order_by('pk').values_list(
+                'books_count', 'opinions_count', 'rating_sum', 'rating_average')), facets[model])
+        author = Author.objects.get(last_name='Sinicka')
+        self.assertEqual((author.books_count, author.opinions_count, author.rating_average),
+                         (2, 3, 4.0))
+
+    def test_opinion_of_missing_book(self):
+        """ Test importing opinion of not existing book. """
+        with self.assertRaises(CommandError) as cm:
+            self.run_incremental('opinie.csv', OPINIONS_CSV)
+        self.assertEqual(str(cm.exception),
+                         'Book with ISBN=9788366436572 does not exist')
+
+
+class RebuildRatingsCommandTests(TestCase):
+
+    def test_rebuild_ratings(self):
+        """ Test recalculating rating aggregates of all books. """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        run_import(write_csv(directory.name, 'ksiazki.csv', BOOKS_CSV))
+        run_import(write_csv(directory.name, 'opinie.csv', OPINIONS_CSV))
+        Book.objects.update(opinions_count=0, rating_sum=0, rating_average=None)
+        Category.objects.update(books_count=0, opinions_count=0, rating_sum=0)
+        out = StringIO()
+        call_command('rebuild_ratings', stdout=out)
+        self.assertIn('Successfully rebuilt ratings of 4 books!', out.getvalue())
+        self.assertIn('Successfully rebuilt facets of 2 categories!', out.getvalue())
+        book = Book.objects.get(isbn=9788381257978)
+        self.assertEqual(book.opinions_count, 1)
+        self.assertEqual(book.rating_sum, 5)
+        self.assertEqual(book.rating_average, 5.0)
+        category = Category.objects.get(name='Kryminał')
+        self.assertEqual((category.books_count, category.opinions_count, category.rating_sum),
+                         (3, 3, 12))
+
+
+class RebuildSearchIndexCommandTests(TestCase):
+
+    def test_rebuild_search_index(self):
+        """ Test indexing all books again. """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        run_import(write_csv(directory.name, 'ksiazki.csv', BOOKS_CSV))
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Successfully indexed 4 books!', out.getvalue())
+        self.assertEqual(search_books(Book.objects.all(), 'lasu').get().isbn,
+                         9788381257978)
+
+
+class ImportWorkerCommandTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def run_worker(self) -> str:
+        """ Function which processes queued jobs and returns worker output. """
+        out = StringIO()
+        call_command('import_worker', once=True, stdout=out)
+        return out.getvalue()
+
+    def test_process_queued_jobs(self):
+        """ Test processing jobs in order they were queued. """
+        books = jobs.enqueue('books', write_csv(self.directory.name, 'ksiazki.csv', BOOKS_CSV),
+                             chunk_size=2)
+        opinions = jobs.enqueue('opinions', write_csv(self.directory.name, 'opinie.csv', OPINIONS_CSV))
+        output = self.run_worker()
+        self.assertIn(f'Job {books.pk} (books from {books.source_name}): 4 created', output)
+        books.refresh_from_db()
+        opinions.refresh_from_db()
+        self.assertEqual(books.status, ImportJob.SUCCEEDED)
+        self.assertEqual((books.rows_total, books.rows_processed, books.created), (4, 4, 4))
+        self.assertEqual(books.worker, jobs.worker_name())
+        self.assertIsNotNone(books.rows_per_second)
+        self.assertEqual(opinions.status, ImportJob.SUCCEEDED)
+        self.assertEqual(opinions.created, 3)
+        self.assertLessEqual(books.finished_at, opinions.started_at)
+
+    def test_progress_saved_per_chunk(self):
+        """ Test saving number of processed rows after every chunk. """
+        jobs.enqueue('books', write_csv(self.directory.name, 'ksiazki.csv', BOOKS_CSV),
+                     chunk_size=3)
+        job = jobs.claim_next('test')
+        seen = []
+
+        def import_books(file, chunk_size, progress):
+            for rows in (3, 4):
+                progress(rows)
+                seen.append(ImportJob.objects.get(pk=job.pk).rows_processed)
+            return 4
+
+        with mock.patch.dict('books_collection_api.importers.IMPORTERS', books=import_books):
+            jobs.run_job(job)
+        self.assertEqual(seen, [3, 4])
+
+    def test_failed_job(self):
+        """ Test recording error of job whose file can't be imported. """
+        job = jobs.enqueue('opinions', write_csv(self.directory.name, 'opinie.csv', OPINIONS_CSV))
+        output = self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertEqual(job.error, 'Book with ISBN=9788366436572 does not exist')
+        self.assertIsNotNone(job.finished_at)
+        self.assertIn(f'Job {job.pk} (opinions from {job.source_name}) failed', output)
+
+    def test_incremental_job_of_upload(self):
+        """ Test keeping fingerprints of uploads by name of uploaded file
+        and removing uploaded file after import. """
+        for _ in range(2):
+            path = write_csv(self.directory.name, 'upload.csv', BOOKS_CSV)
+            jobs.enqueue('books', path, uploaded=True, source_name='ksiazki.csv',
+                         mode='incremental')
+            self.run_worker()
+            self.assertFalse(os.path.exists(path))
+        first, second = ImportJob.objects.order_by('pk')
+        self.assertEqual(first.source_name, 'upload:ksiazki.csv')
+        self.assertEqual((first.created, second.created), (4, 0))
+        self.assertEqual(second.status, ImportJob.SUCCEEDED)
+        self.assertEqual(ImportSource.objects.get().path, 'upload:ksiazki.csv')
+
+    def test_claimed_job_not_claimed_again(self):
+        """ Test claiming each job by one worker only. """
+        job = jobs.enqueue('books', write_csv(self.directory.name, 'ksiazki.csv', BOOKS_CSV))
+        self.assertEqual(jobs.claim_next('first').pk, job.pk)
+        self.assertIsNone(jobs.claim_next('second'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (ImportJob.RUNNING, 'first'))
+
+    def test_identity_caches_cleared_per_job(self):
+        """ Test category renamed by other process since
+        the previous job isn't served from cache. """
+        category = Category.objects.create(name='Kryminał')
+        Category.objects.cache.set_many({'Kryminał': category})
+        Category.objects.filter(pk=category.pk).update(name='Thriller')
+        jobs.enqueue('books', write_csv(self.directory.name, 'ksiazki.csv', BOOKS_CSV))
+        self.run_worker()
+        self.assertEqual(Book.objects.get(isbn=9788381257978).category.name, 'Kryminał')
+        self.assertFalse(Book.objects.filter(category=category).exists())
+
+    def test_stale_job_queued_again(self):
+        """ Test claiming job whose worker saved no progress for too long. """
+        job = jobs.enqueue('books', write_csv(self.directory.name, 'ksiazki.csv', BOOKS_CSV))
+        jobs.claim_next('dead')
+        ImportJob.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.claim_next('alive').pk, job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (ImportJob.RUNNING, 'alive'))
+        self.assertEqual(jobs.run_job(job).status, ImportJob.SUCCEEDED)
+        self.assertEqual(Book.objects.count(), 4)
+
+    def test_job_queued_again_while_running(self):
+        """ Test worker stops importing job queued again meanwhile,
+        leaving it to the next claim. """
+        job = jobs.enqueue('books', write_csv(self.directory.name, 'ksiazki.csv', BOOKS_CSV))
+        import_books = importers.import_books
+        calls = []
+
+        def requeued_import_books(file, chunk_size, progress):
+            calls.append(ImportJob.objects.get(pk=job.pk).finished_at)
+            if len(calls) == 1:
+                ImportJob.objects.update(status=ImportJob.QUEUED, worker='')
+                progress(2)
+                self.fail('Import continued')
+            return import_books(file, chunk_size, progress)
+
+        with mock.patch.dict(importers.IMPORTERS, books=requeued_import_books):
+            output = self.run_worker()
+        self.assertIn(f'Job {job.pk} (books from {job.source_name}) was queued again', output)
+        self.assertIn(f'Job {job.pk} (books from {job.source_name}): 4 created', output)
+        self.assertEqual(calls, [None, None])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_processed), (ImportJob.SUCCEEDED, 4))
+
+
+class MergeAuthorsCommandTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Kryminał')
+        for number, name in enumerate(('Harlan Coben', 'harlan coben', 'HARLAN COBÉN', 'Alicja Sinicka')):
+            first_name, last_name = name.split()
+            author = Author.objects.create(first_name=first_name, last_name=last_name)
+            book = Book.objects.create(
+                title=f'Book {number}', isbn=9780000000000 + number, author=author, category=category)
+            Opinion.objects.create(book=book, rate=number + 1, description='test')
+
+    def run_merge(self, **options) -> str:
+        """ Function which runs merge command and returns its output. """
+        out = StringIO()
+        call_command('merge_authors', stdout=out, **options)
+        return out.getvalue()
+
+    def test_merge_duplicates(self):
+        """ Test moving books of duplicate authors to the oldest one. """
+        keeper = Author.objects.get(first_name='Harlan')
+        output = self.run_merge()
+        self.assertIn('Successfully merged 2 duplicate authors into 1 authors!', output)
+        self.assertEqual(list(Author.objects.order_by('pk').values_list('pk', 'name_key')), [
+            (keeper.pk, 'harlan coben'), (keeper.pk + 3, 'alicja sinicka')])
+        keeper.refresh_from_db()
+        self.assertEqual((keeper.books_count, keeper.opinions_count, keeper.rating_sum),
+                         (3, 3, 6))
+        self.assertEqual(search_books(Book.objects.all(), 'coben').count(), 3)
+        self.assertIn('No duplicate authors to merge.', self.run_merge())
+
+    def test_rebuild_keys(self):
+        """ Test filling missing name keys, e.g. of authors created before them. """
+        Author.objects.update(name_key='')
+        self.run_merge()
+        self.assertEqual(sorted(Author.objects.values_list('name_key', flat=True)),
+                         ['alicja sinicka', 'harlan coben'])
+
+    def test_dry_run(self):
+        """ Test printing duplicates without merging them. """
+        first, second, third = Author.objects.filter(first_name__iexact='harlan').order_by('pk')
+        output = self.run_merge(dry_run=True)
+        self.assertIn(f'Harlan Coben ({first.pk}) <- harlan coben ({second.pk}), '
+                      f'HARLAN COBÉN ({third.pk})', output)
+        self.assertIn('Would merge 2 duplicate authors into 1 authors.', output)
+        self.assertEqual(Author.objects.count(), 4)
+
+
+class ConcurrentReadersTests(TransactionTestCase):
+    READERS = 4
+    MAX_READ_SECONDS = 1
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        lines = ['ISBN;Tytuł;Autor;Gatunek;'] + [
+            f'{9780000000000 + number};Book {number};Author{number % 50} Test;Category;'
+            for number in range(3000)]
+        self.path = write_csv(directory.name, 'ksiazki.csv', lines)
+
+    def test_sqlite_pragmas(self):
+        """ Test SQLite connections are tuned for concurrent access. """
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite pragmas')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_readers_during_import(self):
+        """ Test reads neither fail nor wait for import writing in chunks,
+        and a read transaction open during the whole import doesn't
+        block it. """
+        importing = threading.Event()
+        importing.set()
+        snapshot_taken = threading.Event()
+        timings, errors, snapshot = [], [], []
+
+        def read():
+            try:
+                while importing.is_set():
+                    start = time.perf_counter()
+                    Book.objects.count()
+                    list(Book.objects.order_by('-pk').values_list('title', flat=True)[:50])
+                    timings.append(time.perf_counter() - start)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        def read_snapshot():
+            try:
+                with transaction.atomic():
+                    snapshot.append(Book.objects.count())
+                    snapshot_taken.set()
+                    while importing.is_set():
+                        time.sleep(0.01)
+                    snapshot.append(Book.objects.count())
+            except Exception as error:
+                errors.append(error)
+            finally:
+                snapshot_taken.set()
+                connection.close()
+
+        readers = [threading.Thread(target=read) for _ in range(self.READERS)]
+        readers.append(threading.Thread(target=read_snapshot))
+        for reader in readers:
+            reader.start()
+        snapshot_taken.wait()
+        try:
+            output = run_import(self.path, mode='batch', chunk_size=20)
+        finally:
+            importing.clear()
+            for reader in readers:
+                reader.join()
+        self.assertIn('Successfully imported 3000 books!', output)
+        self.assertEqual(errors, [])
+        self.assertEqual(snapshot, [0, 0])
+        self.assertGreater(len(timings), self.READERS)
+        self.assertLess(max(timings), self.MAX_READ_SECONDS)
@@ -1,8 +1,13 @@
 from typing import Optional
-from django.test import TestCase
+from unittest import skipUnless
+from django.core.exceptions import ValidationError
+from django.test import TestCase, TransactionTestCase, override_settings
 from django import db
+from django.db import transaction
 
-from books_collection_api.models import Author, Category, Book, Opinion
+from books_collection_api.identity import LRUCache
+from books_collection_api.models import Author, Category, Book, Opinion, normalize_name
+from books_collection_api.query_plans import hot_queries, full_scans
 
 
 def create_sample_author(
@@ -76,6 +81,32 @@ class AuthorTests(TestCase):
         self.assertEqual(author_obj.second_name, '')
         self.assertEqual(author_obj.last_name, 'Mickiewicz')
 
+    def test_normalized_name_key(self):
+        """ Test name key of author is case folded and without accents. """
+        author = create_sample_author(first_name='Łukasz', second_name='', last_name='ORBITOWSKI')
+        self.assertEqual(author.name_key, 'lukasz orbitowski')
+        self.assertEqual(normalize_name('  Zoë \t Ćwierć  '), 'zoe cwierc')
+        with override_settings(AUTHOR_KEY_STRIP_ACCENTS=False):
+            self.assertEqual(normalize_name('Zoë  Ćwierć'), 'zoë ćwierć')
+
+    def test_get_or_create_from_str_normalized(self):
+        """ Test names differing in case, whitespace and accents
+        resolve to the same author. """
+        author = Author.objects.get_or_create_from_str('Harlan Coben')
+        for variant in ('harlan coben', 'Harlan  Coben', 'Harlan Cobén', 'HARLAN X. COBEN'):
+            self.assertEqual(Author.objects.get_or_create_from_str(variant).pk, author.pk)
+        self.assertEqual(Author.objects.count(), 1)
+
+    def test_get_or_create_from_str_without_key(self):
+        """ Test author saved without normalized key is found
+        by its name and gets the key. """
+        author = create_sample_author(first_name='Adam', second_name='', last_name='Mickiewicz')
+        Author.objects.update(name_key='')
+        self.assertEqual(Author.objects.get_or_create_from_str('Adam Mickiewicz').pk, author.pk)
+        author.refresh_from_db()
+        self.assertEqual(author.name_key, 'adam mickiewicz')
+        self.assertEqual(Author.objects.count(), 1)
+
     def test_unique_author(self):
         """ Test class unique_constrains. """
         create_sample_author()
@@ -122,6 +153,20 @@ class BookTests(TestCase):
         self.assertEqual(str(cm.exception),
                          "UNIQUE constraint failed: books_collection_api_book.isbn")
 
+    def test_isbn_validation(self):
+        """ Test ISBN must have 13 digits. """
+        book = create_sample_book(category=self.category, author=self.author)
+        book.full_clean()
+        for isbn in (978837278330, 97883727833011):
+            book.isbn = isbn
+            with self.assertRaises(ValidationError):
+                book.full_clean()
+
+    def test_isbn_exceeding_32_bits(self):
+        """ Test 13 digits ISBN is stored without overflow. """
+        create_sample_book(isbn=9999999999999, category=self.category, author=self.author)
+        self.assertTrue(Book.objects.filter(isbn=9999999999999).exists())
+
 
 class OpinionTests(TestCase):
 
@@ -143,3 +188,232 @@ class OpinionTests(TestCase):
         create_sample_opinion(rate=1, description='Test 3', book=self.book)
         count = self.book.opinions.count()
         self.assertEqual(count, 3)
+
+
+class BookRatingTests(TestCase):
+
+    def setUp(self):
+        self.author = create_sample_author()
+        self.category = create_sample_category()
+        self.book = create_sample_book(
+            category=self.category, author=self.author)
+
+    def assertRating(self, count, total, average, histogram):
+        """ Asserts rating aggregates of tested book. """
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.opinions_count, count)
+        self.assertEqual(self.book.rating_sum, total)
+        self.assertEqual(self.book.rating_average, average)
+        self.assertEqual(self.book.rating_histogram, histogram)
+
+    def test_rating_without_opinions(self):
+        """ Test rating aggregates of book without opinions. """
+        self.assertRating(0, 0, None, {1: 0, 2: 0, 3: 0, 4: 0, 5: 0})
+
+    def test_rating_created_opinions(self):
+        """ Test rating aggregates after creating opinions. """
+        create_sample_opinion(book=self.book)
+        create_sample_opinion(rate=2, description='Test 2', book=self.book)
+        create_sample_opinion(rate=2, description='Test 3', book=self.book)
+        self.assertRating(3, 9, 3.0, {1: 0, 2: 2, 3: 0, 4: 0, 5: 1})
+
+    def test_rating_deleted_opinions(self):
+        """ Test rating aggregates after deleting opinions. """
+        opinion = create_sample_opinion(book=self.book)
+        create_sample_opinion(rate=4, description='Test 2', book=self.book)
+        opinion.delete()
+        self.assertRating(1, 4, 4.0, {1: 0, 2: 0, 3: 0, 4: 1, 5: 0})
+        Opinion.objects.all().delete()
+        self.assertRating(0, 0, None, {1: 0, 2: 0, 3: 0, 4: 0, 5: 0})
+
+    def test_rating_updated_opinion(self):
+        """ Test rating aggregates after changing opinion rate. """
+        opinion = create_sample_opinion(book=self.book)
+        opinion.rate = 1
+        opinion.save()
+        self.assertRating(1, 1, 1.0, {1: 1, 2: 0, 3: 0, 4: 0, 5: 0})
+        opinion.description = 'Changed'
+        opinion.save()
+        self.assertRating(1, 1, 1.0, {1: 1, 2: 0, 3: 0, 4: 0, 5: 0})
+
+    def test_rating_score(self):
+        """ Test Bayesian ranking score kept with rating aggregates. """
+        self.assertEqual(self.book.rating_score, 3.0)
+        opinion = create_sample_opinion(book=self.book)
+        create_sample_opinion(rate=4, description='Test 2', book=self.book)
+        self.book.refresh_from_db()
+        self.assertAlmostEqual(self.book.rating_score, (30 + 9) / 12)
+        opinion.delete()
+        self.book.refresh_from_db()
+        self.assertAlmostEqual(self.book.rating_score, (30 + 4) / 11)
+        Book.objects.update(rating_score=0)
+        Book.objects.all().refresh_ratings()
+        self.book.refresh_from_db()
+        self.assertAlmostEqual(self.book.rating_score, (30 + 4) / 11)
+
+    def test_rating_kept_by_save_of_stale_book(self):
+        """ Test saving book loaded before its opinion was created. """
+        create_sample_opinion(book=self.book)
+        self.book.title = 'Changed'
+        self.book.save()
+        self.assertRating(1, 5, 5.0, {1: 0, 2: 0, 3: 0, 4: 0, 5: 1})
+        self.assertAlmostEqual(self.book.rating_score, (30 + 5) / 11)
+        self.assertEqual(self.book.title, 'Changed')
+        self.author.refresh_from_db()
+        self.assertEqual((self.author.books_count, self.author.opinions_count), (1, 1))
+
+    def test_refresh_ratings(self):
+        """ Test recalculating rating aggregates from opinions. """
+        create_sample_opinion(book=self.book)
+        create_sample_opinion(rate=4, description='Test 2', book=self.book)
+        Book.objects.update(opinions_count=0, rating_sum=0,
+                            rating_average=None, rate_5_count=0, rate_4_count=0)
+        Book.objects.all().refresh_ratings()
+        self.assertRating(2, 9, 4.5, {1: 0, 2: 0, 3: 0, 4: 1, 5: 1})
+
+
+class FacetTests(TestCase):
+
+    def setUp(self):
+        self.author = create_sample_author()
+        self.category = create_sample_category()
+        self.book = create_sample_book(
+            category=self.category, author=self.author)
+
+    def assertFacets(self, obj, books, opinions, total, average):
+        """ Asserts aggregates of author or category. """
+        obj.refresh_from_db()
+        self.assertEqual((obj.books_count, obj.opinions_count, obj.rating_sum, obj.rating_average),
+                         (books, opinions, total, average))
+
+    def assertRefreshed(self):
+        """ Asserts that recalculated aggregates equal incrementally updated ones. """
+        fields = ('pk', 'books_count', 'opinions_count', 'rating_sum', 'rating_average')
+        for model in (Author, Category):
+            updated = list(model.objects.order_by('pk').values_list(*fields))
+            model.objects.update(books_count=0, opinions_count=0, rating_sum=0, rating_average=None)
+            model.objects.all().refresh_facets()
+            self.assertEqual(list(model.objects.order_by('pk').values_list(*fields)), updated)
+
+    def test_facets_of_created_books_and_opinions(self):
+        """ Test aggregates after creating books and opinions. """
+        create_sample_opinion(book=self.book)
+        other = create_sample_book(
+            title='Inna', isbn=9788372783302, category=self.category, author=self.author)
+        create_sample_opinion(rate=2, book=other)
+        self.assertFacets(self.author, 2, 2, 7, 3.5)
+        self.assertFacets(self.category, 2, 2, 7, 3.5)
+        self.assertRefreshed()
+
+    def test_facets_of_updated_opinion(self):
+        """ Test aggregates after changing opinion rate. """
+        opinion = create_sample_opinion(book=self.book)
+        opinion.rate = 1
+        opinion.save()
+        self.assertFacets(self.category, 1, 1, 1, 1.0)
+        self.assertRefreshed()
+
+    def test_facets_of_moved_book(self):
+        """ Test moving book with its opinions to other author and category. """
+        create_sample_opinion(book=self.book)
+        author = create_sample_author(first_name='Harlan', second_name='', last_name='Coben')
+        category = create_sample_category(name='Kryminał')
+        self.book.refresh_from_db()
+        self.book.author, self.book.category = author, category
+        self.book.save()
+        self.assertFacets(self.author, 0, 0, 0, None)
+        self.assertFacets(self.category, 0, 0, 0, None)
+        self.assertFacets(author, 1, 1, 5, 5.0)
+        self.assertFacets(category, 1, 1, 5, 5.0)
+        self.assertRefreshed()
+
+    def test_facets_kept_by_save_of_stale_objects(self):
+        """ Test renaming author and category loaded before their book got opinion. """
+        create_sample_opinion(book=self.book)
+        self.author.second_name = 'Changed'
+        self.author.save()
+        self.category.name = 'Changed'
+        self.category.save()
+        self.assertFacets(self.author, 1, 1, 5, 5.0)
+        self.assertFacets(self.category, 1, 1, 5, 5.0)
+        self.assertEqual((self.author.second_name, self.category.name), ('Changed', 'Changed'))
+
+    def test_facets_of_deleted_book(self):
+        """ Test aggregates after deleting book with its opinions. """
+        create_sample_opinion(book=self.book)
+        create_sample_opinion(rate=3, description='Test 2', book=self.book)
+        Book.objects.all().delete()
+        self.assertFacets(self.author, 0, 0, 0, None)
+        self.assertFacets(self.category, 0, 0, 0, None)
+
+
+@skipUnless(db.connection.vendor == 'sqlite', 'Query plans are checked on SQLite')
+class QueryPlanTests(TestCase):
+
+    def test_hot_queries_use_indexes(self):
+        """ Test no hot lookup reads whole table. """
+        for name, query in hot_queries().items():
+            with self.subTest(name):
+                self.assertEqual(full_scans(query()), [])
+
+    def test_full_scan_detected(self):
+        """ Test query without index is reported. """
+        queryset = Opinion.objects.filter(description='Test 1')
+        self.assertEqual(full_scans(queryset), ['books_collection_api_opinion'])
+
+
+class IdentityCacheTests(TransactionTestCase):
+
+    def setUp(self):
+        Author.objects.cache.clear()
+        Category.objects.cache.clear()
+
+    def test_resolved_objects_cached(self):
+        """ Test objects resolved again are served from cache. """
+        first = Category.objects.resolve_many(['Bajka', 'Kryminał'])
+        with self.assertNumQueries(0):
+            second = Category.objects.resolve_many(['Bajka', 'Kryminał'])
+        self.assertEqual(first, second)
+        self.assertEqual(Category.objects.cache.stats(),
+                         {'hits': 2, 'misses': 2, 'size': 2, 'hit_rate': 0.5})
+
+    def test_misses_resolved_in_one_query(self):
+        """ Test existing objects missing in cache are fetched at once. """
+        create_sample_author()
+        create_sample_author(first_name='Harlan', second_name='', last_name='Coben')
+        with self.assertNumQueries(1):
+            authors = Author.objects.resolve_many(['hans andersen', 'harlan coben'])
+        self.assertEqual(str(authors['hans andersen']), 'Hans Christian Andersen')
+
+    def test_missing_objects_created(self):
+        """ Test not existing objects are created with defaults. """
+        key = 'hans andersen'
+        author = Author.objects.resolve_many([key], {key: {
+            'first_name': 'Hans', 'second_name': 'Christian', 'last_name': 'Andersen'}})[key]
+        author = Author.objects.get(pk=author.pk)
+        self.assertEqual((author.second_name, author.name_key), ('Christian', key))
+
+    def test_rolled_back_objects_not_cached(self):
+        """ Test objects created in rolled back transaction are not cached. """
+        with transaction.atomic():
+            Category.objects.get_or_create_from_name('Bajka')
+            transaction.set_rollback(True)
+        self.assertEqual(len(Category.objects.cache), 0)
+        self.assertTrue(Category.objects.get_or_create_from_name('Bajka').pk)
+
+    def test_updated_and_deleted_objects_forgotten(self):
+        """ Test updated or deleted objects are removed from cache. """
+        category = Category.objects.get_or_create_from_name('Bajka')
+        category.name = 'Baśń'
+        category.save()
+        self.assertEqual(len(Category.objects.cache), 0)
+        Category.objects.get_or_create_from_name('Baśń').delete()
+        self.assertEqual(len(Category.objects.cache), 0)
+
+    def test_cache_bounded(self):
+        """ Test least recently used entries are evicted. """
+        cache = LRUCache(2)
+        cache.set_many({'a': 1, 'b': 2})
+        cache.get_many(['a'])
+        cache.set_many({'c': 3})
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), ({'a': 1, 'c': 3}, ['b']))
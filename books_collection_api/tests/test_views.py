@@ -1,11 +1,33 @@
+import gzip
+import json
+import os
+import unittest
+import pstats
+import subprocess
+import sys
+import tempfile
+import time
 import urllib
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
-from books_collection_api.models import Book, Opinion
-from books_collection_api.serializers import BookSerializer, OpinionSerializer
+from books_collection_api import caching, compression, leaderboards, renderers, routing, search
+from books_collection_api.models import Author, Category, Book, ImportJob, Opinion, split_author_name
+from books_collection_api.serializers import BookSerializer, BookExpandedSerializer, OpinionSerializer
+from books_collection_api.views import BookListView, BookOpinionListView, BookExportView, OpinionViewSet
 from books_collection_api.tests.test_models import (
     create_sample_author,
     create_sample_category,
@@ -39,7 +61,7 @@ class BookListViewTests(TestCase):
         books = Book.objects.all()
         serializer = BookSerializer(books, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data['results'], serializer.data)
 
     def test_retrive_books_filtered_by_title(self):
         """ Test retrieving books filtered by full title. """
@@ -49,7 +71,7 @@ class BookListViewTests(TestCase):
         book = Book.objects.get(title=title)
         serializer = BookSerializer(book)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(dict(response.data[0]), serializer.data)
+        self.assertEqual(dict(response.data['results'][0]), serializer.data)
 
     def test_retrive_book_by_title_contains(self):
         """ Test retrieving books filtered by title contains. """
@@ -59,7 +81,107 @@ class BookListViewTests(TestCase):
         book = Book.objects.get(title__icontains=title)
         serializer = BookSerializer(book)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(dict(response.data[0]), serializer.data)
+        self.assertEqual(dict(response.data['results'][0]), serializer.data)
+
+    def test_retrive_books_filtered_by_rating(self):
+        """ Test retrieving books filtered and ordered by rating. """
+        book = Book.objects.get(isbn=9321321345432)
+        create_sample_opinion(rate=4, book=book)
+        create_sample_opinion(rate=2, description='Test 2',
+                              book=Book.objects.get(isbn=9788372783301))
+        url = url_with_querystring(
+            reverse('book-list'), rating_average__gte=3)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['isbn'] for item in response.data['results']],
+                         [9321321345432])
+        self.assertEqual(response.data['results'][0]['rating_average'], 4.0)
+        self.assertEqual(response.data['results'][0]['opinions_count'], 1)
+        url = url_with_querystring(
+            reverse('book-list'), ordering='-rating_average')
+        response = self.client.get(url)
+        self.assertEqual([item['isbn'] for item in response.data['results']],
+                         [9321321345432, 9788372783301])
+
+
+class BookSearchTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        author = create_sample_author()
+        category = create_sample_category()
+        create_sample_book(category=category, author=author)
+        author = create_sample_author(
+            first_name='Adam', second_name='', last_name='Mickiewicz')
+        category = create_sample_category(name='Lektury')
+        create_sample_book(title='Dziady cz. III',
+                           isbn=9321321345432, category=category, author=author)
+        create_sample_book(title='Pan Tadeusz',
+                           isbn=9321321345433, category=category, author=author)
+
+    def search(self, text):
+        """ Returns titles of books found by passed text. """
+        url = url_with_querystring(reverse('book-list'), search=text)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book['title'] for book in response.data['results']]
+
+    def test_search_by_title(self):
+        """ Test searching books by title words and prefixes. """
+        self.assertEqual(self.search('dziady'), ['Dziady cz. III'])
+        self.assertEqual(self.search('tade'), ['Pan Tadeusz'])
+
+    def test_search_ignores_diacritics(self):
+        """ Test searching books without polish characters. """
+        self.assertEqual(self.search('kaczatko'), ['Brzydkie kaczątko'])
+
+    def test_search_by_author_and_category(self):
+        """ Test searching books by author and category. """
+        self.assertEqual(sorted(self.search('mickiewicz')),
+                         ['Dziady cz. III', 'Pan Tadeusz'])
+        self.assertEqual(self.search('andersen bajka'), ['Brzydkie kaczątko'])
+
+    def test_search_special_characters(self):
+        """ Test searching text with FTS syntax characters. """
+        self.assertEqual(self.search('"dziady" OR *'), [])
+
+    def test_search_with_title_filter(self):
+        """ Test combining search with old title filters. """
+        url = url_with_querystring(
+            reverse('book-list'), search='mickiewicz', title__contains='Pan')
+        response = self.client.get(url)
+        self.assertEqual([book['title'] for book in response.data['results']],
+                         ['Pan Tadeusz'])
+
+    def test_search_common_word(self):
+        """ Test searching word of many books matches index once per query,
+        best matches first, in list and export. """
+        author, category = Author.objects.first(), Category.objects.first()
+        Book.objects.bulk_create([
+            Book(title=f'Dom nad starym rozlewiskiem {number}', isbn=9780000000000 + number,
+                 author=author, category=category) for number in range(300)])
+        book = create_sample_book(title='Dom', isbn=9780000001000, category=category, author=author)
+        search.index_books(Book.objects.all())
+        for url in (reverse('book-list'), reverse('book-export')):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url_with_querystring(url, search='dom'))
+                books = (response.data['results'] if url == reverse('book-list')
+                         else json.loads(b''.join(response.streaming_content)))
+            self.assertEqual(books[0]['isbn'], book.isbn)
+            matches = [query['sql'].count('MATCH') for query in queries]
+            self.assertEqual(max(matches), 1, [query['sql'] for query in queries])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(books), 301)
+
+    def test_search_index_follows_changes(self):
+        """ Test search index after renaming and deleting. """
+        author = Author.objects.get(last_name='Mickiewicz')
+        author.last_name = 'Slowacki'
+        author.save()
+        self.assertEqual(self.search('mickiewicz'), [])
+        self.assertEqual(len(self.search('slowacki')), 2)
+        Book.objects.filter(title='Pan Tadeusz').delete()
+        self.assertEqual(self.search('slowacki'), ['Dziady cz. III'])
 
 
 class OpinionViewSetTests(TestCase):
@@ -78,7 +200,7 @@ class OpinionViewSetTests(TestCase):
         opinions = Opinion.objects.all()
         serializer = OpinionSerializer(opinions, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data['results'], serializer.data)
 
     def test_retrive_opinion(self):
         """ Test retrieving specific opinion. """
@@ -88,3 +210,1015 @@ class OpinionViewSetTests(TestCase):
         serializer = OpinionSerializer(opinion)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, serializer.data)
+
+
+class BookDetailViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.book = create_sample_book(
+            category=create_sample_category(), author=create_sample_author())
+        for rate, description in ((5, 'Świetna'), (2, 'Słaba'), (4, 'Dobra')):
+            create_sample_opinion(rate=rate, description=description, book=self.book)
+        create_sample_opinion(book=create_sample_book(
+            title='Dziady cz. III', isbn=9321321345432,
+            category=self.book.category, author=self.book.author))
+        self.book.refresh_from_db()
+
+    def opinions_url(self, **params):
+        """ Returns URL of opinions of sample book. """
+        return url_with_querystring(
+            reverse('book-opinion-list', args=[self.book.isbn]), **params)
+
+    def test_retrieve_book(self):
+        """ Test retrieving book by ISBN. """
+        response = self.client.get(reverse('book-detail', args=[self.book.isbn]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, BookSerializer(
+            self.book, context={'request': response.wsgi_request}).data)
+
+    def test_retrieve_book_not_found(self):
+        """ Test retrieving book of unknown ISBN. """
+        response = self.client.get(reverse('book-detail', args=[9780000000000]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_retrieve_book_expanded(self):
+        """ Test retrieving book with embedded opinions. """
+        url = url_with_querystring(reverse('book-detail', args=[self.book.isbn]), expand='opinions')
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.data, BookExpandedSerializer(self.book).data)
+        self.assertEqual([opinion['description'] for opinion in response.data['opinions']],
+                         ['Świetna', 'Słaba', 'Dobra'])
+
+    def test_books_list_expanded(self):
+        """ Test books list with embedded opinions, equal in fast and default
+        serialization, reads opinions of the whole page in one query. """
+        url = url_with_querystring(reverse('book-list'), expand='opinions')
+        with self.assertNumQueries(3):
+            fast = self.client.get(url)
+        self.assertEqual(fast.data['results'][0]['opinions'][1],
+                         {'rate': 2, 'description': 'Słaba'})
+        caching.invalidate()
+        with mock.patch.object(BookListView, 'fast_serialization', False):
+            with self.assertNumQueries(3):
+                default = self.client.get(url)
+        self.assertEqual(fast.content, default.content)
+
+    def test_invalid_expand(self):
+        """ Test expanding not supported relation. """
+        response = self.client.get(url_with_querystring(reverse('book-list'), expand='author'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_book_opinions(self):
+        """ Test listing opinions of one book. """
+        with self.assertNumQueries(3):
+            response = self.client.get(self.opinions_url())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['results'], OpinionSerializer(
+            self.book.opinions.order_by('pk'), many=True).data)
+
+    def test_book_opinions_filtered_and_ordered(self):
+        """ Test listing opinions of one book filtered and ordered by rate. """
+        response = self.client.get(self.opinions_url(rate__gte=3, ordering='-rate'))
+        self.assertEqual([opinion['rate'] for opinion in response.data['results']], [5, 4])
+        response = self.client.get(self.opinions_url(rate=2))
+        self.assertEqual([opinion['description'] for opinion in response.data['results']],
+                         ['Słaba'])
+
+    def test_book_opinions_content(self):
+        """ Test fast opinions of one book are equal to OpinionSerializer output. """
+        fast = self.client.get(self.opinions_url(ordering='rate'))
+        caching.invalidate()
+        with mock.patch.object(BookOpinionListView, 'fast_serialization', False):
+            default = self.client.get(self.opinions_url(ordering='rate'))
+        self.assertEqual(fast.content, default.content)
+
+    def test_book_opinions_not_found(self):
+        """ Test listing opinions of unknown book. """
+        response = self.client.get(reverse('book-opinion-list', args=[9780000000000]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BookLookupViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        author = create_sample_author()
+        category = create_sample_category()
+        for number in range(20):
+            book = create_sample_book(
+                title=f'Book {number}', isbn=9780000000000 + number,
+                category=category, author=author)
+            create_sample_opinion(book=book)
+
+    def test_lookup_get(self):
+        """ Test looking up books by comma separated ISBNs. """
+        url = url_with_querystring(reverse('book-lookup'), isbns='9780000000003,9780000000999')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        book = Book.objects.get(isbn=9780000000003)
+        self.assertEqual(response.data['results'], {
+            '9780000000003': BookSerializer(
+                book, context={'request': response.wsgi_request}).data,
+            '9780000000999': None,
+        })
+        self.assertEqual(response.data['missing'], [9780000000999])
+
+    def test_lookup_post(self):
+        """ Test looking up books by ISBNs in request body, in their order. """
+        isbns = [9780000000005, 9780000000001, 9780000000005]
+        response = self.client.post(reverse('book-lookup'), {'isbns': isbns}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data['results']), ['9780000000005', '9780000000001'])
+        self.assertEqual(response.data['missing'], [])
+
+    def test_lookup_query_count(self):
+        """ Test number of queries doesn't depend on number of ISBNs. """
+        for total in (1, 20, 2000):
+            isbns = [9780000000000 + number for number in range(total)]
+            with self.assertNumQueries(2):
+                response = self.client.post(reverse('book-lookup'), {'isbns': isbns}, format='json')
+            self.assertEqual(len(response.data['results']), total)
+            self.assertEqual(len(response.data['missing']), max(total - 20, 0))
+
+    def test_lookup_fields(self):
+        """ Test looking up books with chosen fields. """
+        url = url_with_querystring(
+            reverse('book-lookup'), isbns='9780000000002', fields='title')
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data['results'], {'9780000000002': {'title': 'Book 2'}})
+
+    def test_lookup_invalid(self):
+        """ Test looking up invalid, too many or no ISBNs. """
+        for isbns in (['978abc'], [123], [9780000000000 + number for number in range(5001)], []):
+            response = self.client.post(reverse('book-lookup'), {'isbns': isbns}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('book-lookup'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_books_filtered_by_isbn(self):
+        """ Test books list filtered by ISBNs. """
+        url = url_with_querystring(reverse('book-list'), isbn__in='9780000000001,9780000000004')
+        response = self.client.get(url)
+        self.assertEqual([book['title'] for book in response.data['results']], ['Book 1', 'Book 4'])
+
+
+class QueryBudgetTests(TestCase):
+    """ Tests which keep the number of queries per request constant
+    regardless of the number of returned objects. """
+    BOOK_LIST_QUERIES = 3
+    OPINION_LIST_QUERIES = 2
+    OPINION_DETAIL_QUERIES = 1
+
+    def setUp(self):
+        self.client = APIClient()
+        for number in range(5):
+            author = create_sample_author(
+                first_name=f'Author{number}', second_name='', last_name='Test')
+            category = create_sample_category(name=f'Category{number}')
+            book = create_sample_book(
+                title=f'Book {number}', isbn=9780000000000 + number,
+                category=category, author=author)
+            for rate in range(1, number + 2):
+                create_sample_opinion(
+                    rate=min(rate, 5), description=f'Test {rate}', book=book)
+
+    def test_book_list_query_budget(self):
+        """ Test number of queries of books list. """
+        with self.assertNumQueries(self.BOOK_LIST_QUERIES):
+            response = self.client.get(reverse('book-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_filtered_book_list_query_budget(self):
+        """ Test number of queries of filtered books list. """
+        url = url_with_querystring(reverse('book-list'), title__contains='Book')
+        with self.assertNumQueries(self.BOOK_LIST_QUERIES):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_opinion_list_query_budget(self):
+        """ Test number of queries of opinions list. """
+        with self.assertNumQueries(self.OPINION_LIST_QUERIES):
+            response = self.client.get(reverse('opinion-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 15)
+
+    def test_opinion_detail_query_budget(self):
+        """ Test number of queries of opinion detail. """
+        url = reverse('opinion-detail', args=[Opinion.objects.first().pk])
+        with self.assertNumQueries(self.OPINION_DETAIL_QUERIES):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class PaginationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        author = create_sample_author()
+        category = create_sample_category()
+        for number in range(7):
+            book = create_sample_book(
+                title=f'Book {number}', isbn=9780000000010 - number,
+                category=category, author=author)
+            create_sample_opinion(book=book)
+
+    def test_books_page_number(self):
+        """ Test retrieving books page by page number. """
+        url = url_with_querystring(reverse('book-list'), page=2, page_size=3)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual([book['title'] for book in response.data['results']],
+                         ['Book 3', 'Book 4', 'Book 5'])
+
+    def test_books_page_size_bounded(self):
+        """ Test page size can't exceed maximum. """
+        url = url_with_querystring(reverse('book-list'), page_size=100000)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 7)
+
+    def test_books_cursor(self):
+        """ Test walking through books with cursor pagination. """
+        url = url_with_querystring(
+            reverse('book-list'), paginate='cursor', page_size=3)
+        titles = []
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            titles += [book['title'] for book in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(titles, [f'Book {number}' for number in range(7)])
+
+    def test_books_cursor_ordered_by_isbn(self):
+        """ Test cursor pagination ordered by ISBN. """
+        url = url_with_querystring(
+            reverse('book-list'), paginate='cursor', cursor_ordering='isbn', page_size=2)
+        response = self.client.get(url)
+        self.assertEqual([book['title'] for book in response.data['results']],
+                         ['Book 6', 'Book 5'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([book['title'] for book in response.data['results']],
+                         ['Book 4', 'Book 3'])
+
+    def test_books_cursor_invalid_ordering(self):
+        """ Test cursor pagination ordered by not allowed field. """
+        url = url_with_querystring(
+            reverse('book-list'), paginate='cursor', cursor_ordering='title')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_opinions_cursor(self):
+        """ Test cursor pagination of opinions. """
+        url = url_with_querystring(
+            reverse('opinion-list'), paginate='cursor', page_size=5)
+        response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 5)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+
+
+class FastSerializationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        author = create_sample_author()
+        category = create_sample_category()
+        book = create_sample_book(category=category, author=author)
+        create_sample_opinion(book=book)
+        create_sample_opinion(rate=2, description='Zażółć "gęślą"\u2028jaźń', book=book)
+        author = create_sample_author(
+            first_name='Adam', second_name='', last_name='Mickiewicz')
+        category = create_sample_category(name='Lektury')
+        create_sample_book(title='Dziady cz. III',
+                           isbn=9321321345432, category=category, author=author)
+
+    def assertSameContent(self, view, url):
+        """ Asserts fast and default serialization render the same bytes. """
+        fast = self.client.get(url)
+        caching.invalidate()
+        with mock.patch.object(view, 'fast_serialization', False):
+            default = self.client.get(url)
+        self.assertEqual(fast.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast.content, default.content)
+
+    def test_books_list_content(self):
+        """ Test fast books list is equal to BookSerializer output. """
+        self.assertSameContent(BookListView, reverse('book-list'))
+        self.assertSameContent(BookListView, url_with_querystring(
+            reverse('book-list'), paginate='cursor', page_size=1))
+        self.assertSameContent(BookListView, url_with_querystring(
+            reverse('book-list'), search='dziady'))
+
+    @unittest.skipUnless(renderers.orjson, 'orjson is not installed')
+    def test_books_encoded_with_orjson(self):
+        """ Test books with int keyed histograms are encoded without falling back to json. """
+        url = url_with_querystring(reverse('book-list'), expand='opinions')
+        with mock.patch.object(JSONRenderer, 'render', autospec=True,
+                               side_effect=JSONRenderer.render) as fallback:
+            response = self.client.get(url)
+            fallback.assert_not_called()
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+        self.assertEqual(response.json()['results'][0]['rating_histogram']['5'], 1)
+
+    def test_opinions_list_content(self):
+        """ Test fast opinions list is equal to OpinionSerializer output. """
+        self.assertSameContent(OpinionViewSet, reverse('opinion-list'))
+
+    def test_opinion_detail_content(self):
+        """ Test opinion detail is still serialized by OpinionSerializer. """
+        opinion = Opinion.objects.last()
+        response = self.client.get(reverse('opinion-detail', args=[opinion.pk]))
+        self.assertEqual(response.data, OpinionSerializer(opinion).data)
+
+
+class FieldSelectionTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        author = create_sample_author()
+        category = create_sample_category()
+        for number in range(3):
+            book = create_sample_book(
+                title=f'Book {number}', isbn=9780000000000 + number,
+                category=category, author=author)
+            for rate in range(1, 6):
+                create_sample_opinion(rate=rate, description=f'Test {rate}', book=book)
+
+    def get(self, view, url):
+        """ Returns responses of fast and default serialization
+        with SQL of their queries. """
+        responses = []
+        for fast in (True, False):
+            caching.invalidate()
+            with mock.patch.object(view, 'fast_serialization', fast), \
+                    CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            responses.append((response, ' '.join(query['sql'] for query in queries)))
+        self.assertEqual(responses[0][0].content, responses[1][0].content)
+        return responses
+
+    def test_books_fields(self):
+        """ Test books list with chosen fields reads only their columns. """
+        url = url_with_querystring(reverse('book-list'), fields='title,isbn')
+        for response, sql in self.get(BookListView, url):
+            self.assertEqual(response.data['results'][0], {'title': 'Book 0', 'isbn': 9780000000000})
+            self.assertNotIn('books_collection_api_opinion', sql)
+            self.assertNotIn('JOIN', sql)
+            self.assertNotIn('rating_average', sql)
+
+    def test_books_fields_with_cursor(self):
+        """ Test books list with chosen fields paginated by cursor of other column. """
+        url = url_with_querystring(reverse('book-list'), paginate='cursor',
+                                   cursor_ordering='isbn', page_size=1, fields='title')
+        for response, sql in self.get(BookListView, url):
+            self.assertEqual(response.data['results'], [{'title': 'Book 0'}])
+            self.assertIsNotNone(response.data['next'])
+
+    def test_books_omit(self):
+        """ Test books list without omitted fields and their relations. """
+        url = url_with_querystring(reverse('book-list'), omit='opinions,rating_histogram')
+        for response, sql in self.get(BookListView, url):
+            self.assertEqual(list(response.data['results'][0]), [
+                'title', 'author', 'isbn', 'category', 'opinions_count', 'rating_average'])
+            self.assertNotIn('books_collection_api_opinion', sql)
+            self.assertNotIn('rate_1_count', sql)
+
+    def test_opinions_fields(self):
+        """ Test opinions list and detail with chosen fields. """
+        url = url_with_querystring(reverse('opinion-list'), fields='rate')
+        for response, sql in self.get(OpinionViewSet, url):
+            self.assertEqual(response.data['results'][0], {'rate': 1})
+            self.assertNotIn('JOIN', sql)
+            self.assertNotIn('description', sql)
+        opinion = Opinion.objects.first()
+        response = self.client.get(url_with_querystring(
+            reverse('opinion-detail', args=[opinion.pk]), omit='book'))
+        self.assertEqual(response.data, {'rate': 1, 'description': 'Test 1'})
+
+    def test_expanded_fields(self):
+        """ Test field selection of books with embedded opinions. """
+        url = url_with_querystring(reverse('book-detail', args=[9780000000001]),
+                                   fields='isbn,opinions', expand='opinions')
+        response = self.client.get(url)
+        self.assertEqual(list(response.data), ['isbn', 'opinions'])
+        self.assertEqual(len(response.data['opinions']), 5)
+
+    def test_unknown_field(self):
+        """ Test selecting fields which don't exist. """
+        for params in ({'fields': 'title,price'}, {'omit': 'price'}):
+            response = self.client.get(url_with_querystring(reverse('book-list'), **params))
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(params)), response.data)
+
+
+class CompressionTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        author = create_sample_author()
+        category = create_sample_category()
+        for number in range(100):
+            book = create_sample_book(
+                title=f'Book {number}', isbn=9780000000000 + number,
+                category=category, author=author)
+            for rate in range(1, 4):
+                create_sample_opinion(rate=rate, description=f'Test {rate}', book=book)
+        self.url = url_with_querystring(reverse('book-list'), page_size=100)
+
+    def test_accepted_encodings(self):
+        """ Test parsing of Accept-Encoding header. """
+        self.assertEqual(compression.accepted_encodings('gzip, deflate, br;q=0'),
+                         {'gzip', 'deflate'})
+        self.assertEqual(compression.accepted_encodings('br;q=0.5, GZIP; q=0.0'), {'br'})
+
+    def test_gzip_list(self):
+        """ Test books list is sent gzipped, at most a fifth of its size. """
+        plain = self.client.get(self.url)
+        compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertTrue(compressed['ETag'].startswith('W/'))
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertLess(len(compressed.content) * 5, len(plain.content),
+                        f'{len(plain.content)} -> {len(compressed.content)} bytes')
+
+    def test_weak_etag_conditional_request(self):
+        """ Test compressed response's weak ETag matches conditional request. """
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_small_response_not_compressed(self):
+        """ Test responses below minimum size are sent as they are. """
+        response = self.client.get(reverse('opinion-detail', args=[Opinion.objects.first().pk]),
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_gzip_export(self):
+        """ Test streamed export is gzipped chunk by chunk. """
+        plain = b''.join(self.client.get(reverse('book-export')).streaming_content)
+        response = self.client.get(reverse('book-export'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+    @unittest.skipUnless(compression.brotli, 'brotli is not installed')
+    def test_brotli_list(self):
+        """ Test brotli is preferred when client accepts it. """
+        plain = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content), plain.content)
+
+    def test_sparse_fields_payload(self):
+        """ Test titles only list is at most a tenth of full list,
+        also when both are gzipped. """
+        titles = url_with_querystring(reverse('book-list'), page_size=100, fields='title')
+        sizes = [len(self.client.get(url, **headers).content)
+                 for headers in ({}, {'HTTP_ACCEPT_ENCODING': 'gzip'})
+                 for url in (self.url, titles)]
+        self.assertLess(sizes[1] * 10, sizes[0], sizes)
+        self.assertLess(sizes[3] * 5, sizes[2], sizes)
+
+
+@override_settings(API_CACHE_ALIAS='default')
+class CachedResponseTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        author = create_sample_author()
+        category = create_sample_category()
+        self.book = create_sample_book(category=category, author=author)
+        self.opinion = create_sample_opinion(book=self.book)
+
+    def test_cached_book_list(self):
+        """ Test second request of books is served from cache. """
+        url = reverse('book-list')
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['Content-Type'], 'application/json')
+
+    def test_cache_keyed_by_query_string(self):
+        """ Test filtered books aren't served from cache of other filter. """
+        self.client.get(url_with_querystring(reverse('book-list'), title__contains='X'))
+        response = self.client.get(
+            url_with_querystring(reverse('book-list'), title__contains='kacz'))
+        self.assertEqual(response.json()['count'], 1)
+
+    @override_settings(ALLOWED_HOSTS=['internal.local', 'api.example.com'])
+    def test_cache_keyed_by_host(self):
+        """ Test response with absolute URLs isn't served to other host. """
+        url = reverse('book-list')
+        self.client.get(url, HTTP_HOST='internal.local')
+        response = self.client.get(url, HTTP_HOST='api.example.com', secure=True)
+        self.assertIn(b'https://api.example.com/', response.content)
+        self.assertNotIn(b'internal.local', response.content)
+
+    def test_cache_invalidated_by_write(self):
+        """ Test cached opinion is invalidated after its change. """
+        url = reverse('opinion-detail', args=[self.opinion.pk])
+        self.client.get(url)
+        self.opinion.description = 'Changed'
+        self.opinion.save()
+        response = self.client.get(url)
+        self.assertEqual(response.json()['description'], 'Changed')
+
+    def test_conditional_request(self):
+        """ Test request with matching ETag returns 304 without queries. """
+        url = reverse('book-list')
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified.content, b'')
+        not_modified = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        create_sample_opinion(rate=1, description='Test 2', book=self.book)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deferred_invalidation(self):
+        """ Test many writes inside deferred block bump version once. """
+        version = caching.get_version()
+        with caching.deferred_invalidation():
+            create_sample_opinion(rate=1, description='Test 2', book=self.book)
+            create_sample_opinion(rate=2, description='Test 3', book=self.book)
+            self.assertEqual(caching.get_version(), version)
+        self.assertNotEqual(caching.get_version(), version)
+
+
+class BookExportViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        author = create_sample_author()
+        category = create_sample_category()
+        book = create_sample_book(category=category, author=author)
+        create_sample_opinion(book=book)
+        create_sample_opinion(rate=3, description='Test 2', book=book)
+        author = create_sample_author(
+            first_name='Adam', second_name='', last_name='Mickiewicz')
+        category = create_sample_category(name='Lektury')
+        for number in range(3):
+            create_sample_book(title=f'Dziady cz. {number}',
+                               isbn=9321321345430 + number, category=category, author=author)
+
+    def export(self, **params):
+        """ Returns streamed content of export. """
+        response = self.client.get(url_with_querystring(reverse('book-export'), **params))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_export_json(self):
+        """ Test exporting all books as JSON array. """
+        with mock.patch.object(BookExportView, 'chunk_size', 2):
+            response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'application/json')
+        books = json.loads(content)
+        self.assertEqual(len(books), 4)
+        self.assertEqual(books[0]['title'], 'Brzydkie kaczątko')
+        self.assertEqual(books[0]['author'], 'Hans Christian Andersen')
+        self.assertEqual(books[0]['opinions'], [
+            {'rate': 5, 'description': 'Test 1'},
+            {'rate': 3, 'description': 'Test 2'}])
+        self.assertEqual(books[1]['opinions'], [])
+
+    def test_export_ndjson(self):
+        """ Test exporting all books as newline delimited JSON. """
+        with mock.patch.object(BookExportView, 'chunk_size', 3):
+            response, content = self.export(output='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = content.decode().splitlines()
+        self.assertEqual([json.loads(line)['isbn'] for line in lines],
+                         [9788372783301, 9321321345430, 9321321345431, 9321321345432])
+
+    def test_export_filtered(self):
+        """ Test exporting books matching filters. """
+        response, content = self.export(title__contains='Dziady', ordering='-title')
+        self.assertEqual([book['title'] for book in json.loads(content)],
+                         ['Dziady cz. 2', 'Dziady cz. 1', 'Dziady cz. 0'])
+
+    def test_export_empty(self):
+        """ Test exporting no books. """
+        response, content = self.export(title__iexact='None')
+        self.assertEqual(content, b'[]')
+
+    def test_export_invalid_output(self):
+        """ Test exporting into unknown format. """
+        response = self.client.get(url_with_querystring(reverse('book-export'), output='xml'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncViewTests(TransactionTestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.async_client = AsyncClient()
+        author = create_sample_author()
+        category = create_sample_category()
+        book = create_sample_book(category=category, author=author)
+        create_sample_opinion(book=book)
+        create_sample_opinion(rate=3, description='Test 2', book=book)
+
+    def assertSameAsSync(self, async_url, sync_url):
+        """ Asserts async view responds the same as its sync counterpart. """
+        response = async_to_sync(self.async_client.get)(async_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), self.client.get(sync_url).json())
+
+    def test_async_book_list(self):
+        """ Test async books list. """
+        self.assertSameAsSync(
+            url_with_querystring(reverse('async-book-list'), title__contains='kacz'),
+            url_with_querystring(reverse('book-list'), title__contains='kacz'))
+
+    def test_async_opinions(self):
+        """ Test async opinions list and detail. """
+        self.assertSameAsSync(reverse('async-opinion-list'), reverse('opinion-list'))
+        pk = Opinion.objects.first().pk
+        self.assertSameAsSync(reverse('async-opinion-detail', args=[pk]),
+                              reverse('opinion-detail', args=[pk]))
+
+    def test_async_view_queries_measured(self):
+        """ Test queries run by async view in worker thread are measured. """
+        response = async_to_sync(self.async_client.get)(reverse('async-opinion-list'))
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+    def test_async_opinion_not_found(self):
+        """ Test async opinion detail of not existing opinion. """
+        response = async_to_sync(self.async_client.get)(
+            reverse('async-opinion-detail', args=[1000]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        author = create_sample_author()
+        category = create_sample_category()
+        book = create_sample_book(category=category, author=author)
+        create_sample_opinion(book=book)
+        caching.invalidate()
+
+    def test_server_timing_header(self):
+        """ Test request measurements in Server-Timing header. """
+        response = self.client.get(reverse('opinion-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response['Server-Timing'],
+                         r'^db;dur=[\d.]+;desc="2 queries", serialize;dur=[\d.]+, '
+                         r'render;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_metrics(self):
+        """ Test endpoint histograms served in Prometheus text format. """
+        self.client.get(reverse('opinion-detail', args=[Opinion.objects.first().pk]))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        labels = 'endpoint="opinion-detail",method="GET",status="200"'
+        self.assertIn('# TYPE api_request_duration_seconds histogram', text)
+        self.assertIn(f'api_request_db_queries_bucket{{{labels},le="1"}}', text)
+        self.assertIn(f'api_response_size_bytes_count{{{labels}}}', text)
+        self.assertIn('# TYPE api_identity_cache_hits_total counter', text)
+
+    def test_slow_request_profile(self):
+        """ Test profile of sampled request slower than threshold is saved. """
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(API_PROFILE_SAMPLE_RATE=1, API_PROFILE_SLOW_SECONDS=0,
+                                   API_PROFILE_DIR=directory):
+                self.client.get(reverse('opinion-list'))
+            profiles = list(Path(directory).glob('*-GET-opinion-list-*ms.prof'))
+            self.assertEqual(len(profiles), 1)
+            self.assertTrue(pstats.Stats(str(profiles[0])).total_calls)
+
+    def test_fast_request_not_profiled(self):
+        """ Test profile of sampled request faster than threshold is not saved. """
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(API_PROFILE_SAMPLE_RATE=1, API_PROFILE_SLOW_SECONDS=60,
+                                   API_PROFILE_DIR=directory):
+                self.client.get(reverse('opinion-list'))
+            self.assertEqual(list(Path(directory).iterdir()), [])
+
+
+class LeaderboardViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        author = create_sample_author()
+        self.category = create_sample_category()
+        other_category = create_sample_category(name='Kryminał')
+        # Rates of opinions of each book, from the best ranked one.
+        rates = {'Popular': [5] * 20 + [4] * 5, 'Good': [4] * 6, 'Single': [5], 'Weak': [2] * 8}
+        for number, (title, book_rates) in enumerate(rates.items()):
+            book = create_sample_book(
+                title=title, isbn=9780000000000 + number, category=self.category, author=author)
+            for rate in book_rates:
+                create_sample_opinion(rate=rate, book=book)
+        book = create_sample_book(
+            title='Other', isbn=9780000000099, category=other_category, author=author)
+        create_sample_opinion(rate=5, book=book)
+        leaderboards.boards().clear()
+
+    def get_titles(self, **params) -> list:
+        """ Function which returns titles of books on leaderboard. """
+        response = self.client.get(url_with_querystring(reverse('leaderboard'), **params))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book['title'] for book in response.data['results']]
+
+    def test_leaderboard_of_category(self):
+        """ Test ranking books by Bayesian average, not plain average. """
+        response = self.client.get(url_with_querystring(
+            reverse('leaderboard'), category=self.category.pk, min_opinions=1))
+        self.assertEqual(response.data['category'], self.category.pk)
+        self.assertEqual(response.data['results'][0], {
+            'isbn': 9780000000000, 'title': 'Popular', 'author': 'Hans Christian Andersen',
+            'category': 'Bajka', 'opinions_count': 25, 'rating_average': 4.8,
+            'rating_score': round((30 + 120) / 35, 4)})
+        self.assertEqual([book['title'] for book in response.data['results']],
+                         ['Popular', 'Good', 'Single', 'Weak'])
+
+    def test_minimum_opinions_and_limit(self):
+        """ Test skipping books with few opinions and limiting results. """
+        self.assertEqual(self.get_titles(category=self.category.pk), ['Popular', 'Good', 'Weak'])
+        self.assertEqual(self.get_titles(min_opinions=1, limit=2), ['Popular', 'Good'])
+        self.assertEqual(self.get_titles(category=self.category.pk, min_opinions=7),
+                         ['Popular', 'Weak'])
+
+    def test_served_from_memory(self):
+        """ Test leaderboard is read once, without opinions, until data changes. """
+        with CaptureQueriesContext(connection) as queries:
+            self.get_titles(min_opinions=1)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('books_collection_api_opinion', queries[0]['sql'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_titles(min_opinions=1, limit=1), ['Popular'])
+        create_sample_opinion(rate=1, book=Book.objects.get(title='Single'))
+        self.assertEqual(self.get_titles(min_opinions=1),
+                         ['Popular', 'Good', 'Other', 'Single', 'Weak'])
+
+    def test_invalid_query(self):
+        """ Test rejecting limit above leaderboard size. """
+        url = url_with_querystring(reverse('leaderboard'), limit=settings.LEADERBOARD_SIZE + 1)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('limit', response.data)
+
+
+class FacetViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.author = create_sample_author()
+        self.other_author = create_sample_author(first_name='Harlan', second_name='', last_name='Coben')
+        self.category = create_sample_category()
+        self.other_category = create_sample_category(name='Kryminał')
+        book = create_sample_book(category=self.category, author=self.author)
+        create_sample_opinion(rate=4, book=book)
+        for number in range(2):
+            book = create_sample_book(
+                title=f'Book {number}', isbn=9780000000000 + number,
+                category=self.other_category, author=self.other_author)
+            create_sample_opinion(rate=5, book=book)
+
+    def test_category_list(self):
+        """ Test retrieving categories with their book counts, most books first. """
+        url = url_with_querystring(reverse('category-list'), ordering='-books_count')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [
+            {'id': self.other_category.pk, 'name': 'Kryminał', 'books_count': 2,
+             'opinions_count': 2, 'rating_average': 5.0},
+            {'id': self.category.pk, 'name': 'Bajka', 'books_count': 1,
+             'opinions_count': 1, 'rating_average': 4.0},
+        ])
+
+    def test_author_detail(self):
+        """ Test retrieving author with book count. """
+        response = self.client.get(reverse('author-detail', args=[self.author.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'id': self.author.pk, 'name': 'Hans Christian Andersen', 'books_count': 1,
+            'opinions_count': 1, 'rating_average': 4.0})
+
+    def test_empty_facets_filtered_out(self):
+        """ Test skipping authors without books. """
+        Book.objects.filter(author=self.author).delete()
+        url = url_with_querystring(reverse('author-list'), books_count__gte=1)
+        response = self.client.get(url)
+        self.assertEqual([item['id'] for item in response.data['results']], [self.other_author.pk])
+
+    def test_books_filtered_by_facets(self):
+        """ Test filtering books by category and author id without looking them up. """
+        url = url_with_querystring(reverse('book-list'), category=self.other_category.pk)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.data['count'], 2)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'FROM "books_collection_api_category"' in query['sql']])
+        url = url_with_querystring(reverse('book-list'), author=self.author.pk)
+        response = self.client.get(url)
+        self.assertEqual([book['title'] for book in response.data['results']], ['Brzydkie kaczątko'])
+
+    def test_books_filtered_by_author_name(self):
+        """ Test filtering books by normalized author name and its prefix. """
+        for params in ({'author_name': 'harlan  COBEN'}, {'author_name': 'Harlan X. Cobén'},
+                       {'author_name__startswith': 'harl'}, {'author_name__startswith': 'Harlan C'}):
+            response = self.client.get(url_with_querystring(reverse('book-list'), **params))
+            self.assertEqual(response.data['count'], 2, params)
+        response = self.client.get(url_with_querystring(reverse('book-list'), author_name='Coben'))
+        self.assertEqual(response.data['count'], 0)
+        response = self.client.get(url_with_querystring(
+            reverse('book-list'), author_name__startswith='hans christian'))
+        self.assertEqual(response.data['count'], 0)
+
+    def test_books_filtered_by_one_word_author_name(self):
+        """ Test filtering books by author known by a single name. """
+        first_name, second_name, last_name = split_author_name('Homer')
+        author = create_sample_author(first_name=first_name, second_name=second_name, last_name=last_name)
+        create_sample_book(title='Odyseja', isbn=9780000000100, category=self.category, author=author)
+        for value in ('Homer', ' homer '):
+            response = self.client.get(url_with_querystring(reverse('book-list'), author_name=value))
+            self.assertEqual([book['title'] for book in response.data['results']], ['Odyseja'], value)
+
+
+@override_settings(IMPORT_UPLOAD_DIR=Path(tempfile.gettempdir()) / 'books_collection_api_test_imports')
+class ImportJobViewSetTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user('admin', password='secret', is_staff=True))
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def upload(self, name: str, **data):
+        """ Function which uploads csv file of passed name. """
+        file = SimpleUploadedFile(name, b'ISBN;Tytul;Autor;Gatunek;\n', content_type='text/csv')
+        return self.client.post(reverse('importjob-list'), {'file': file, **data}, format='multipart')
+
+    def test_upload_queues_job(self):
+        """ Test queueing import of uploaded file without processing it. """
+        response = self.upload('ksiazki.csv', mode='incremental')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = ImportJob.objects.get()
+        self.addCleanup(os.remove, job.path)
+        self.assertEqual(response['Location'], f'http://testserver/api/imports/{job.pk}/')
+        self.assertEqual(response.data['status'], ImportJob.QUEUED)
+        self.assertEqual((job.kind, job.mode, job.source_name, job.uploaded),
+                         ('books', 'incremental', 'upload:ksiazki.csv', True))
+        self.assertEqual(Path(job.path).parent, settings.IMPORT_UPLOAD_DIR)
+        self.assertTrue(os.path.isfile(job.path))
+        self.assertNotIn('path', response.data)
+
+    def test_upload_unknown_kind(self):
+        """ Test uploading file whose kind can't be recognized by its name. """
+        response = self.upload('data.csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('kind', response.data)
+        response = self.upload('data.csv', kind='opinions')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.addCleanup(os.remove, ImportJob.objects.get().path)
+
+    def test_path_inside_import_dir(self):
+        """ Test queueing import of file on the server, only inside IMPORT_DIR. """
+        path = os.path.join(self.directory.name, 'opinie.csv')
+        Path(path).touch()
+        response = self.client.post(reverse('importjob-list'), {'path': path}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['path'], ['Path is outside of import directory.'])
+        with override_settings(IMPORT_DIR=self.directory.name):
+            response = self.client.post(reverse('importjob-list'), {'path': path}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = ImportJob.objects.get()
+        self.assertEqual((job.kind, job.path, job.uploaded), ('opinions', path, False))
+
+    def test_job_progress(self):
+        """ Test reading progress of job. """
+        job = ImportJob.objects.create(
+            kind='books', path='ksiazki.csv', source_name='ksiazki.csv',
+            status=ImportJob.RUNNING, rows_total=100, rows_processed=40,
+            started_at=timezone.now() - timedelta(seconds=2))
+        response = self.client.get(reverse('importjob-detail', args=[job.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['rows_processed'], 40)
+        self.assertEqual(response.data['rows_total'], 100)
+        self.assertAlmostEqual(response.data['rows_per_second'], 20, delta=5)
+        response = self.client.get(url_with_querystring(reverse('importjob-list'), status='running'))
+        self.assertEqual([item['id'] for item in response.data['results']], [job.pk])
+
+    def test_staff_only(self):
+        """ Test rejecting requests of anonymous and not staff users. """
+        self.client.force_authenticate(None)
+        response = self.client.get(reverse('importjob-list'))
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        self.client.force_authenticate(User.objects.create_user('user'))
+        response = self.upload('ksiazki.csv')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(ImportJob.objects.exists())
+
+
+@override_settings(DATABASE_REPLICAS=['test_replica'], READ_YOUR_WRITES_SECONDS=0)
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', 'test_replica'}
+
+    def setUp(self):
+        self.client = APIClient()
+        create_sample_book(category=create_sample_category(), author=create_sample_author())
+        author = Author.objects.using('test_replica').create(first_name='Adam', last_name='Mickiewicz')
+        category = Category.objects.using('test_replica').create(name='Epopeja')
+        Book.objects.using('test_replica').create(
+            title='Pan Tadeusz', isbn=9788324631766, category=category, author=author)
+        caching.invalidate()
+
+    def titles(self, url: str) -> list:
+        """ Returns titles of books listed by passed URL. """
+        return [book['title'] for book in self.client.get(url).json()['results']]
+
+    def test_api_reads_from_replica(self):
+        """ Test read only API is served from replica. """
+        self.assertEqual(self.titles(reverse('book-list')), ['Pan Tadeusz'])
+        response = self.client.get(reverse('book-export'))
+        self.assertEqual(json.loads(b''.join(response.streaming_content))[0]['title'],
+                         'Pan Tadeusz')
+
+    @override_settings(READ_YOUR_WRITES_SECONDS=60)
+    def test_reads_after_write_from_primary(self):
+        """ Test reads shortly after a write are served from primary database. """
+        self.assertEqual(self.titles(reverse('book-list')), ['Brzydkie kaczątko'])
+
+    def test_other_reads_from_primary(self):
+        """ Test reads outside the API (admin, commands) use primary database. """
+        self.assertEqual(list(Book.objects.values_list('title', flat=True)),
+                         ['Brzydkie kaczątko'])
+
+    @override_settings(READ_YOUR_WRITES_SECONDS=60)
+    def test_lagging_reads_not_cached(self):
+        """ Test responses and leaderboards read from replica
+        shortly after data changed are not cached. """
+        leaderboards.boards().clear()
+        with mock.patch.object(routing, '_last_write', 0.0):
+            self.assertEqual(self.titles(reverse('book-list')), ['Pan Tadeusz'])
+            self.client.get(reverse('leaderboard'), {'min_opinions': 0})
+            Book.objects.using('test_replica').filter(isbn=9788324631766).update(title='Dziady')
+            self.assertEqual(self.titles(reverse('book-list')), ['Dziady'])
+        self.assertEqual(len(leaderboards.boards()), 0)
+
+    @override_settings(DATABASE_REPLICAS=['test_replica', 'default'])
+    def test_round_robin(self):
+        """ Test replicas are chosen in turns. """
+        self.assertEqual([routing.choose_replica() for _ in range(4)],
+                         ['test_replica', 'default', 'test_replica', 'default'])
+
+    @override_settings(REPLICA_STRATEGY='least_latency', REPLICA_PROBE_SECONDS=60)
+    def test_least_latency(self):
+        """ Test replica answering fastest is chosen. """
+        with mock.patch.dict(routing._latencies, {
+                'test_replica': (0.002, time.monotonic()), 'default': (0.001, time.monotonic())}):
+            with override_settings(DATABASE_REPLICAS=['test_replica', 'default']):
+                self.assertEqual(routing.choose_replica(), 'default')
+            self.assertEqual(routing.choose_replica(), 'test_replica')
+
+
+class ApiProfileTests(TestCase):
+    # Serves the API root and a browser request with WSGI entry point
+    # of API-only profile, reporting statuses and loaded middleware.
+    CODE = """
+import json, sys
+from wsgiref.util import setup_testing_defaults
+from app.wsgi_api import application
+statuses = []
+for accept in ('application/json', 'text/html'):
+    environ = {'PATH_INFO': '/api/', 'HTTP_ACCEPT': accept}
+    setup_testing_defaults(environ)
+    b''.join(application(environ, lambda status, headers: statuses.append(status)))
+print(json.dumps({'statuses': statuses, 'modules': [name for name in (
+    'django.contrib.sessions.middleware', 'django.contrib.auth.middleware',
+    'django.contrib.auth.models', 'rest_framework.renderers') if name in sys.modules]}))
+"""
+
+    def test_api_profile(self):
+        """ Test API-only profile serves JSON API without sessions,
+        authentication and browsable API. """
+        process = subprocess.run(
+            [sys.executable, '-c', self.CODE], cwd=settings.BASE_DIR, capture_output=True,
+            text=True, env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'app.settings_api'})
+        self.assertEqual(process.returncode, 0, process.stderr)
+        result = json.loads(process.stdout)
+        self.assertEqual(result['statuses'], ['200 OK', '406 Not Acceptable'])
+        self.assertEqual(result['modules'], ['rest_framework.renderers'])
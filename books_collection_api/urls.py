@@ -2,13 +2,25 @@ from rest_framework.routers import DefaultRouter
 
 from django.urls import path, include
 
-from .views import BookListView, OpinionViewSet
+from . import async_views
+from .views import AuthorViewSet, CategoryViewSet, BookListView, BookDetailView, BookLookupView, BookOpinionListView, BookExportView, ImportJobViewSet, LeaderboardView, OpinionViewSet
 
 router = DefaultRouter()
+router.register(r'authors', AuthorViewSet)
+router.register(r'categories', CategoryViewSet)
 router.register(r'opinions', OpinionViewSet)
+router.register(r'imports', ImportJobViewSet)
 
 
 urlpatterns = [
     path('', include(router.urls)),
     path('books/', BookListView.as_view(), name='book-list'),
+    path('books/export/', BookExportView.as_view(), name='book-export'),
+    path('books/lookup/', BookLookupView.as_view(), name='book-lookup'),
+    path('books/<int:isbn>/', BookDetailView.as_view(), name='book-detail'),
+    path('books/<int:isbn>/opinions/', BookOpinionListView.as_view(), name='book-opinion-list'),
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('async/books/', async_views.book_list, name='async-book-list'),
+    path('async/opinions/', async_views.opinion_list, name='async-opinion-list'),
+    path('async/opinions/<int:pk>/', async_views.opinion_detail, name='async-opinion-detail'),
 ]
@@ -0,0 +1,12 @@
+from itertools import islice
+from typing import Iterable, Iterator
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    """ Function which splits iterable into lists of passed size. """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
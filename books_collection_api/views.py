@@ -1,18 +1,331 @@
-from rest_framework import generics, viewsets, mixins
+from typing import Optional, Tuple
 
-from books_collection_api.models import Book, Opinion
-from books_collection_api.serializers import BookSerializer, OpinionSerializer
-from books_collection_api.filters import BookFilter
+from django.db import router
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, viewsets, mixins, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
 
+from books_collection_api import leaderboards
+from books_collection_api.caching import CachedResponseMixin
+from books_collection_api.models import Author, Category, Book, ImportJob, Opinion
+from books_collection_api.pagination import KeysetPagination, PageNumberOrKeysetPagination
+from books_collection_api.renderers import FastJSONRenderer
+from books_collection_api.routing import ReplicaReadsMixin
+from books_collection_api.serializers import (
+    AuthorSerializer,
+    CategorySerializer,
+    BookSerializer,
+    BookExpandedSerializer,
+    BookRowSerializer,
+    BookExpandedRowSerializer,
+    BookExportSerializer,
+    BookLookupSerializer,
+    ImportJobSerializer,
+    LeaderboardQuerySerializer,
+    OpinionSerializer,
+    OpinionRowSerializer
+)
+from books_collection_api.filters import AuthorFilter, CategoryFilter, BookFilter, OpinionFilter
+from books_collection_api.utils import chunked
 
-class BookListView(generics.ListAPIView):
+
+class RowSerializationMixin:
+    """ View mixin which serializes lists from `.values()` rows with
+    `row_serializer_class` when `fast_serialization` is enabled. """
+    row_serializer_class = None
+    fast_serialization = True
+
+    def selected_fields(self) -> Optional[Tuple[str, ...]]:
+        """ Method which returns serialized fields, None if all of them. """
+        return None
+
+    def use_rows(self) -> bool:
+        """ Method which checks whether list is serialized from rows. """
+        return self.fast_serialization and getattr(self, 'action', 'list') == 'list'
+
+    def get_row_serializer_class(self):
+        """ Method which returns serializer of `.values()` rows. """
+        return self.row_serializer_class
+
+    def get_serializer_class(self):
+        if self.use_rows():
+            return self.get_row_serializer_class()
+        return super().get_serializer_class()
+
+    def cursor_columns(self, queryset) -> Tuple[str, ...]:
+        """ Method which returns columns keyset pagination of the request
+        seeks by, which rows must contain whichever fields are selected. """
+        paginator = self.paginator
+        if isinstance(paginator, PageNumberOrKeysetPagination):
+            paginator = paginator.get_paginator(self.request)
+        if not isinstance(paginator, KeysetPagination):
+            return ()
+        return tuple(field.lstrip('-') for field in paginator.get_ordering(self.request, queryset, self))
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.use_rows():
+            return self.get_row_serializer_class().rows(
+                queryset, self.selected_fields(), self.cursor_columns(queryset))
+        return queryset
+
+
+class FieldSelectionMixin:
+    """ View mixin which serializes only fields listed in `?fields=`, or all
+    but those listed in `?omit=` (comma separated). Columns of other fields
+    are not selected and their relations are neither joined nor prefetched. """
+    selection_params = ('fields', 'omit')
+
+    def selected_fields(self) -> Optional[Tuple[str, ...]]:
+        """ Method which returns serialized fields, None if all of them. """
+        columns = self.serializer_class.Meta.field_columns
+        names = {param: {name for name in self.request.query_params.get(param, '').split(',') if name}
+                 for param in self.selection_params}
+        for param, fields in names.items():
+            if fields - set(columns):
+                raise ValidationError({param: f'Allowed values: {", ".join(columns)}'})
+        fields = tuple(name for name in columns if (name in names['fields'] or not names['fields'])
+                       and name not in names['omit'])
+        return None if len(fields) == len(columns) else fields
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.selected_fields()
+        if fields is None:
+            return queryset
+        columns = [column for field in fields
+                   for column in self.serializer_class.Meta.field_columns[field]]
+        related = {column.split('__')[0] for column in columns if '__' in column}
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        prefetches = [lookup for lookup in queryset._prefetch_related_lookups
+                      if getattr(lookup, 'prefetch_to', lookup).split('__')[0] in fields]
+        return queryset.prefetch_related(None).prefetch_related(*prefetches).only(*columns)
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'fields': self.selected_fields()}
+
+
+class OpinionExpansionMixin:
+    """ Book view mixin which embeds opinions in books, instead of linking
+    them, when `?expand=opinions` is passed. Opinions of all books
+    are read with one query. """
+    expanded_serializer_class = BookExpandedSerializer
+    expanded_row_serializer_class = BookExpandedRowSerializer
+    expandable = ('opinions',)
+
+    def expand_opinions(self) -> bool:
+        """ Method which checks whether opinions should be embedded. """
+        expand = {name for name in self.request.query_params.get('expand', '').split(',') if name}
+        if expand - set(self.expandable):
+            raise ValidationError({'expand': f'Allowed values: {", ".join(self.expandable)}'})
+        return 'opinions' in expand
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.expand_opinions():
+            queryset = queryset.prefetch_related(None).prefetch_related(
+                Prefetch('opinions', queryset=Opinion.objects.order_by('pk')))
+        return queryset
+
+    def get_row_serializer_class(self):
+        if self.expand_opinions():
+            return self.expanded_row_serializer_class
+        return super().get_row_serializer_class()
+
+    def get_serializer_class(self):
+        serializer_class = super().get_serializer_class()
+        if serializer_class is self.serializer_class and self.expand_opinions():
+            return self.expanded_serializer_class
+        return serializer_class
+
+
+BOOKS = Book.objects.select_related('author', 'category').prefetch_related(
+    Prefetch('opinions', queryset=Opinion.objects.only('id', 'book_id'))).order_by('pk')
+
+
+class BookListView(ReplicaReadsMixin, CachedResponseMixin, FieldSelectionMixin,
+                   OpinionExpansionMixin, RowSerializationMixin, generics.ListAPIView):
     """ List view of books. """
+    queryset = BOOKS
+    serializer_class = BookSerializer
+    row_serializer_class = BookRowSerializer
+    filterset_class = BookFilter
+    cursor_ordering_fields = ('pk', 'isbn')
+
+
+class BookDetailView(ReplicaReadsMixin, CachedResponseMixin, FieldSelectionMixin,
+                     OpinionExpansionMixin, generics.RetrieveAPIView):
+    """ Detail view of book, looked up by ISBN. """
+    queryset = BOOKS
+    serializer_class = BookSerializer
+    lookup_field = 'isbn'
+
+
+class BookOpinionListView(ReplicaReadsMixin, CachedResponseMixin, FieldSelectionMixin,
+                          RowSerializationMixin, generics.ListAPIView):
+    """ List view of opinions of one book, looked up by ISBN. """
+    queryset = Opinion.objects.select_related('book').order_by('pk')
+    serializer_class = OpinionSerializer
+    row_serializer_class = OpinionRowSerializer
+    filterset_class = OpinionFilter
+
+    def get_queryset(self):
+        book = get_object_or_404(Book.objects.only('pk'), isbn=self.kwargs['isbn'])
+        return super().get_queryset().filter(book=book)
+
+
+class BookLookupView(ReplicaReadsMixin, CachedResponseMixin, FieldSelectionMixin,
+                     generics.GenericAPIView):
+    """ Lookup of many books by ISBN at once, passed as comma separated
+    `?isbns=` or `{"isbns": [...]}` POST body. Results are keyed by ISBN,
+    with None for ISBNs of no book, which are also listed in `missing`.
+    Books are read with one query (and their opinions with another),
+    whatever the number of ISBNs. """
     queryset = Book.objects.all()
     serializer_class = BookSerializer
+    row_serializer_class = BookRowSerializer
+    pagination_class = None
+    read_only_methods = (*ReplicaReadsMixin.read_only_methods, 'POST')
+
+    def get(self, request, *args, **kwargs):
+        isbns = [isbn for isbn in request.query_params.get('isbns', '').split(',') if isbn]
+        return self.cached_response(self.lookup, request, {'isbns': isbns})
+
+    def post(self, request, *args, **kwargs):
+        return self.lookup(request, request.data)
+
+    def lookup(self, request, data):
+        """ Method which returns books of ISBNs in passed data. """
+        lookup = BookLookupSerializer(data=data)
+        lookup.is_valid(raise_exception=True)
+        isbns = list(dict.fromkeys(lookup.validated_data['isbns']))
+        rows = list(self.row_serializer_class.rows(
+            self.get_queryset().filter(isbn__in=isbns), self.selected_fields(), extra=('isbn',)))
+        books = self.row_serializer_class(
+            rows, many=True, context=self.get_serializer_context()).data
+        found = {row['isbn']: book for row, book in zip(rows, books)}
+        return Response({
+            'results': {str(isbn): found.get(isbn) for isbn in isbns},
+            'missing': [isbn for isbn in isbns if isbn not in found],
+        })
+
+
+class BookExportView(ReplicaReadsMixin, generics.GenericAPIView):
+    """ Streaming export of (filtered) books with embedded opinions,
+    as JSON array or newline delimited JSON (`?output=ndjson`). """
+    queryset = Book.objects.order_by('pk')
+    serializer_class = BookExportSerializer
     filterset_class = BookFilter
+    pagination_class = None
+    chunk_size = 2000
+    content_types = {
+        'json': 'application/json',
+        'ndjson': 'application/x-ndjson',
+    }
+
+    def get(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'json')
+        if output not in self.content_types:
+            raise ValidationError(
+                {'output': f'Allowed values: {", ".join(self.content_types)}'})
+        # The stream is read after the view returns, so it is pinned
+        # to the database chosen now.
+        self.using = router.db_for_read(Book)
+        rows = BookExportSerializer.rows(
+            self.filter_queryset(self.get_queryset().using(self.using)))
+        return StreamingHttpResponse(
+            self.stream(rows, output), content_type=self.content_types[output])
 
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'using': getattr(self, 'using', None)}
 
-class OpinionViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixins.RetrieveModelMixin):
+    def stream(self, rows, output: str):
+        """ Method which yields encoded books chunk by chunk, reading
+        rows from the database with a server side cursor. """
+        serializer = self.get_serializer()
+        renderer = FastJSONRenderer()
+        separator = b'\n' if output == 'ndjson' else b','
+        first = True
+        if output == 'json':
+            yield b'['
+        for chunk in chunked(rows.iterator(chunk_size=self.chunk_size), self.chunk_size):
+            books = serializer.to_representation_many(chunk)
+            encoded = separator.join(renderer.render(book) for book in books)
+            if output == 'ndjson':
+                yield encoded + separator
+            else:
+                yield encoded if first else separator + encoded
+            first = False
+        if output == 'json':
+            yield b']'
+
+
+class OpinionViewSet(ReplicaReadsMixin, CachedResponseMixin, FieldSelectionMixin, RowSerializationMixin, viewsets.GenericViewSet, mixins.ListModelMixin, mixins.RetrieveModelMixin):
     """ List and detail view of opinions. """
-    queryset = Opinion.objects.all()
+    queryset = Opinion.objects.select_related('book').order_by('pk')
     serializer_class = OpinionSerializer
+    row_serializer_class = OpinionRowSerializer
+
+
+class LeaderboardView(ReplicaReadsMixin, generics.GenericAPIView):
+    """ Best ranked books, of all or of one category, with at least
+    `min_opinions` opinions. Served from leaderboards kept in memory
+    until data changes, built from the ranking score index. """
+    pagination_class = None
+    filter_backends = ()
+
+    def get(self, request, *args, **kwargs):
+        query = LeaderboardQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        category = query.validated_data.get('category')
+        min_opinions = query.validated_data['min_opinions']
+        return Response({
+            'category': category,
+            'min_opinions': min_opinions,
+            'results': leaderboards.top(
+                category, query.validated_data['limit'], min_opinions),
+        })
+
+
+class AuthorViewSet(ReplicaReadsMixin, CachedResponseMixin, viewsets.GenericViewSet,
+                    mixins.ListModelMixin, mixins.RetrieveModelMixin):
+    """ List and detail view of authors, with number of their books and
+    average rating, kept up to date on every book and opinion change. """
+    queryset = Author.objects.order_by('pk')
+    serializer_class = AuthorSerializer
+    filterset_class = AuthorFilter
+
+
+class CategoryViewSet(ReplicaReadsMixin, CachedResponseMixin, viewsets.GenericViewSet,
+                      mixins.ListModelMixin, mixins.RetrieveModelMixin):
+    """ List and detail view of categories, with number of their books and
+    average rating, kept up to date on every book and opinion change. """
+    queryset = Category.objects.order_by('name')
+    serializer_class = CategorySerializer
+    filterset_class = CategoryFilter
+
+
+class ImportJobViewSet(mixins.CreateModelMixin, mixins.ListModelMixin,
+                       mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """ Queue of csv imports, processed in background by `import_worker`
+    command, and their progress. Available to staff users only. """
+    queryset = ImportJob.objects.order_by('-pk')
+    serializer_class = ImportJobSerializer
+    permission_classes = (IsAdminUser,)
+    parser_classes = (MultiPartParser, FormParser, JSONParser)
+    filterset_fields = ('status', 'kind')
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+    def get_success_headers(self, data):
+        return {'Location': self.reverse_action('detail', args=[data['id']])}